@@ -9,8 +9,10 @@ The view layer uses CarChatbotAgent for low-latency chat, while the
 CrewAI crews are available for more complex multi-agent workflows.
 """
 import logging
+import time
 from ai_engine.llm_client import get_gemini_client
 from ai_engine.prompts import load_prompt
+from ai_engine.response_cache import get_response_cache, prompt_namespace
 
 logger = logging.getLogger(__name__)
 
@@ -35,14 +37,83 @@ class CarChatbotAgent:
         Returns:
             dict with "response" and "model_used" keys.
         """
+        cached = self._cached(message, history)
+        if cached is not None:
+            return cached
+
         messages = []
         if history:
             messages.extend(history)
         messages.append({"role": "user", "content": message})
 
+        start = time.perf_counter()
         result = self.client.chat(messages, system_prompt=SYSTEM_PROMPT)
+        self._remember(message, history, result, start)
+        return result
+
+    async def achat(self, message: str, history: list = None) -> dict:
+        """Async version of chat() for async views."""
+        cached = self._cached(message, history)
+        if cached is not None:
+            return cached
+
+        messages = []
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": message})
+
+        start = time.perf_counter()
+        result = await self.client.achat(messages, system_prompt=SYSTEM_PROMPT)
+        self._remember(message, history, result, start)
         return result
 
+    def chat_stream(self, message: str, history: list = None):
+        """
+        Streaming version of chat().
+
+        Yields {"delta": "..."} chunks, then a final dict with "done",
+        "response" and "model_used" (see GeminiClient.chat_stream). A cached
+        answer comes as a single chunk.
+        """
+        cached = self._cached(message, history)
+        if cached is not None:
+            yield {"delta": cached["response"]}
+            yield {"done": True, **cached}
+            return
+
+        messages = []
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": message})
+
+        start = time.perf_counter()
+        for event in self.client.chat_stream(messages, system_prompt=SYSTEM_PROMPT):
+            if event.get("done"):
+                self._remember(message, history, event, start)
+            yield event
+
+    # -- response cache (ai_engine/response_cache.py) --------------------
+
+    def _namespace(self) -> str:
+        return prompt_namespace(self.client.model_name, SYSTEM_PROMPT)
+
+    def _cached(self, message: str, history: list = None):
+        """A cached answer to the same (or a near-duplicate) question, marked with "cached"."""
+        cache = get_response_cache()
+        hit = cache.lookup(message, history, self._namespace()) if cache else None
+        if hit is None:
+            return None
+        result, kind = hit
+        return {"response": result["response"], "model_used": result["model_used"], "cached": kind}
+
+    def _remember(self, message: str, history: list, result: dict, start: float) -> None:
+        # Only real model answers: not errors, rate limits or mock echoes
+        cache = get_response_cache()
+        if cache and result.get("model_used") == self.client.model_name and result.get("response"):
+            cache.store(message, history, self._namespace(),
+                        {"response": result["response"], "model_used": result["model_used"]},
+                        (time.perf_counter() - start) * 1000)
+
 
 class CarChatbotCrewAgent:
     """Conversational agent using CrewAI multi-agent orchestration."""
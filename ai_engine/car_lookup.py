@@ -0,0 +1,282 @@
+"""
+Car Lookup Index — resolves free-text make/model names to catalog keys.
+
+Users, dealers and the vision model spell cars in many ways ("Mercedes-Benz",
+"C Class", "c200", "Landcruiser", "Hundai Elantra"). The index is built once
+from the catalog and resolves names in four steps, cheapest first:
+
+  1. exact      : the strip().lower() key is in the catalog (O(1) dict hit)
+  2. normalized : keys compared without spaces/punctuation ("landcruiser")
+  3. alias      : known alternate names and trim patterns ("benz", "c200")
+  4. fuzzy      : trigram candidates confirmed by edit distance ("corola")
+
+Resolved names are memoized, so repeated misspellings only pay once.
+find_cars() uses the same steps to pick car mentions out of a sentence.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# ---------------------------------------------------------------
+# Alias tables (keys are normalized, see normalize_name)
+# ---------------------------------------------------------------
+MAKE_ALIASES: Dict[str, str] = {
+    "mercedesbenz": "mercedes",
+    "benz": "mercedes",
+    "mb": "mercedes",
+    "merc": "mercedes",
+    "landrover": "range rover",
+    "rangerover": "range rover",
+    "vw": "volkswagen",
+    "chevy": "chevrolet",
+}
+
+MODEL_ALIASES: Dict[str, Dict[str, str]] = {
+    "mercedes": {"maybach": "s-class", "gwagon": "g-class", "gwagen": "g-class"},
+    "toyota": {"lc": "land cruiser", "landcruiserprado": "prado", "lc200": "land cruiser", "lc300": "land cruiser"},
+    "range rover": {
+        "rangeroversport": "sport",
+        "rrsport": "sport",
+        "rangerovervelar": "velar",
+        "rangeroverevoque": "evoque",
+        "vogue": "range rover",
+    },
+    "kia": {"optima": "k5"},
+    "nissan": {"xtrail": "x-trail"},
+}
+
+# Trim/engine designations that map onto a catalog model, e.g. "c200" → "c-class"
+MODEL_ALIAS_PATTERNS: Dict[str, List[Tuple[str, str]]] = {
+    "mercedes": [
+        (r"^(cla|glc|gle|gls)\d{2,3}[a-z]*$", r"\1"),
+        (r"^([aceg])\d{2,3}[a-z]*$", r"\1-class"),
+        (r"^s\d{3}[a-z]*$", "s-class"),
+        (r"^([aceg])class$", r"\1-class"),
+    ],
+    "bmw": [
+        (r"^([357])\d{2}[a-z]*$", r"\1-series"),
+        (r"^([357])er$", r"\1-series"),
+        (r"^(x[13457])[a-z]*\d*[a-z]*$", r"\1"),
+    ],
+    "lexus": [(r"^(es|is|ls|lx|nx)\d{3}[a-z]*$", r"\1")],
+    "audi": [(r"^(a[468]|q[358])[a-z]*$", r"\1")],
+}
+
+FUZZY_MIN_SIMILARITY = 0.75
+FUZZY_MAX_CANDIDATES = 8
+# Longest model name find_cars() looks for, in words ("land cruiser")
+MAX_MODEL_WORDS = 2
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_METHOD_RANK = ["exact", "normalized", "alias", "fuzzy"]
+
+
+class CarMatch(NamedTuple):
+    """A resolved catalog entry and how it was found."""
+    make: str
+    model: str
+    method: str  # "exact", "normalized", "alias" or "fuzzy"
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase and drop everything but letters and digits: "Land-Cruiser " → "landcruiser"."""
+    return _NON_ALNUM.sub("", name.lower())
+
+
+class _FuzzyIndex:
+    """Trigram inverted index over normalized names, confirmed by edit distance."""
+
+    def __init__(self, names: Dict[str, str]):
+        # names: normalized name → catalog key
+        self.names = names
+        self.postings: Dict[str, List[str]] = {}
+        for name in names:
+            for gram in _trigrams(name):
+                self.postings.setdefault(gram, []).append(name)
+
+    def search(self, query: str) -> Optional[str]:
+        shared = Counter()
+        for gram in _trigrams(query):
+            shared.update(self.postings.get(gram, ()))
+        best_key, best_score = None, FUZZY_MIN_SIMILARITY
+        for name, _ in shared.most_common(FUZZY_MAX_CANDIDATES):
+            longest = max(len(name), len(query))
+            distance = _edit_distance(query, name, int(longest * (1 - best_score)))
+            if distance is None:
+                continue
+            score = 1 - distance / longest
+            if best_key is None or score > best_score:
+                best_key, best_score = self.names[name], score
+        return best_key
+
+
+class CarLookupIndex:
+    """Precompiled lookup index over a catalog's make → model → info mapping."""
+
+    def __init__(self, car_database: Dict[str, dict], cache_size: int = 4096):
+        self.car_database = car_database
+
+        self._makes_by_name = {normalize_name(make): make for make in car_database}
+        self._make_aliases = {alias: make for alias, make in MAKE_ALIASES.items() if make in car_database}
+        self._models_by_name: Dict[str, Dict[str, str]] = {}
+        self._model_aliases: Dict[str, Dict[str, str]] = {}
+        self._model_patterns: Dict[str, list] = {}
+        self._model_fuzzy: Dict[str, _FuzzyIndex] = {}
+        for make, models in car_database.items():
+            by_name = {normalize_name(model): model for model in models}
+            self._models_by_name[make] = by_name
+            self._model_aliases[make] = {
+                alias: model for alias, model in MODEL_ALIASES.get(make, {}).items() if model in models
+            }
+            self._model_patterns[make] = [
+                (re.compile(pattern), template) for pattern, template in MODEL_ALIAS_PATTERNS.get(make, [])
+            ]
+            self._model_fuzzy[make] = _FuzzyIndex(by_name)
+        self._make_fuzzy = _FuzzyIndex(self._makes_by_name)
+        # normalized model name → makes that have it, for models mentioned without a make
+        self._makes_by_model: Dict[str, Set[str]] = {}
+        for make, by_name in self._models_by_name.items():
+            for name in by_name:
+                self._makes_by_model.setdefault(name, set()).add(make)
+
+        self._resolve_make_cached = lru_cache(maxsize=cache_size)(self._resolve_make)
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def resolve_make(self, make: str) -> Optional[str]:
+        """Return the catalog key for a make, or None if nothing matches."""
+        key = make.strip().lower()
+        if key in self.car_database:
+            return key
+        found = self._resolve_make_cached(key)
+        return found[0] if found else None
+
+    def resolve(self, make: str, model: str) -> Optional[CarMatch]:
+        """Return the catalog (make, model) for free-text names, or None."""
+        make_key = make.strip().lower()
+        model_key = model.strip().lower()
+        models = self.car_database.get(make_key)
+        if models is not None and model_key in models:
+            return CarMatch(make_key, model_key, "exact")
+        return self._resolve_cached(make_key, model_key)
+
+    def find_cars(self, words: Sequence[str]) -> List[Tuple[int, int, CarMatch]]:
+        """
+        Car mentions in a list of lowercase words, as (start, end, match) spans.
+
+        A mention is a make optionally followed by its model ("toyota land
+        cruiser", "benz c200"), or a model alone when only one make has it
+        ("corolla"). A make without a model gets an empty model. Models of more
+        than one word must match by name, not by alias or fuzzy search, so
+        "corolla le" is the Corolla followed by "le".
+        """
+        found = []
+        start = 0
+        while start < len(words):
+            mention = self._mention_at(words, start)
+            if mention is None:
+                start += 1
+                continue
+            found.append(mention)
+            start = mention[1]
+        return found
+
+    def models_for(self, make: str) -> List[str]:
+        """Sorted catalog models for a (possibly misspelled or aliased) make."""
+        make_key = self.resolve_make(make)
+        if make_key is None:
+            return []
+        return sorted(self.car_database[make_key])
+
+    # -- slow paths (memoized) -------------------------------------------
+
+    def _resolve_make(self, make_key: str) -> Optional[Tuple[str, str]]:
+        name = normalize_name(make_key)
+        if not name:
+            return None
+        if name in self._makes_by_name:
+            return self._makes_by_name[name], "normalized"
+        if name in self._make_aliases:
+            return self._make_aliases[name], "alias"
+        found = self._make_fuzzy.search(name)
+        return (found, "fuzzy") if found else None
+
+    def _resolve(self, make_key: str, model_key: str) -> Optional[CarMatch]:
+        if make_key in self.car_database:
+            resolved_make, make_method = make_key, "exact"
+        else:
+            found = self._resolve_make_cached(make_key)
+            if found is None:
+                return None
+            resolved_make, make_method = found
+        name = normalize_name(model_key)
+        # "Toyota Camry" typed into the model field
+        for prefix in {normalize_name(make_key), normalize_name(resolved_make)}:
+            if prefix and name.startswith(prefix) and len(name) > len(prefix):
+                name = name[len(prefix):]
+                break
+        if not name:
+            return None
+
+        model, model_method = self._models_by_name[resolved_make].get(name), "normalized"
+        if model is None:
+            model, model_method = self._model_aliases[resolved_make].get(name), "alias"
+        if model is None:
+            model = self._match_pattern(resolved_make, name)
+        if model is None:
+            model, model_method = self._model_fuzzy[resolved_make].search(name), "fuzzy"
+        if model is None:
+            return None
+        # Report the least certain of the two steps
+        method = max(make_method, model_method, key=_METHOD_RANK.index)
+        return CarMatch(resolved_make, model, method)
+
+    def _mention_at(self, words: Sequence[str], start: int) -> Optional[Tuple[int, int, CarMatch]]:
+        make = self._resolve_make_cached(words[start])
+        if make is not None:
+            for end in range(min(start + 1 + MAX_MODEL_WORDS, len(words)), start + 1, -1):
+                match = self._resolve_cached(make[0], " ".join(words[start + 1:end]))
+                if match is not None and (end == start + 2 or match.method in ("exact", "normalized")):
+                    return start, end, match
+            return start, start + 1, CarMatch(make[0], "", make[1])
+        for end in range(min(start + MAX_MODEL_WORDS, len(words)), start, -1):
+            name = normalize_name("".join(words[start:end]))
+            makes = self._makes_by_model.get(name)
+            if makes is not None and len(makes) == 1:
+                make = next(iter(makes))
+                return start, end, CarMatch(make, self._models_by_name[make][name], "normalized")
+        return None
+
+    def _match_pattern(self, make: str, name: str) -> Optional[str]:
+        models = self.car_database[make]
+        for pattern, template in self._model_patterns[make]:
+            match = pattern.match(name)
+            if match:
+                model = match.expand(template)
+                if model in models:
+                    return model
+        return None
+
+
+def _trigrams(name: str) -> set:
+    padded = f"^{name}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Levenshtein distance, or None as soon as it must exceed max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
@@ -0,0 +1,269 @@
+"""
+Car Catalog — the versioned price data behind the estimator.
+
+Makes, models, categories, base prices, depreciation rates (per category,
+optionally overridden per model) and mileage penalties live in a JSON data file (ai_engine/data/car_catalog.json by
+default, or CAR_CATALOG_PATH). A price update is a file edit plus a
+"version" bump, not a redeploy.
+
+Each worker holds one immutable Catalog object. get_catalog() re-checks the
+file's mtime/size at most every CAR_CATALOG_CHECK_INTERVAL seconds and, if
+the content hash changed, loads and warms a new Catalog and swaps the module
+reference. Readers never take a lock: they just read the current reference,
+and a catalog they already hold stays valid for the rest of their request.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'car_catalog.json')
+
+
+class CatalogError(ValueError):
+    """The catalog file is missing fields or holds invalid values."""
+
+
+class Catalog:
+    """An immutable, loaded catalog version plus its derived lookup structures."""
+
+    def __init__(self, version: str, fingerprint: str, cars: Dict[str, dict],
+                 depreciation_rates: Dict[str, float], mileage_penalties, source: str = ""):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.source = source
+        self.cars: Mapping[str, Mapping[str, Mapping]] = MappingProxyType({
+            make: MappingProxyType({model: MappingProxyType(dict(info)) for model, info in models.items()})
+            for make, models in cars.items()
+        })
+        self.depreciation_rates: Mapping[str, float] = MappingProxyType(dict(depreciation_rates))
+        self.mileage_penalties: Tuple[Tuple[int, float], ...] = tuple(
+            (int(threshold), float(penalty)) for threshold, penalty in mileage_penalties
+        )
+        self._index = None
+        self._grid = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Catalog {self.version} ({self.fingerprint[:8]})>"
+
+    def rate_for(self, info: Optional[Mapping]) -> float:
+        """
+        Annual depreciation rate of a catalog car.
+
+        A model's own "depreciation_rate" (fitted by calibrate_catalog) wins over
+        its category rate; unknown cars (info=None) use the default category.
+        """
+        if info is None:
+            from ai_engine.valuation_grid import DEFAULT_CATEGORY
+            return self.depreciation_rates[DEFAULT_CATEGORY]
+        return info.get("depreciation_rate", self.depreciation_rates[info["category"]])
+
+    @property
+    def index(self):
+        """Alias/fuzzy lookup index over this catalog (see car_lookup.py)."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    from ai_engine.car_lookup import CarLookupIndex
+                    self._index = CarLookupIndex(self.cars)
+        return self._index
+
+    def valuation_grid(self, current_year: int = None):
+        """Precomputed valuation grid for this catalog, rebuilt on year rollover."""
+        current_year = current_year or datetime.date.today().year
+        grid = self._grid
+        if grid is None or grid.current_year != current_year:
+            with self._lock:
+                grid = self._grid
+                if grid is None or grid.current_year != current_year:
+                    from ai_engine.valuation_grid import ValuationGrid
+                    grid = ValuationGrid(self.cars, self.depreciation_rates, self.mileage_penalties, current_year)
+                    self._grid = grid
+        return grid
+
+    def warm(self) -> "Catalog":
+        """Build the derived structures up front so the first request doesn't pay for them."""
+        self.index
+        self.valuation_grid()
+        return self
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_catalog(raw: bytes, source: str = "") -> Catalog:
+    """Validate catalog file content and build a Catalog from it."""
+    from ai_engine.valuation_grid import DEFAULT_CATEGORY
+
+    name = source or 'catalog'
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise CatalogError(f"{name}: invalid JSON ({e})") from e
+    if not isinstance(data, dict):
+        raise CatalogError(f"{name}: top level must be an object")
+
+    for field in ("version", "depreciation_rates", "mileage_penalties", "cars"):
+        if field not in data:
+            raise CatalogError(f"{name}: missing '{field}'")
+
+    rates = data["depreciation_rates"]
+    if not isinstance(rates, dict):
+        raise CatalogError(f"{name}: 'depreciation_rates' must be an object")
+    for category, rate in rates.items():
+        if not _is_number(rate) or not 0 <= rate < 1:
+            raise CatalogError(f"depreciation rate for '{category}' must be in [0, 1), got {rate!r}")
+    if DEFAULT_CATEGORY not in rates:
+        raise CatalogError(f"{name}: missing depreciation rate for default category '{DEFAULT_CATEGORY}'")
+
+    penalties = data["mileage_penalties"]
+    if not isinstance(penalties, list) or not all(
+        isinstance(pair, list) and len(pair) == 2 and isinstance(pair[0], int) and _is_number(pair[1])
+        for pair in penalties
+    ):
+        raise CatalogError(f"{name}: 'mileage_penalties' must be a list of [km, penalty] pairs")
+
+    if not isinstance(data["cars"], dict):
+        raise CatalogError(f"{name}: 'cars' must be an object of makes")
+    cars = {}
+    for make, models in data["cars"].items():
+        if not isinstance(models, dict):
+            raise CatalogError(f"{make}: models must be an object")
+        make_key = make.strip().lower()
+        cars[make_key] = {}
+        for model, info in models.items():
+            if not isinstance(info, dict):
+                raise CatalogError(f"{make} {model}: entry must be an object")
+            if info.get("category") not in rates:
+                raise CatalogError(f"{make} {model}: unknown category {info.get('category')!r}")
+            if not _is_number(info.get("base_price")) or info["base_price"] <= 0:
+                raise CatalogError(f"{make} {model}: base_price must be a positive number")
+            if "depreciation_rate" in info and (
+                not _is_number(info["depreciation_rate"]) or not 0 <= info["depreciation_rate"] < 1
+            ):
+                raise CatalogError(f"{make} {model}: depreciation_rate must be in [0, 1)")
+            cars[make_key][model.strip().lower()] = info
+
+    return Catalog(
+        version=str(data["version"]),
+        fingerprint=hashlib.sha256(raw).hexdigest(),
+        cars=cars,
+        depreciation_rates=rates,
+        mileage_penalties=data["mileage_penalties"],
+        source=source,
+    )
+
+
+def load_catalog(path: str) -> Catalog:
+    """Read and parse a catalog file."""
+    with open(path, 'rb') as f:
+        return parse_catalog(f.read(), source=path)
+
+
+def publish_catalog(data: dict, path: str = None) -> Catalog:
+    """
+    Validate catalog data and write it to path (the active catalog file by default).
+
+    The file is written to a temporary sibling and moved into place with
+    os.replace(), so workers never read a half-written catalog. Running
+    workers pick the new version up on their next check.
+    """
+    path = path or get_catalog_path()
+    raw = (json.dumps(data, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+    catalog = parse_catalog(raw, source=path)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return catalog
+
+
+# ---------------------------------------------------------------
+# Hot-reloaded current catalog (one per worker process)
+# ---------------------------------------------------------------
+_current: Optional[Catalog] = None
+_file_stamp: Optional[Tuple[int, int]] = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_catalog_path() -> str:
+    return os.getenv('CAR_CATALOG_PATH') or DEFAULT_CATALOG_PATH
+
+
+def _check_interval() -> float:
+    return float(os.getenv('CAR_CATALOG_CHECK_INTERVAL', '5'))
+
+
+def get_catalog() -> Catalog:
+    """Return the current catalog, picking up a changed data file if one was published."""
+    catalog = _current
+    if catalog is None:
+        with _reload_lock:
+            if _current is None:
+                _reload()
+        return _current
+
+    if time.monotonic() >= _next_check and _reload_lock.acquire(blocking=False):
+        # Only one thread checks; everyone else keeps using the current catalog
+        try:
+            _reload()
+        finally:
+            _reload_lock.release()
+    return _current
+
+
+def reload_catalog() -> Catalog:
+    """Re-check the data file now (e.g. right after publishing a new version)."""
+    with _reload_lock:
+        _reload(force=True)
+    return _current
+
+
+def _reload(force: bool = False) -> None:
+    """Swap in a new Catalog if the data file changed. Caller holds _reload_lock."""
+    global _current, _file_stamp, _next_check
+    _next_check = time.monotonic() + _check_interval()
+    path = get_catalog_path()
+    try:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if not force and _current is not None and stamp == _file_stamp:
+            return
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if _current is not None and hashlib.sha256(raw).hexdigest() == _current.fingerprint:
+            _file_stamp = stamp
+            return
+        try:
+            catalog = parse_catalog(raw, source=path).warm()
+        except CatalogError:
+            raise
+        except Exception as e:
+            # Anything parse_catalog() let through must not reach every request either
+            raise CatalogError(f"{path}: {type(e).__name__}: {e}") from e
+    except (OSError, CatalogError) as e:
+        if _current is None:
+            raise
+        logger.error(f"Car catalog reload failed, keeping version {_current.version}: {e}")
+        return
+
+    if _current is not None:
+        logger.info(f"Car catalog updated: {_current.version} -> {catalog.version}")
+    _current, _file_stamp = catalog, stamp
@@ -0,0 +1,233 @@
+"""
+Pool of Gemini upstream endpoints: every API key x every model.
+
+GEMINI_API_KEYS (default: GEMINI_API_KEY) and GEMINI_MODELS (default: both
+flash models, GEMINI_MODEL_SWITCH first) define the endpoints. GeminiClient
+asks the pool for an endpoint for each upstream call and reports back how it
+went.
+
+  - Models are tried in GEMINI_MODELS order. The first model with a usable
+    endpoint serves, so traffic fails over from 2.5-flash to 2.0-flash (or
+    back) only while every key of the preferred model is unusable.
+  - Among a model's endpoints the choice is weighted least-latency: random,
+    with weight 1 / (latency EWMA x (1 + calls in flight)). Endpoints without
+    a measurement yet count as the fastest, so they get tried.
+  - Each endpoint has a circuit breaker. A 429 opens it at once, for the
+    API's retry hint or GEMINI_BREAKER_COOLDOWN. GEMINI_BREAKER_FAILURES
+    transient errors (500/503/504) in a row open it for the cooldown. A
+    rejected key or unknown model (401/403/404) opens it for 10 cooldowns.
+    After the cooldown one trial call is let through (half-open): success
+    closes the breaker, failure opens it again.
+
+When no endpoint is usable, acquire() raises NoEndpointAvailable (a 503 to
+the retry policy). Health is per worker process.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from ai_engine.context_cache import is_expired_cache_error
+from ai_engine.rate_limiter import retry_hint, retry_reason
+
+# Weight of the newest latency sample in the EWMA
+EWMA_ALPHA = 0.2
+# Breaker opening for a rejected key or unknown model, in cooldowns
+UNUSABLE_COOLDOWNS = 10
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class NoEndpointAvailable(Exception):
+    """Every Gemini endpoint's circuit breaker is open."""
+
+    def __str__(self):
+        return f"503 UNAVAILABLE (client-side): {super().__str__()}"
+
+
+class Endpoint:
+    """One API key + model, with its breaker and latency statistics."""
+
+    def __init__(self, key_id: str, client, model: str):
+        self.key_id = key_id
+        self.client = client
+        self.model = model
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        self.ewma_ms: Optional[float] = None
+        self.in_flight = 0
+        self.counters = {'requests': 0, 'successes': 0, 'rate_limited': 0, 'transient': 0, 'unusable': 0,
+                         'other_errors': 0, 'abandoned': 0, 'opened': 0}
+
+    @property
+    def name(self) -> str:
+        return f"{self.key_id}/{self.model}"
+
+    def usable(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return now >= self.open_until
+        return not self.trial_in_flight
+
+
+class ClientPool:
+    """Endpoint selection, circuit breakers and failover for GeminiClient."""
+
+    def __init__(self, clients: Dict[str, object], models: List[str], failure_threshold: int = 5,
+                 cooldown: float = 30.0):
+        """clients: SDK client per key id, in key order; models: in order of preference."""
+        self.models = list(models)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.endpoints = [Endpoint(key_id, client, model) for model in self.models
+                          for key_id, client in clients.items()]
+        self._lock = threading.Lock()
+        self._counters = {'failovers': 0, 'unavailable': 0}
+
+    def acquire(self, avoid: Iterable[Endpoint] = (), models: List[str] = None) -> Endpoint:
+        """
+        The endpoint for the next call, counted as in flight until release().
+
+        `models` overrides the pool's model preference for this call (vision).
+        Endpoints in `avoid` (just failed) are only used if nothing else is.
+        """
+        avoid = set(avoid)
+        now = time.monotonic()
+        with self._lock:
+            for skip in (avoid, set()):
+                for model in models or self.models:
+                    candidates = [e for e in self.endpoints
+                                  if e.model == model and e not in skip and e.usable(now)]
+                    if candidates:
+                        endpoint = self._pick(candidates)
+                        if endpoint.state != CLOSED:
+                            endpoint.state = HALF_OPEN
+                            endpoint.trial_in_flight = True
+                        endpoint.in_flight += 1
+                        endpoint.counters['requests'] += 1
+                        return endpoint
+            self._counters['unavailable'] += 1
+        raise NoEndpointAvailable(f"all {len(self.endpoints)} Gemini endpoints are open")
+
+    def has_alternative(self, endpoint: Endpoint, models: List[str] = None) -> bool:
+        """Whether another endpoint (of `models`) could take a retry right now."""
+        models = models or self.models
+        now = time.monotonic()
+        with self._lock:
+            return any(e is not endpoint and e.model in models and e.usable(now) for e in self.endpoints)
+
+    def release(self, endpoint: Endpoint, elapsed: Optional[float], error: Exception = None) -> None:
+        """
+        Record the outcome of a call on `endpoint` that took `elapsed` seconds.
+
+        elapsed=None: the caller gave up on the call (cancelled, stream closed
+        early), which says nothing about the endpoint.
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.trial_in_flight = False
+            if elapsed is None:
+                endpoint.counters['abandoned'] += 1
+                return
+            if error is None:
+                self._succeeded(endpoint, elapsed * 1000)
+                return
+            kind = endpoint_failure(error)
+            endpoint.counters[kind or 'other_errors'] += 1
+            if kind is None:
+                # The request's fault (bad input), not the endpoint's
+                if endpoint.state == HALF_OPEN:
+                    endpoint.state = CLOSED
+                return
+            endpoint.consecutive_failures += 1
+            if kind == 'rate_limited':
+                self._open(endpoint, retry_hint(error) or self.cooldown)
+            elif kind == 'unusable':
+                self._open(endpoint, self.cooldown * UNUSABLE_COOLDOWNS)
+            elif endpoint.state == HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+                self._open(endpoint, self.cooldown)
+
+    def record_failover(self) -> None:
+        with self._lock:
+            self._counters['failovers'] += 1
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            endpoints = []
+            for e in self.endpoints:
+                state = e.state
+                if state == OPEN and now >= e.open_until:
+                    state = HALF_OPEN
+                endpoints.append({
+                    'endpoint': e.name, 'key': e.key_id, 'model': e.model, 'state': state,
+                    'open_for_s': round(max(0.0, e.open_until - now), 1) if state == OPEN else 0.0,
+                    'consecutive_failures': e.consecutive_failures,
+                    'ewma_ms': round(e.ewma_ms, 1) if e.ewma_ms is not None else None,
+                    'in_flight': e.in_flight, **e.counters,
+                })
+            return {'models': self.models, **self._counters, 'endpoints': endpoints}
+
+    # -- internals (lock held) -------------------------------------------
+
+    def _pick(self, candidates: List[Endpoint]) -> Endpoint:
+        measured = [e.ewma_ms for e in candidates if e.ewma_ms is not None]
+        fastest = min(measured) if measured else 1.0
+        weights = [1.0 / (max(e.ewma_ms if e.ewma_ms is not None else fastest, 1.0) * (1 + e.in_flight))
+                   for e in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def _succeeded(self, endpoint: Endpoint, latency_ms: float) -> None:
+        endpoint.counters['successes'] += 1
+        endpoint.consecutive_failures = 0
+        endpoint.state = CLOSED
+        if endpoint.ewma_ms is None:
+            endpoint.ewma_ms = latency_ms
+        else:
+            endpoint.ewma_ms += EWMA_ALPHA * (latency_ms - endpoint.ewma_ms)
+
+    def _open(self, endpoint: Endpoint, seconds: float) -> None:
+        endpoint.state = OPEN
+        endpoint.open_until = time.monotonic() + seconds
+        endpoint.counters['opened'] += 1
+
+
+def endpoint_failure(error: Exception) -> Optional[str]:
+    """'rate_limited', 'transient' or 'unusable' if the error is the endpoint's, else None."""
+    reason = retry_reason(error)
+    if reason:
+        return reason
+    if getattr(error, 'code', None) in (401, 403, 404) and not is_expired_cache_error(error):
+        return 'unusable'
+    return None
+
+
+def configured_keys() -> List[str]:
+    keys = getattr(settings, 'GEMINI_API_KEYS', None) or [getattr(settings, 'GEMINI_API_KEY', '')]
+    return [key for key in keys if key]
+
+
+def configured_models(primary: str = None) -> List[str]:
+    """GEMINI_MODELS in preference order, with `primary` (an explicit model) first."""
+    models = list(getattr(settings, 'GEMINI_MODELS', None) or [])
+    if not models:
+        switch = getattr(settings, 'GEMINI_MODEL_SWITCH', None) or os.getenv('GEMINI_MODEL_SWITCH', '2.0')
+        models = ['gemini-2.5-flash', 'gemini-2.0-flash']
+        if switch != '2.5':
+            models.reverse()
+    if primary:
+        models = [primary] + [model for model in models if model != primary]
+    return models
+
+
+def key_id(index: int, key: str) -> str:
+    """How a key appears in stats and logs: position and last 4 characters."""
+    return f"key{index + 1}..{key[-4:]}"
@@ -0,0 +1,210 @@
+"""
+Gemini context caching for system prompts.
+
+Sending a system prompt as system_instruction makes every request pay its
+input tokens and prefill again. With explicit caching the prompt is uploaded
+once as a CachedContent, and requests reference it by name (cached_content);
+cached tokens are billed at a reduced rate.
+
+ContextCacheManager keeps one cache per (API key, model, prompt hash):
+  - created on first use, or reused if another worker already created one
+    (matched by display name);
+  - its TTL is extended once less than REFRESH_MARGIN remains, so a prompt in
+    use never expires;
+  - a request that fails because the cache expired anyway is retried with
+    the prompt inline, and the next request creates a new cache.
+
+Gemini only caches content above a minimum size (1,024+ tokens depending on
+the model). Smaller prompts, estimated at ~4 characters per token, are sent
+inline without trying; prompts the API still refuses are retried after
+FAILURE_BACKOFF.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Extend a cache's TTL when less than this many seconds remain
+REFRESH_MARGIN = 300
+FAILURE_BACKOFF = 600
+DISPLAY_NAME_PREFIX = 'intelliwheels-prompt-'
+
+
+class _Entry:
+    __slots__ = ('name', 'expires_at', 'retry_at')
+
+    def __init__(self, name: Optional[str], expires_at: float = 0.0, retry_at: float = 0.0):
+        self.name = name            # None: not cacheable, retry at retry_at
+        self.expires_at = expires_at
+        self.retry_at = retry_at
+
+
+class ContextCacheManager:
+    """Cached-content handles per (model, system prompt) for one worker process."""
+
+    def __init__(self, enabled: bool = True, ttl: int = 3600, min_tokens: int = 1024):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._counters = {
+            'requests': 0, 'hits': 0, 'skipped_small': 0, 'created': 0, 'reused': 0,
+            'refreshed': 0, 'expired_fallbacks': 0, 'failures': 0, 'cached_tokens': 0,
+        }
+
+    def handle(self, client, model: str, system_prompt: Optional[str], scope: str = '') -> Optional[str]:
+        """
+        Cached-content name to send instead of system_prompt, or None to send it inline.
+
+        Caches belong to the API key's project: `scope` names the key when
+        there are several. May call the caches API (create or refresh); see
+        needs_update().
+        """
+        if not self.enabled or not system_prompt or client is None:
+            return None
+        self._count('requests')
+        if self._too_small(system_prompt):
+            self._count('skipped_small')
+            return None
+
+        key = _key(model, system_prompt)
+        name = self._usable(scope + key)
+        if name is None and self.needs_update(model, system_prompt, scope):
+            with self._lock:
+                name = self._usable(scope + key) or self._update(client, model, system_prompt, key, scope)
+        if name:
+            self._count('hits')
+        return name
+
+    def needs_update(self, model: str, system_prompt: Optional[str], scope: str = '') -> bool:
+        """Whether handle() would call the caches API (async callers run it in a thread then)."""
+        if not self.enabled or not system_prompt or self._too_small(system_prompt):
+            return False
+        entry = self._entries.get(scope + _key(model, system_prompt))
+        now = time.time()
+        if entry is None:
+            return True
+        if entry.name is None:
+            return now >= entry.retry_at
+        return entry.expires_at - now < REFRESH_MARGIN
+
+    def invalidate(self, model: str, system_prompt: str, scope: str = '') -> None:
+        """Forget the handle after a request found the cache gone; the next request recreates it."""
+        with self._lock:
+            self._entries.pop(scope + _key(model, system_prompt), None)
+        self._count('expired_fallbacks')
+        # The request went out with the prompt inline after all
+        self._count('hits', -1)
+
+    def record_usage(self, usage_metadata) -> None:
+        tokens = getattr(usage_metadata, 'cached_content_token_count', None) if usage_metadata else None
+        if tokens:
+            self._count('cached_tokens', tokens)
+
+    def stats(self) -> Dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        caches = sum(1 for entry in list(self._entries.values()) if entry.name)
+        counters['hit_rate'] = round(counters['hits'] / counters['requests'], 4) if counters['requests'] else None
+        return {'enabled': self.enabled, 'caches': caches, **counters}
+
+    # -- internals -------------------------------------------------------
+
+    def _too_small(self, system_prompt: str) -> bool:
+        return len(system_prompt) / CHARS_PER_TOKEN < self.min_tokens
+
+    def _usable(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and entry.name and entry.expires_at - time.time() >= REFRESH_MARGIN:
+            return entry.name
+        return None
+
+    def _update(self, client, model: str, system_prompt: str, key: str, scope: str) -> Optional[str]:
+        """Create, reuse or refresh the cache for key (called with the lock held)."""
+        from google.genai import types
+
+        now = time.time()
+        entry = self._entries.get(scope + key)
+        if entry is not None and entry.name is None and now < entry.retry_at:
+            return None
+        try:
+            if entry is not None and entry.name and entry.expires_at > now:
+                client.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+                entry.expires_at = now + self.ttl
+                self._count('refreshed')
+                return entry.name
+
+            name = self._find_existing(client, model, key)
+            if name:
+                self._count('reused')
+            else:
+                cached = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=DISPLAY_NAME_PREFIX + key,
+                        system_instruction=system_prompt,
+                        ttl=f"{self.ttl}s",
+                    ),
+                )
+                name = cached.name
+                self._count('created')
+                logger.info(f"Created Gemini context cache {name} for {model} prompt {key}")
+            self._entries[scope + key] = _Entry(name, expires_at=now + self.ttl)
+            return name
+        except Exception as e:
+            logger.warning(f"Gemini context cache unavailable for {model} prompt {key}, sending it inline: {e}")
+            self._count('failures')
+            self._entries[scope + key] = _Entry(None, retry_at=now + FAILURE_BACKOFF)
+            return None
+
+    def _find_existing(self, client, model: str, key: str) -> Optional[str]:
+        """A cache another worker created for the same prompt, with its TTL extended for us."""
+        from google.genai import types
+
+        display_name = DISPLAY_NAME_PREFIX + key
+        for cached in client.caches.list():
+            if cached.display_name == display_name and model in (cached.model or ''):
+                client.caches.update(name=cached.name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+                return cached.name
+        return None
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        with self._counters_lock:
+            self._counters[counter] += n
+
+
+def is_expired_cache_error(error: Exception) -> bool:
+    """Whether a generate call failed because its cached content no longer exists."""
+    message = str(error).lower()
+    return 'cache' in message and ('404' in message or 'not_found' in message
+                                   or 'not found' in message or 'expired' in message)
+
+
+def _key(model: str, system_prompt: str) -> str:
+    digest = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+    return f"{model.replace('/', '-')}-{digest}"
+
+
+_context_cache: Optional[ContextCacheManager] = None
+_context_cache_lock = threading.Lock()
+
+
+def get_context_cache() -> ContextCacheManager:
+    global _context_cache
+    if _context_cache is None:
+        with _context_cache_lock:
+            if _context_cache is None:
+                _context_cache = ContextCacheManager(
+                    enabled=getattr(settings, 'GEMINI_CONTEXT_CACHE', True),
+                    ttl=getattr(settings, 'GEMINI_CONTEXT_CACHE_TTL', 3600),
+                    min_tokens=getattr(settings, 'GEMINI_CONTEXT_CACHE_MIN_TOKENS', 1024),
+                )
+    return _context_cache
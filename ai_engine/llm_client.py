@@ -1,11 +1,23 @@
 """
 LLM Client for IntelliWheels - uses Google Gemini (new google-genai SDK).
+
+Calls go to a pool of API keys x models with circuit breakers and failover
+(ai_engine/client_pool.py).
 """
-import os
+import contextlib
+import itertools
+import re
+import time
+import asyncio
 import logging
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 from django.conf import settings
 
+from ai_engine.client_pool import ClientPool, configured_keys, configured_models, endpoint_failure, key_id
+from ai_engine.context_cache import get_context_cache, is_expired_cache_error
+from ai_engine.rate_limiter import INTERACTIVE, backoff_delay, get_rate_limiter, retry_hint, retry_reason
+from ai_engine.single_flight import get_single_flight, request_key
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,102 +25,407 @@ class GeminiClient:
     """Client for Google Gemini API using the new google-genai SDK."""
 
     def __init__(self, model=None, vision_model=None):
-        self.api_key = getattr(settings, 'GEMINI_API_KEY', '') or os.getenv('GEMINI_API_KEY', '')
-        # Model switch logic
-        model_switch = getattr(settings, 'GEMINI_MODEL_SWITCH', None) or os.getenv('GEMINI_MODEL_SWITCH', '2.0')
-        if model_switch == '2.5':
-            self.model_name = model or 'gemini-2.5-flash'
-            self.vision_model_name = vision_model or 'gemini-2.5-flash'
-        else:
-            self.model_name = model or 'gemini-2.0-flash'
-            self.vision_model_name = vision_model or 'gemini-2.0-flash'
-        self._client = None
+        keys = configured_keys()
+        self.api_key = keys[0] if keys else ''
+        # Models in order of preference: GEMINI_MODELS, or GEMINI_MODEL_SWITCH's model first
+        self._chat_models = configured_models(model)
+        self._vision_models = configured_models(vision_model)
+        self.model_name = self._chat_models[0]
+        self.vision_model_name = self._vision_models[0]
+        self._pool = None
+        self._context_cache = get_context_cache()
+        self._single_flight = get_single_flight()
+        self._rate_limiter = get_rate_limiter()
 
-        if self.api_key:
+        if keys:
             try:
                 from google import genai
-                self._client = genai.Client(api_key=self.api_key)
+                clients = {key_id(i, key): genai.Client(api_key=key) for i, key in enumerate(keys)}
+                models = list(dict.fromkeys(self._chat_models + self._vision_models))
+                self._pool = ClientPool(
+                    clients, models,
+                    failure_threshold=settings.GEMINI_BREAKER_FAILURES,
+                    cooldown=settings.GEMINI_BREAKER_COOLDOWN,
+                )
             except Exception as e:
                 logger.error(f"Failed to configure Gemini: {e}")
         else:
             logger.warning("GEMINI_API_KEY not configured - using mock responses")
 
-    def chat(self, messages: List[Dict[str, str]], system_prompt: str = None) -> Dict:
+    def endpoint_stats(self) -> Dict:
+        """Health, latency and breaker state of each upstream endpoint (key x model)."""
+        if self._pool is None:
+            return {'mock': True, 'endpoints': []}
+        return self._pool.stats()
+
+    def chat(self, messages: List[Dict[str, str]], system_prompt: str = None,
+             priority: str = INTERACTIVE) -> Dict:
         """
         Send a chat request to Gemini.
 
         Args:
             messages: list of {"role": "user"/"assistant", "content": "..."}
             system_prompt: optional system instruction
+            priority: rate limiter lane, "interactive" or "background"
 
         Returns:
             dict with "response" and "model_used"
+
+        Identical requests already in flight share one upstream call
+        (ai_engine/single_flight.py).
         """
-        if not self._client:
+        if self._pool is None:
+            time.sleep(self._mock_latency())
             return self._mock_response(messages)
 
+        if self._single_flight is None:
+            return self._chat(messages, system_prompt, priority)
+        key = request_key("chat", self.model_name, system_prompt, messages, priority)
+        return self._single_flight.do(key, lambda: self._chat(messages, system_prompt, priority))
+
+    def _chat(self, messages: List[Dict[str, str]], system_prompt: str, priority: str) -> Dict:
         try:
-            from google.genai import types
+            response, endpoint = self._generate(messages, system_prompt, priority)
 
-            # Build config with system instruction and disable thinking for speed
-            config = None
-            if system_prompt:
-                config = types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    thinking_config=types.ThinkingConfig(thinking_budget=0),
-                )
-            else:
-                config = types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_budget=0),
-                )
+            return {
+                "response": response.text,
+                "model_used": endpoint.model,
+            }
 
-            # Build contents list for multi-turn conversation
-            contents = []
-            for msg in messages:
-                role = "user" if msg["role"] == "user" else "model"
-                contents.append(types.Content(
-                    role=role,
-                    parts=[types.Part.from_text(text=msg["content"])],
-                ))
+        except Exception as e:
+            logger.error(f"Gemini chat error: {e}")
+            return self._error_response(e)
 
-            response = self._client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=config,
-            )
+    async def achat(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                    priority: str = INTERACTIVE) -> Dict:
+        """
+        Async version of chat() using the SDK's asyncio client (client.aio).
+
+        The event loop keeps serving other requests while the model answers,
+        so an async view can hold many conversations without a thread each.
+        """
+        if self._pool is None:
+            await asyncio.sleep(self._mock_latency())
+            return self._mock_response(messages)
+
+        if self._single_flight is None:
+            return await self._achat(messages, system_prompt, priority)
+        key = request_key("chat", self.model_name, system_prompt, messages, priority)
+        return await self._single_flight.ado(key, lambda: self._achat(messages, system_prompt, priority))
+
+    async def _achat(self, messages: List[Dict[str, str]], system_prompt: str, priority: str) -> Dict:
+        try:
+            response, endpoint = await self._agenerate(messages, system_prompt, priority)
 
             return {
                 "response": response.text,
-                "model_used": self.model_name,
+                "model_used": endpoint.model,
             }
 
         except Exception as e:
-            logger.error(f"Gemini chat error: {e}")
-            error_msg = str(e)
-            if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                return {
-                    "response": "I'm currently rate-limited. Please wait a moment and try again.",
-                    "model_used": "rate_limited",
-                }
+            logger.error(f"Gemini async chat error: {e}")
+            return self._error_response(e)
+
+    def chat_stream(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                    priority: str = INTERACTIVE) -> Iterator[Dict]:
+        """
+        Streaming version of chat(): relays the reply as it is generated.
+
+        Yields {"delta": "..."} for each text chunk, then one final
+        {"done": True, "response": <full text>, "model_used": ...}. Errors end
+        the stream with the same messages chat() returns (appended to any text
+        already sent).
+        """
+        if self._pool is None:
+            yield from self._mock_stream(messages)
+            return
+
+        parts = []
+        try:
+            usage = None
+            endpoint, chunks = self._generate_stream(messages, system_prompt, priority)
+            # Closed here too if our caller stops early, so the endpoint is let go
+            with contextlib.closing(chunks):
+                for chunk in chunks:
+                    usage = chunk.usage_metadata or usage
+                    text = chunk.text
+                    if text:
+                        parts.append(text)
+                        yield {"delta": text}
+            self._context_cache.record_usage(usage)
+        except Exception as e:
+            logger.error(f"Gemini chat stream error: {e}")
+            error = self._error_response(e)
+            text = error["response"] if not parts else f"\n\n{error['response']}"
+            parts.append(text)
+            yield {"delta": text}
+            yield {"done": True, "response": "".join(parts), "model_used": error["model_used"]}
+            return
+
+        yield {"done": True, "response": "".join(parts), "model_used": endpoint.model}
+
+    def _generate(self, messages: List[Dict[str, str]], system_prompt: str = None, priority: str = INTERACTIVE):
+        """generate_content on a pool endpoint; returns (response, endpoint)."""
+        def request(endpoint):
+            return self._with_context_cache(
+                endpoint, messages, system_prompt,
+                lambda contents, config: endpoint.client.models.generate_content(
+                    model=endpoint.model, contents=contents, config=config,
+                ),
+            )
+
+        response, endpoint = self._call(request, priority, self._chat_models)
+        self._context_cache.record_usage(response.usage_metadata)
+        return response, endpoint
+
+    async def _agenerate(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                         priority: str = INTERACTIVE):
+        """Async version of _generate()."""
+        def request(endpoint):
+            return self._awith_context_cache(
+                endpoint, messages, system_prompt,
+                lambda contents, config: endpoint.client.aio.models.generate_content(
+                    model=endpoint.model, contents=contents, config=config,
+                ),
+            )
+
+        response, endpoint = await self._acall(request, priority, self._chat_models)
+        self._context_cache.record_usage(response.usage_metadata)
+        return response, endpoint
+
+    def _generate_stream(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                         priority: str = INTERACTIVE):
+        """
+        Streaming version of _generate(): (endpoint, chunk iterator). Errors,
+        including an expired cache, show up on the first chunk, so the stream
+        is opened up to there; only that part is retried or failed over. The
+        endpoint stays in flight until the stream ends.
+        """
+        def request(endpoint):
+            def open_stream(contents, config):
+                stream = iter(endpoint.client.models.generate_content_stream(
+                    model=endpoint.model, contents=contents, config=config,
+                ))
+                first = next(stream, None)
+                return itertools.chain([first], stream) if first is not None else iter(())
+
+            return self._with_context_cache(endpoint, messages, system_prompt, open_stream)
+
+        chunks, endpoint = self._call(request, priority, self._chat_models, stream=True)
+        return endpoint, chunks
+
+    def _with_context_cache(self, endpoint, messages: List[Dict[str, str]], system_prompt: str, send):
+        """send(contents, config) with the system prompt from the endpoint's context cache if there is one."""
+        handle = self._context_cache.handle(endpoint.client, endpoint.model, system_prompt, scope=endpoint.key_id)
+        contents, config = self._build_chat_request(messages, system_prompt, cached_content=handle)
+        try:
+            return send(contents, config)
+        except Exception as e:
+            if not handle or not is_expired_cache_error(e):
+                raise
+            # The cache expired under us: send the prompt inline this time
+            self._context_cache.invalidate(endpoint.model, system_prompt, scope=endpoint.key_id)
+            contents, config = self._build_chat_request(messages, system_prompt)
+            return send(contents, config)
+
+    async def _awith_context_cache(self, endpoint, messages: List[Dict[str, str]], system_prompt: str, send):
+        """Async version of _with_context_cache(); send() returns an awaitable."""
+        cache, scope = self._context_cache, endpoint.key_id
+        if cache.needs_update(endpoint.model, system_prompt, scope):
+            # Creating or refreshing the cache is a blocking API call
+            handle = await asyncio.to_thread(cache.handle, endpoint.client, endpoint.model, system_prompt, scope)
+        else:
+            handle = cache.handle(endpoint.client, endpoint.model, system_prompt, scope=scope)
+        contents, config = self._build_chat_request(messages, system_prompt, cached_content=handle)
+        try:
+            return await send(contents, config)
+        except Exception as e:
+            if not handle or not is_expired_cache_error(e):
+                raise
+            cache.invalidate(endpoint.model, system_prompt, scope=scope)
+            contents, config = self._build_chat_request(messages, system_prompt)
+            return await send(contents, config)
+
+    def _call(self, request, priority: str = INTERACTIVE, models: List[str] = None, stream: bool = False):
+        """
+        request(endpoint) on an endpoint from the pool; returns (result, endpoint).
+
+        Takes a rate limiter token first (ai_engine/rate_limiter.py). A failure
+        that is the endpoint's fails over to another usable endpoint at once;
+        rate limits and transient errors with nowhere else to go are retried
+        after a backoff. With stream=True the result is an iterator of chunks,
+        and the call is reported to the pool once it is exhausted or fails.
+        """
+        attempt = 0
+        failed = []
+        while True:
+            self._rate_limiter.acquire(priority)
+            endpoint = None
+            start = time.perf_counter()
+            try:
+                endpoint = self._pool.acquire(failed, models)
+                result = request(endpoint)
+            except Exception as e:
+                if endpoint is not None:
+                    self._pool.release(endpoint, time.perf_counter() - start, e)
+                delay = self._retry_delay(e, attempt, endpoint, models)
+                if delay is None:
+                    raise
+            except BaseException:
+                if endpoint is not None:
+                    self._pool.release(endpoint, None)
+                raise
+            else:
+                if stream:
+                    return self._release_after(result, endpoint, start), endpoint
+                self._pool.release(endpoint, time.perf_counter() - start)
+                return result, endpoint
+            self._log_retry(endpoint, attempt, delay)
+            time.sleep(delay)
+            if endpoint is not None:
+                failed.append(endpoint)
+            attempt += 1
+
+    async def _acall(self, request, priority: str = INTERACTIVE, models: List[str] = None):
+        """Async version of _call(); request(endpoint) returns an awaitable."""
+        attempt = 0
+        failed = []
+        while True:
+            await self._rate_limiter.aacquire(priority)
+            endpoint = None
+            start = time.perf_counter()
+            try:
+                endpoint = self._pool.acquire(failed, models)
+                result = await request(endpoint)
+            except Exception as e:
+                if endpoint is not None:
+                    self._pool.release(endpoint, time.perf_counter() - start, e)
+                delay = self._retry_delay(e, attempt, endpoint, models)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelled: the endpoint is free again, with no verdict on it
+                if endpoint is not None:
+                    self._pool.release(endpoint, None)
+                raise
+            else:
+                self._pool.release(endpoint, time.perf_counter() - start)
+                return result, endpoint
+            self._log_retry(endpoint, attempt, delay)
+            await asyncio.sleep(delay)
+            if endpoint is not None:
+                failed.append(endpoint)
+            attempt += 1
+
+    def _release_after(self, chunks: Iterator, endpoint, start: float) -> Iterator:
+        """Relay a stream's chunks, then report its total latency or mid-stream error to the pool."""
+        try:
+            yield from chunks
+        except Exception as e:
+            self._pool.release(endpoint, time.perf_counter() - start, e)
+            raise
+        except BaseException:
+            # Closed before the end (client gone): no verdict on the endpoint
+            self._pool.release(endpoint, None)
+            raise
+        self._pool.release(endpoint, time.perf_counter() - start)
+
+    def _retry_delay(self, error: Exception, attempt: int, endpoint=None,
+                     models: List[str] = None) -> Optional[float]:
+        """Seconds to wait before retrying after `error` (0: fail over now), or None to give up."""
+        reason = retry_reason(error)
+        failover = (endpoint is not None and endpoint_failure(error) is not None
+                    and self._pool.has_alternative(endpoint, models))
+        if not reason and not failover:
+            return None
+        if attempt >= settings.GEMINI_MAX_RETRIES:
+            self._rate_limiter.record_gave_up()
+            return None
+        if failover:
+            self._pool.record_failover()
+            if reason:
+                self._rate_limiter.record_retry(reason)
+            return 0.0
+        hint = retry_hint(error)
+        if reason == 'rate_limited' and hint:
+            self._rate_limiter.hold(hint)
+        delay = backoff_delay(attempt, hint)
+        if delay > settings.GEMINI_RETRY_MAX_DELAY:
+            self._rate_limiter.record_gave_up()
+            return None
+        self._rate_limiter.record_retry(reason)
+        return delay
+
+    @staticmethod
+    def _log_retry(endpoint, attempt: int, delay: float) -> None:
+        where = f" on {endpoint.name}" if endpoint is not None else ""
+        if delay:
+            logger.warning(f"Gemini call failed{where}, retry {attempt + 1} in {delay:.1f}s")
+        else:
+            logger.warning(f"Gemini call failed{where}, failing over to another endpoint")
+
+    def _build_chat_request(self, messages: List[Dict[str, str]], system_prompt: str = None,
+                            cached_content: str = None):
+        """
+        Gemini contents and config for a multi-turn chat.
+
+        With cached_content, the system prompt comes from that context cache
+        instead of being sent inline.
+        """
+        from google.genai import types
+
+        # Build config with the system instruction (or its cache) and disable thinking for speed
+        config = types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+        )
+        if cached_content:
+            config.cached_content = cached_content
+        elif system_prompt:
+            config.system_instruction = system_prompt
+
+        # Build contents list for multi-turn conversation
+        contents = []
+        for msg in messages:
+            role = "user" if msg["role"] == "user" else "model"
+            contents.append(types.Content(
+                role=role,
+                parts=[types.Part.from_text(text=msg["content"])],
+            ))
+        return contents, config
+
+    def _error_response(self, error: Exception) -> Dict:
+        error_msg = str(error)
+        if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
             return {
-                "response": f"I encountered an error: {error_msg}",
-                "model_used": "error",
+                "response": "I'm currently rate-limited. Please wait a moment and try again.",
+                "model_used": "rate_limited",
             }
+        return {
+            "response": f"I encountered an error: {error_msg}",
+            "model_used": "error",
+        }
 
-    def analyze_image(self, image_bytes: bytes, prompt: str) -> Dict:
+    def analyze_image(self, image_bytes: bytes, prompt: str, priority: str = INTERACTIVE) -> Dict:
         """
         Analyze an image with Gemini Vision.
 
         Args:
             image_bytes: raw image bytes
             prompt: the analysis prompt
+            priority: rate limiter lane, "interactive" or "background" (batch jobs)
 
         Returns:
             dict with "response" and "model_used"
         """
-        if not self._client:
+        if self._pool is None:
             return self._mock_vision_response()
 
+        if self._single_flight is None:
+            return self._analyze_image(image_bytes, prompt, priority)
+        key = request_key("vision", self.vision_model_name, prompt, image_bytes, priority)
+        return self._single_flight.do(key, lambda: self._analyze_image(image_bytes, prompt, priority))
+
+    def _analyze_image(self, image_bytes: bytes, prompt: str, priority: str) -> Dict:
         try:
             from google.genai import types
 
@@ -118,14 +435,14 @@ class GeminiClient:
             )
             text_part = types.Part.from_text(text=prompt)
 
-            response = self._client.models.generate_content(
-                model=self.vision_model_name,
+            response, endpoint = self._call(lambda endpoint: endpoint.client.models.generate_content(
+                model=endpoint.model,
                 contents=[text_part, image_part],
-            )
+            ), priority, self._vision_models)
 
             return {
                 "response": response.text,
-                "model_used": self.vision_model_name,
+                "model_used": endpoint.model,
             }
 
         except Exception as e:
@@ -146,6 +463,19 @@ class GeminiClient:
             "model_used": "mock",
         }
 
+    @staticmethod
+    def _mock_latency() -> float:
+        """Simulated model latency in mock mode, in seconds (GEMINI_MOCK_LATENCY_MS)."""
+        return getattr(settings, 'GEMINI_MOCK_LATENCY_MS', 0) / 1000
+
+    def _mock_stream(self, messages: List[Dict]) -> Iterator[Dict]:
+        """Mock reply delivered word by word, like a real stream."""
+        time.sleep(self._mock_latency())
+        text = self._mock_response(messages)["response"]
+        for word in re.findall(r"\S+\s*", text):
+            yield {"delta": word}
+        yield {"done": True, "response": text, "model_used": "mock"}
+
     def _mock_vision_response(self) -> Dict:
         return {
             "response": '{"make": "Unknown", "model": "Unknown", "year": "Unknown", '
@@ -10,153 +10,69 @@ Depreciation model (per year):
   - Luxury   : 12% per year
   - Premium  : 10% per year
   - Economic :  7% per year
+  (calibrate_catalog can refit these and add per-model rates from listing data)
 
 Additional mileage penalty:
   - > 100 000 km  → extra 5% off
   - > 200 000 km  → extra 10% off
 
 The original (new) prices are rough averages for the Jordanian market in JOD.
+Prices, categories, rates and penalties are read from the versioned catalog
+file (ai_engine/data/car_catalog.json, see catalog.py).
 """
 import datetime
-from typing import Dict, Optional
-
-# ---------------------------------------------------------------
-# Car database: make → { models: {model: category}, base_price }
-# base_price is a rough NEW-car price in JOD for the Jordanian market
-# ---------------------------------------------------------------
-CAR_DATABASE: Dict[str, dict] = {
-    # ---- LUXURY ----
-    "mercedes": {
-        "s-class":   {"category": "luxury",  "base_price": 85_000},
-        "gle":       {"category": "luxury",  "base_price": 72_000},
-        "gls":       {"category": "luxury",  "base_price": 90_000},
-        "g-class":   {"category": "luxury",  "base_price": 120_000},
-        "e-class":   {"category": "premium", "base_price": 52_000},
-        "c-class":   {"category": "premium", "base_price": 38_000},
-        "a-class":   {"category": "premium", "base_price": 30_000},
-        "cla":       {"category": "premium", "base_price": 33_000},
-        "glc":       {"category": "premium", "base_price": 48_000},
-    },
-    "bmw": {
-        "7-series":  {"category": "luxury",  "base_price": 82_000},
-        "x7":        {"category": "luxury",  "base_price": 88_000},
-        "x5":        {"category": "premium", "base_price": 60_000},
-        "5-series":  {"category": "premium", "base_price": 48_000},
-        "3-series":  {"category": "premium", "base_price": 36_000},
-        "x3":        {"category": "premium", "base_price": 42_000},
-        "x1":        {"category": "premium", "base_price": 32_000},
-    },
-    "audi": {
-        "a8":        {"category": "luxury",  "base_price": 78_000},
-        "q8":        {"category": "luxury",  "base_price": 75_000},
-        "a6":        {"category": "premium", "base_price": 46_000},
-        "a4":        {"category": "premium", "base_price": 35_000},
-        "q5":        {"category": "premium", "base_price": 45_000},
-        "q3":        {"category": "premium", "base_price": 33_000},
-    },
-    "porsche": {
-        "cayenne":   {"category": "luxury",  "base_price": 95_000},
-        "panamera":  {"category": "luxury",  "base_price": 100_000},
-        "macan":     {"category": "luxury",  "base_price": 70_000},
-    },
-    "range rover": {
-        "range rover":       {"category": "luxury",  "base_price": 110_000},
-        "sport":             {"category": "luxury",  "base_price": 85_000},
-        "velar":             {"category": "premium", "base_price": 55_000},
-        "evoque":            {"category": "premium", "base_price": 42_000},
-    },
-    "lexus": {
-        "ls":        {"category": "luxury",  "base_price": 75_000},
-        "lx":        {"category": "luxury",  "base_price": 90_000},
-        "es":        {"category": "premium", "base_price": 40_000},
-        "is":        {"category": "premium", "base_price": 35_000},
-        "nx":        {"category": "premium", "base_price": 38_000},
-    },
-    # ---- ECONOMIC ----
-    "toyota": {
-        "camry":     {"category": "economic", "base_price": 25_000},
-        "corolla":   {"category": "economic", "base_price": 19_000},
-        "yaris":     {"category": "economic", "base_price": 14_000},
-        "rav4":      {"category": "economic", "base_price": 28_000},
-        "land cruiser": {"category": "luxury", "base_price": 80_000},
-        "prado":     {"category": "premium",  "base_price": 52_000},
-        "hilux":     {"category": "economic", "base_price": 26_000},
-        "fortuner":  {"category": "economic", "base_price": 32_000},
-    },
-    "hyundai": {
-        "elantra":   {"category": "economic", "base_price": 17_000},
-        "sonata":    {"category": "economic", "base_price": 22_000},
-        "tucson":    {"category": "economic", "base_price": 25_000},
-        "accent":    {"category": "economic", "base_price": 13_000},
-        "creta":     {"category": "economic", "base_price": 18_000},
-        "santa fe":  {"category": "economic", "base_price": 30_000},
-    },
-    "kia": {
-        "cerato":    {"category": "economic", "base_price": 16_500},
-        "sportage":  {"category": "economic", "base_price": 24_000},
-        "sorento":   {"category": "economic", "base_price": 29_000},
-        "picanto":   {"category": "economic", "base_price": 11_000},
-        "rio":       {"category": "economic", "base_price": 13_000},
-        "k5":        {"category": "economic", "base_price": 23_000},
-    },
-    "nissan": {
-        "sunny":     {"category": "economic", "base_price": 13_500},
-        "sentra":    {"category": "economic", "base_price": 16_000},
-        "x-trail":   {"category": "economic", "base_price": 26_000},
-        "kicks":     {"category": "economic", "base_price": 18_000},
-        "patrol":    {"category": "luxury",   "base_price": 70_000},
-    },
-    "honda": {
-        "civic":     {"category": "economic", "base_price": 20_000},
-        "accord":    {"category": "economic", "base_price": 25_000},
-        "cr-v":      {"category": "economic", "base_price": 27_000},
-        "hr-v":      {"category": "economic", "base_price": 21_000},
-    },
-    "suzuki": {
-        "swift":     {"category": "economic", "base_price": 12_000},
-        "vitara":    {"category": "economic", "base_price": 18_000},
-        "dzire":     {"category": "economic", "base_price": 11_500},
-    },
-    "volkswagen": {
-        "golf":      {"category": "economic", "base_price": 22_000},
-        "tiguan":    {"category": "premium",  "base_price": 32_000},
-        "passat":    {"category": "premium",  "base_price": 30_000},
-    },
-    "chevrolet": {
-        "cruze":     {"category": "economic", "base_price": 15_000},
-        "malibu":    {"category": "economic", "base_price": 20_000},
-    },
-    "ford": {
-        "focus":     {"category": "economic", "base_price": 17_000},
-        "explorer":  {"category": "premium",  "base_price": 40_000},
-    },
-}
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from ai_engine.catalog import get_catalog
+from ai_engine.valuation_grid import DEFAULT_BASE_PRICE, DEFAULT_CATEGORY, rate_label
 
-# Depreciation rates per year by category
-DEPRECIATION_RATES = {
-    "luxury":   0.12,
-    "premium":  0.10,
-    "economic": 0.07,
+# Mileage columns of estimate_price_schedule() when the caller gives none
+DEFAULT_SCHEDULE_MILEAGES = (0, 50_000, 100_000, 150_000, 200_000, 250_000)
+
+# The car database, depreciation rates and mileage penalties are loaded from
+# the versioned catalog file (see catalog.py). These module attributes are kept
+# for backward compatibility and always reflect the current catalog version.
+_CATALOG_ATTRIBUTES = {
+    "CAR_DATABASE": "cars",
+    "DEPRECIATION_RATES": "depreciation_rates",
+    "MILEAGE_PENALTIES": "mileage_penalties",
 }
 
-# Mileage penalty thresholds
-MILEAGE_PENALTIES = [
-    (200_000, 0.10),
-    (100_000, 0.05),
-]
 
+def __getattr__(name):
+    if name in _CATALOG_ATTRIBUTES:
+        return getattr(get_catalog(), _CATALOG_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def _lookup_car(make: str, model: str) -> Optional[dict]:
-    """Look up a car in the database (case-insensitive)."""
-    make_key = make.strip().lower()
-    model_key = model.strip().lower()
 
-    make_data = CAR_DATABASE.get(make_key)
-    if not make_data:
-        return None
+def get_lookup_index():
+    """Return the alias/fuzzy lookup index of the current catalog (see car_lookup.py)."""
+    return get_catalog().index
+
+
+def get_valuation_grid():
+    """Return the valuation grid of the current catalog, rebuilt after a year rollover."""
+    return get_catalog().valuation_grid()
+
+
+def match_car(make: str, model: str):
+    """
+    Resolve free-text make/model names to a catalog entry.
 
-    info = make_data.get(model_key)
-    return info
+    Returns a CarMatch(make, model, method) with the catalog keys, or None.
+    """
+    return get_lookup_index().resolve(make, model)
+
+
+def _lookup_car(make: str, model: str) -> Optional[dict]:
+    """Look up a car in the database (case-insensitive, aliases and typos tolerated)."""
+    catalog = get_catalog()
+    match = catalog.index.resolve(make, model)
+    if not match:
+        return None
+    return catalog.cars[match.make][match.model]
 
 
 def classify_car(make: str, model: str) -> str:
@@ -165,7 +81,7 @@ def classify_car(make: str, model: str) -> str:
     if info:
         return info["category"]
     # Default: economic (unknown cars treated as economic)
-    return "economic"
+    return DEFAULT_CATEGORY
 
 
 def estimate_price(
@@ -178,20 +94,47 @@ def estimate_price(
     """
     Estimate the current market value of a car in JOD using crisp logic.
 
-    Returns a dict with all computation details.
+    Served from the precomputed valuation grid; falls back to computing the
+    estimate directly for a custom base price or years before the grid range.
+
+    Returns a dict with all computation details, including the
+    catalog_version the estimate was computed from.
     """
-    info = _lookup_car(make, model)
+    catalog = get_catalog()
+    grid = catalog.valuation_grid()
+    if custom_base_price or not grid.covers(year):
+        return _estimate_price_direct(make, model, year, mileage_km, custom_base_price)
+
+    match = catalog.index.resolve(make, model)
+    row = grid.row_for(match.make, match.model) if match else 0
+    result = grid.estimate(make, model, row, year, mileage_km)
+    result["catalog_version"] = catalog.version
+    return result
+
+
+def _estimate_price_direct(
+    make: str,
+    model: str,
+    year: int,
+    mileage_km: int = 0,
+    custom_base_price: float = None,
+) -> Dict:
+    """Compute an estimate from the rules on every call (the pre-grid path)."""
+    catalog = get_catalog()
+    match = catalog.index.resolve(make, model)
+    info = catalog.cars[match.make][match.model] if match else None
     current_year = datetime.date.today().year
 
     if info:
+        make, model = match.make, match.model
         category = info["category"]
         base_price = custom_base_price or info["base_price"]
     else:
-        category = "economic"
-        base_price = custom_base_price or 18_000  # default fallback
+        category = DEFAULT_CATEGORY
+        base_price = custom_base_price or DEFAULT_BASE_PRICE
 
     age = max(0, current_year - year)
-    rate = DEPRECIATION_RATES[category]
+    rate = catalog.rate_for(info)
 
     # Compound depreciation: value = base * (1 - rate)^age
     depreciation_factor = (1 - rate) ** age
@@ -199,7 +142,7 @@ def estimate_price(
 
     # Mileage penalty
     mileage_penalty_pct = 0.0
-    for threshold, penalty in MILEAGE_PENALTIES:
+    for threshold, penalty in catalog.mileage_penalties:
         if mileage_km >= threshold:
             mileage_penalty_pct = penalty
             break
@@ -225,23 +168,199 @@ def estimate_price(
         "depreciation_pct": total_depreciation_pct,
         "breakdown": {
             "car_age_years": age,
-            "annual_depreciation_rate": f"{rate*100:.0f}%",
+            "annual_depreciation_rate": rate_label(rate),
             "age_depreciation_factor": round(depreciation_factor, 4),
             "value_after_age": depreciated_value,
             "mileage_penalty_pct": f"{mileage_penalty_pct*100:.0f}%",
             "mileage_deduction_jod": mileage_deduction,
             "floor_price_jod": floor_price,
         },
+        "catalog_version": catalog.version,
+    }
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    Round an array to 2 decimals exactly like Python's round(x, 2).
+
+    np.round() scales by 100 first, which can flip ties (x.xx5) the other way.
+    Those near-tie values are few, so they are re-rounded with round().
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        rounded.flat[i] = round(float(values.flat[i]), 2)
+    return rounded
+
+
+def estimate_prices_batch(
+    makes: Sequence[str],
+    models: Sequence[str],
+    years: Sequence[int],
+    mileages_km: Sequence[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized version of estimate_price() for many cars at once.
+
+    Takes columnar inputs (one sequence per field, all the same length) and
+    applies the same lookup, compound depreciation, mileage penalty and floor
+    clamp as estimate_price(), but in a single NumPy pass.
+
+    Returns a dict of equal-length arrays, in input order:
+    category, original_price_jod, depreciated_price_jod, depreciation_pct.
+    """
+    n = len(makes)
+    if len(models) != n or len(years) != n:
+        raise ValueError("makes, models and years must have the same length")
+    if mileages_km is None:
+        mileages_km = np.zeros(n, dtype=np.int64)
+    elif len(mileages_km) != n:
+        raise ValueError("mileages_km must have the same length as makes")
+
+    catalog = get_catalog()
+    categories, base_price, rates = _resolve_rows(makes, models, catalog)
+    years = np.asarray(years, dtype=np.int64)
+    mileages_km = np.asarray(mileages_km, dtype=np.int64)
+
+    current_year = datetime.date.today().year
+    age = np.maximum(0, current_year - years)
+    final_price, total_depreciation_pct = _depreciate(
+        base_price, rates, age, _mileage_penalty_pcts(mileages_km, catalog),
+    )
+
+    return {
+        "category": categories,
+        "original_price_jod": base_price,
+        "depreciated_price_jod": final_price,
+        "depreciation_pct": total_depreciation_pct,
+    }
+
+
+def _resolve_rows(makes: Sequence[str], models: Sequence[str], catalog):
+    """
+    Catalog data for many (make, model) rows: category, base price and depreciation rate.
+
+    Each distinct pair is resolved once and scattered back to its rows.
+    Unknown cars get the default category and base price.
+    """
+    pair_ids = np.empty(len(makes), dtype=np.int64)
+    pair_slots: Dict[tuple, int] = {}
+    pair_category, pair_base, pair_rate = [], [], []
+    for i, (make, model) in enumerate(zip(makes, models)):
+        key = (make.strip().lower(), model.strip().lower())
+        slot = pair_slots.get(key)
+        if slot is None:
+            slot = len(pair_category)
+            pair_slots[key] = slot
+            match = catalog.index.resolve(*key)
+            info = catalog.cars[match.make][match.model] if match else None
+            category = info["category"] if info else DEFAULT_CATEGORY
+            pair_category.append(category)
+            pair_base.append(info["base_price"] if info else DEFAULT_BASE_PRICE)
+            pair_rate.append(catalog.rate_for(info))
+        pair_ids[i] = slot
+
+    return (
+        np.asarray(pair_category, dtype=object)[pair_ids],
+        np.asarray(pair_base, dtype=np.float64)[pair_ids],
+        np.asarray(pair_rate, dtype=np.float64)[pair_ids],
+    )
+
+
+def estimate_price_schedule(
+    make: str,
+    model: str,
+    year: int,
+    mileages_km: Sequence[int] = None,
+    years_ahead: int = 5,
+) -> Dict:
+    """
+    Value curve of one car over calendar years × mileages, in one array pass.
+
+    Rows run from the model year (age 0) to years_ahead years from now; columns
+    are the given mileages (DEFAULT_SCHEDULE_MILEAGES if omitted). Each cell
+    applies the same rules as estimate_price() for the car's age in that year,
+    so the current-year row matches estimate_price() exactly.
+
+    Returns a columnar dict: calendar_years and ages label the rows, mileage_km
+    labels the columns, and prices_jod / depreciation_pct are row-major grids.
+    """
+    catalog = get_catalog()
+    match = catalog.index.resolve(make, model)
+    info = catalog.cars[match.make][match.model] if match else None
+    if info:
+        make, model = match.make, match.model
+        category, base_price = info["category"], info["base_price"]
+    else:
+        category, base_price = DEFAULT_CATEGORY, DEFAULT_BASE_PRICE
+    if mileages_km is None:
+        mileages_km = DEFAULT_SCHEDULE_MILEAGES
+
+    current_year = datetime.date.today().year
+    calendar_years = np.arange(min(year, current_year), current_year + years_ahead + 1)
+    ages = np.maximum(0, calendar_years - year)
+    mileages_km = np.asarray(mileages_km, dtype=np.int64)
+
+    # (years, 1) ages against (1, mileages) penalties broadcast to the full grid
+    prices, depreciation_pct = _depreciate(
+        np.float64(base_price),
+        catalog.rate_for(info),
+        ages[:, None],
+        _mileage_penalty_pcts(mileages_km, catalog)[None, :],
+    )
+
+    return {
+        "make": make.strip().title(),
+        "model": model.strip().title(),
+        "year": year,
+        "category": category,
+        "original_price_jod": base_price,
+        "current_year": current_year,
+        "calendar_years": calendar_years.tolist(),
+        "ages": ages.tolist(),
+        "mileage_km": mileages_km.tolist(),
+        "prices_jod": prices.tolist(),
+        "depreciation_pct": depreciation_pct.tolist(),
     }
 
 
+def _mileage_penalty_pcts(mileages_km: np.ndarray, catalog) -> np.ndarray:
+    """Mileage penalty per element; np.select takes the first match, like the loop in estimate_price()."""
+    return np.select(
+        [mileages_km >= threshold for threshold, _ in catalog.mileage_penalties],
+        [penalty for _, penalty in catalog.mileage_penalties],
+        default=0.0,
+    )
+
+
+def _depreciate(base_price, rates, age, mileage_penalty_pct):
+    """
+    The estimate_price() arithmetic on broadcastable arrays.
+
+    Returns (final_price, depreciation_pct) with the same rounding steps and
+    5% floor as the scalar path.
+    """
+    # Compound depreciation: value = base * (1 - rate)^age
+    depreciation_factor = (1 - rates) ** age
+    depreciated_value = _round2(base_price * depreciation_factor)
+
+    mileage_deduction = _round2(depreciated_value * mileage_penalty_pct)
+    final_price = _round2(depreciated_value - mileage_deduction)
+
+    # Never go below 5% of base price
+    floor_price = _round2(np.asarray(base_price * 0.05))
+    final_price = np.maximum(final_price, floor_price)
+
+    depreciation_pct = _round2((1 - final_price / base_price) * 100)
+    return final_price, depreciation_pct
+
+
 def get_all_makes() -> list:
     """Return a sorted list of all known car makes."""
-    return sorted(CAR_DATABASE.keys())
+    return sorted(get_catalog().cars.keys())
 
 
 def get_models_for_make(make: str) -> list:
     """Return a sorted list of known models for a given make."""
-    make_key = make.strip().lower()
-    data = CAR_DATABASE.get(make_key, {})
-    return sorted(data.keys())
+    return get_lookup_index().models_for(make)
@@ -0,0 +1,127 @@
+"""
+Price Range — Monte Carlo P10/P50/P90 around the crisp price estimate.
+
+estimate_price() gives one number. Real sale prices scatter around it: trims
+and condition move the base price, some models hold value better than their
+category's rate, and mileage hurts some buyers more than others. This module
+samples those three effects per category and reports percentiles of the
+resulting prices.
+
+For every car, each draw applies:
+
+    base     = base_price * exp(N(0, base_sd))             base-price noise
+    rate     = clip(rate + N(0, rate_sd), 0, MAX_RATE)     depreciation rate
+    penalty  = mileage_penalty * exp(N(0, mileage_sd))     mileage effect
+    price    = max(base * (1 - rate)^age * (1 - penalty), 5% of base)
+
+All draws for a chunk of cars are one (cars × draws) NumPy array, so a single
+car costs well under a millisecond and batches scale linearly. Pass a seed
+for reproducible ranges.
+"""
+import datetime
+from typing import Dict, NamedTuple, Sequence
+
+import numpy as np
+
+from ai_engine.catalog import get_catalog
+from ai_engine.price_estimator import _mileage_penalty_pcts, _resolve_rows
+
+DEFAULT_DRAWS = 2000
+PERCENTILES = (10, 50, 90)
+MAX_RATE = 0.5
+# Upper bound on cars × draws per vectorized pass (~8 MB per float64 array)
+MAX_CELLS_PER_CHUNK = 1_000_000
+
+
+class Uncertainty(NamedTuple):
+    """Spread of the sampled effects for one category."""
+    base_sd: float      # log-scale sd of the base price
+    rate_sd: float      # absolute sd of the annual depreciation rate
+    mileage_sd: float   # log-scale sd of the mileage penalty
+
+
+UNCERTAINTY: Dict[str, Uncertainty] = {
+    "luxury": Uncertainty(base_sd=0.10, rate_sd=0.025, mileage_sd=0.40),
+    "premium": Uncertainty(base_sd=0.08, rate_sd=0.020, mileage_sd=0.35),
+    "economic": Uncertainty(base_sd=0.06, rate_sd=0.015, mileage_sd=0.30),
+}
+DEFAULT_UNCERTAINTY = Uncertainty(base_sd=0.10, rate_sd=0.025, mileage_sd=0.40)
+
+
+def estimate_price_range(
+    make: str,
+    model: str,
+    year: int,
+    mileage_km: int = 0,
+    draws: int = DEFAULT_DRAWS,
+    seed: int = None,
+) -> Dict:
+    """
+    P10/P50/P90 price range for one car, in JOD.
+
+    Returns a dict with p10_jod, p50_jod, p90_jod and the number of draws.
+    """
+    result = estimate_price_ranges_batch([make], [model], [year], [mileage_km], draws=draws, seed=seed)
+    return {
+        **{f"p{p}_jod": result[f"p{p}_jod"][0].item() for p in PERCENTILES},
+        "draws": draws,
+    }
+
+
+def estimate_price_ranges_batch(
+    makes: Sequence[str],
+    models: Sequence[str],
+    years: Sequence[int],
+    mileages_km: Sequence[int] = None,
+    draws: int = DEFAULT_DRAWS,
+    seed: int = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized price ranges for many cars at once (columnar inputs, like estimate_prices_batch()).
+
+    Returns a dict of equal-length float arrays, in input order: p10_jod,
+    p50_jod and p90_jod. Cars are processed in chunks of at most
+    MAX_CELLS_PER_CHUNK cells, so memory is bounded for any batch size.
+    """
+    if draws <= 0:
+        raise ValueError("draws must be positive")
+    n = len(makes)
+    if mileages_km is None:
+        mileages_km = np.zeros(n, dtype=np.int64)
+
+    if len(models) != n or len(years) != n or len(mileages_km) != n:
+        raise ValueError("makes, models, years and mileages_km must have the same length")
+
+    catalog = get_catalog()
+    categories, base_price, rates = _resolve_rows(makes, models, catalog)
+    spreads = np.asarray([UNCERTAINTY.get(c, DEFAULT_UNCERTAINTY) for c in categories], dtype=np.float64)
+    spreads = spreads.reshape(n, len(Uncertainty._fields))
+    age = np.maximum(0, datetime.date.today().year - np.asarray(years, dtype=np.int64))
+    mileages_km = np.asarray(mileages_km, dtype=np.int64)
+    penalty = _mileage_penalty_pcts(mileages_km, catalog)
+
+    rng = np.random.default_rng(seed)
+    out = np.empty((len(PERCENTILES), n), dtype=np.float64)
+    step = max(1, MAX_CELLS_PER_CHUNK // draws)
+    for start in range(0, n, step):
+        rows = slice(start, start + step)
+        out[:, rows] = _simulate(
+            rng, draws, base_price[rows], rates[rows], age[rows], penalty[rows], spreads[rows],
+        )
+
+    out = np.round(out, 2)
+    return {f"p{p}_jod": out[i] for i, p in enumerate(PERCENTILES)}
+
+
+def _simulate(rng, draws, base_price, rates, age, penalty, spreads) -> np.ndarray:
+    """Sample (cars × draws) prices and return their percentiles, shape (len(PERCENTILES), cars)."""
+    shape = (len(base_price), draws)
+    base_sd, rate_sd, mileage_sd = (spreads[:, i, None] for i in range(spreads.shape[1]))
+
+    base = base_price[:, None] * np.exp(rng.standard_normal(shape) * base_sd)
+    rate = np.clip(rates[:, None] + rng.standard_normal(shape) * rate_sd, 0.0, MAX_RATE)
+    mileage = np.minimum(penalty[:, None] * np.exp(rng.standard_normal(shape) * mileage_sd), 1.0)
+
+    price = base * (1 - rate) ** age[:, None] * (1 - mileage)
+    np.maximum(price, base * 0.05, out=price)
+    return np.percentile(price, PERCENTILES, axis=1)
@@ -0,0 +1,312 @@
+"""
+Client-side rate limiting and retries for Gemini calls.
+
+RateLimiter is a token bucket sized to the Gemini quota: GEMINI_RPM tokens
+per minute, holding at most GEMINI_RATE_LIMIT_BURST. Every upstream call
+takes one token and waits in its lane when none is left:
+
+  - interactive: chat turns a user is waiting for. It is served first, and
+    BACKGROUND_RESERVE of the burst is kept for it.
+  - background: summarization and batch jobs. It only takes a token while no
+    interactive caller is waiting and the reserve stays intact.
+
+A caller still waiting after its lane's max wait gets RateLimitTimeout.
+GEMINI_RPM=0 turns the bucket off; retries still apply.
+
+With a shared-state backend (ai_engine/shared_state.py) the tokens come from
+one bucket that all workers share, and GEMINI_RPM is the whole quota. The
+lanes still order each worker's own callers. If the backend is unavailable,
+each worker falls back to its local bucket.
+
+Calls that fail with a rate limit (429 / RESOURCE_EXHAUSTED) or a transient
+server error (500 / 503 / 504) are retried up to GEMINI_MAX_RETRIES times.
+The delay is exponential backoff with full jitter, and never shorter than the
+retry hint the API sent (RetryInfo.retryDelay, or a Retry-After header). A
+429 also holds the whole bucket for the hinted time, so other callers do not
+walk into the same limit. A retry that would wait longer than
+GEMINI_RETRY_MAX_DELAY is not made: the error goes back to the caller.
+
+Counters are per worker process.
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from ai_engine.shared_state import SharedStateUnavailable, get_shared_state
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE, BACKGROUND)
+# Share of the burst background calls may not use
+BACKGROUND_RESERVE = 0.25
+# Background callers wait this many times longer than interactive ones
+BACKGROUND_WAIT_FACTOR = 5
+SHARED_BUCKET = 'gemini-bucket'
+
+_RETRY_DELAY_RE = re.compile(r"retry(?:Delay['\"]?:\s*['\"]?| in )(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+_RATE_LIMIT_MARKERS = ('429', 'RESOURCE_EXHAUSTED')
+_TRANSIENT_MARKERS = ('500 INTERNAL', '503', 'UNAVAILABLE', '504', 'DEADLINE_EXCEEDED')
+
+
+class RateLimitTimeout(Exception):
+    """No token came free within the lane's max wait."""
+
+    def __str__(self):
+        return f"429 RESOURCE_EXHAUSTED (client-side): {super().__str__()}"
+
+
+class RateLimiter:
+    """Token bucket with priority lanes, shared by all threads and coroutines of a worker."""
+
+    def __init__(self, rpm: int = 0, burst: int = 10, max_wait: float = 20.0, shared=None):
+        self.rpm = rpm
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._rate = rpm / 60.0
+        self._shared = shared
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._waiting = {lane: 0 for lane in LANES}
+        self._cond = threading.Condition()
+        self._lanes = {
+            lane: {'acquired': 0, 'queued': 0, 'timeouts': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+            for lane in LANES
+        }
+        self._retries = {'retries': 0, 'rate_limited': 0, 'transient': 0, 'gave_up': 0, 'holds': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0
+
+    def acquire(self, lane: str = INTERACTIVE) -> float:
+        """Take a token, waiting in `lane`. Returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        deadline = start + self._max_wait(lane)
+        delay = self._try_take(lane)
+        if delay:
+            with self._cond:
+                self._waiting[lane] += 1
+            try:
+                while delay:
+                    remaining = deadline - time.monotonic()
+                    with self._cond:
+                        if remaining <= 0:
+                            self._lanes[lane]['timeouts'] += 1
+                            raise RateLimitTimeout(f"no {lane} token within {self._max_wait(lane):g}s")
+                        self._cond.wait(min(delay, remaining))
+                    delay = self._try_take(lane)
+            finally:
+                with self._cond:
+                    self._waiting[lane] -= 1
+                    # Background callers re-check once the interactive queue drains
+                    self._cond.notify_all()
+        with self._cond:
+            return self._record_wait(lane, start)
+
+    async def aacquire(self, lane: str = INTERACTIVE) -> float:
+        """Async version of acquire(): sleeps on the event loop instead of blocking."""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        deadline = start + self._max_wait(lane)
+        delay = await self._atry_take(lane)
+        if not delay:
+            with self._cond:
+                return self._record_wait(lane, start)
+        with self._cond:
+            self._waiting[lane] += 1
+        try:
+            while delay:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self._lanes[lane]['timeouts'] += 1
+                    raise RateLimitTimeout(f"no {lane} token within {self._max_wait(lane):g}s")
+                await asyncio.sleep(min(delay, remaining))
+                delay = await self._atry_take(lane)
+        finally:
+            with self._cond:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+        with self._cond:
+            return self._record_wait(lane, start)
+
+    def hold(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (the API said to back off)."""
+        if not self.enabled or seconds <= 0:
+            return
+        with self._cond:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._retries['holds'] += 1
+            if self._shared is not None:
+                try:
+                    self._shared.hold(SHARED_BUCKET, seconds)
+                except SharedStateUnavailable:
+                    pass
+
+    def record_retry(self, reason: str) -> None:
+        with self._cond:
+            self._retries['retries'] += 1
+            self._retries[reason] += 1
+
+    def record_gave_up(self) -> None:
+        with self._cond:
+            self._retries['gave_up'] += 1
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._refill()
+            lanes = {lane: dict(counters) for lane, counters in self._lanes.items()}
+            for lane, counters in lanes.items():
+                counters['waiting'] = self._waiting[lane]
+                counters['wait_ms_mean'] = (
+                    round(counters['wait_ms_total'] / counters['acquired'], 1) if counters['acquired'] else None
+                )
+                counters['wait_ms_total'] = round(counters['wait_ms_total'], 1)
+                counters['wait_ms_max'] = round(counters['wait_ms_max'], 1)
+            return {
+                'enabled': self.enabled, 'rpm': self.rpm, 'burst': self.burst,
+                'shared': self._shared is not None and self._shared.available(),
+                'local_tokens': round(self._tokens, 2), 'lanes': lanes, **self._retries,
+            }
+
+    # -- taking a token ---------------------------------------------------
+    # The shared backend is a network (or file) round trip: it is called
+    # without holding the lock, and off the event loop for async callers.
+
+    def _try_take(self, lane: str) -> float:
+        """0 if a token was taken, else the seconds until it is worth trying again."""
+        with self._cond:
+            delay, needed = self._gate(lane)
+            if delay or self._shared is None:
+                return delay or self._take_local(needed)
+        try:
+            return self._shared.take_token(SHARED_BUCKET, self._rate, self.burst, needed)
+        except SharedStateUnavailable:
+            with self._cond:
+                return self._take_local(needed)
+
+    async def _atry_take(self, lane: str) -> float:
+        """Async version of _try_take()."""
+        with self._cond:
+            delay, needed = self._gate(lane)
+            if delay or self._shared is None:
+                return delay or self._take_local(needed)
+        try:
+            return await asyncio.to_thread(
+                self._shared.take_token, SHARED_BUCKET, self._rate, self.burst, needed,
+            )
+        except SharedStateUnavailable:
+            with self._cond:
+                return self._take_local(needed)
+
+    # -- internals (lock held) -------------------------------------------
+
+    def _max_wait(self, lane: str) -> float:
+        return self.max_wait * (BACKGROUND_WAIT_FACTOR if lane == BACKGROUND else 1)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if now < self._resume_at:
+            self._updated = now
+            return
+        start = max(self._updated, self._resume_at)
+        self._tokens = min(self.burst, self._tokens + (now - start) * self._rate)
+        self._updated = now
+
+    def _gate(self, lane: str) -> Tuple[float, float]:
+        """(seconds to wait before trying at all, tokens the bucket must hold for `lane`)."""
+        self._refill()
+        now = time.monotonic()
+        if now < self._resume_at:
+            return self._resume_at - now, 0.0
+        needed = 1.0
+        if lane == BACKGROUND:
+            if self._waiting[INTERACTIVE]:
+                return 1.0 / self._rate, 0.0
+            needed += BACKGROUND_RESERVE * self.burst
+        return 0.0, needed
+
+    def _take_local(self, needed: float) -> float:
+        if self._tokens >= needed:
+            self._tokens -= 1.0
+            return 0.0
+        return (needed - self._tokens) / self._rate
+
+    def _record_wait(self, lane: str, start: float) -> float:
+        waited = time.monotonic() - start
+        counters = self._lanes[lane]
+        counters['acquired'] += 1
+        if waited > 0.001:
+            counters['queued'] += 1
+        counters['wait_ms_total'] += waited * 1000
+        counters['wait_ms_max'] = max(counters['wait_ms_max'], waited * 1000)
+        return waited
+
+
+# ---------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """'rate_limited' or 'transient' if the call is worth retrying, else None."""
+    if isinstance(error, RateLimitTimeout):
+        return None
+    code = getattr(error, 'code', None)
+    message = str(error)
+    if code == 429 or any(marker in message for marker in _RATE_LIMIT_MARKERS):
+        return 'rate_limited'
+    if code in (500, 503, 504) or any(marker in message for marker in _TRANSIENT_MARKERS):
+        return 'transient'
+    return None
+
+
+def retry_hint(error: Exception) -> Optional[float]:
+    """Seconds the API asked us to wait, from a Retry-After header or RetryInfo.retryDelay."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers:
+        try:
+            value = headers.get('retry-after')
+            if value:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+    match = _RETRY_DELAY_RE.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, hint: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff for retry `attempt` (0-based), at least `hint`."""
+    base = settings.GEMINI_RETRY_BASE_DELAY
+    delay = random.uniform(0, min(settings.GEMINI_RETRY_MAX_DELAY, base * 2 ** attempt))
+    if hint is not None:
+        # Honor the hint, plus a little jitter so held-back callers do not return together
+        delay = max(delay, hint + random.uniform(0, base))
+    return delay
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(
+                    rpm=settings.GEMINI_RPM,
+                    burst=settings.GEMINI_RATE_LIMIT_BURST,
+                    max_wait=settings.GEMINI_QUEUE_TIMEOUT,
+                    shared=get_shared_state(),
+                )
+    return _rate_limiter
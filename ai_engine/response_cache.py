@@ -0,0 +1,280 @@
+"""
+Response cache for repeated chat questions.
+
+Much of the chat traffic is the same few opening questions ("best family car
+under 20k JOD", "is Corolla reliable"). CarChatbotAgent looks them up here
+before calling Gemini.
+
+Only first-turn and short conversations are cached: at most
+RESPONSE_CACHE_MAX_HISTORY earlier messages. Entries are keyed by the
+normalized conversation (case, accents, punctuation and whitespace folded)
+plus a namespace of model and system-prompt hash, so a new prompt version or
+model never serves old answers. Entries expire after RESPONSE_CACHE_TTL
+seconds, and the least recently used ones are evicted beyond
+RESPONSE_CACHE_SIZE.
+
+First-turn questions also go into a similarity index. Each is a hashed
+character-trigram vector (L2-normalized) in one NumPy matrix, so a lookup is
+a single matrix-vector product. A near-duplicate is served when its cosine is
+at least RESPONSE_CACHE_SIMILARITY and it has the same words as the question
+apart from filler and word order, with car names compared by the catalog car
+they resolve to (car_lookup.py). So "under 20k" never matches "under 30k",
+"reliable" never matches "not reliable", and "Camry LE" or "Model X" never
+match "Camry" or "Model S", while "whats the best ..." still matches "best ...".
+
+With a shared-state backend (ai_engine/shared_state.py), exact entries are
+also written there, so one worker's answer serves every worker. A local miss
+checks the backend before calling Gemini, and an answer found there joins the
+local cache and similarity index. Near-duplicate matching stays local.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from ai_engine.catalog import get_catalog
+from ai_engine.shared_state import SharedStateUnavailable, get_shared_state
+
+VECTOR_DIM = 1024
+NGRAM = 3
+_WORD_RE = re.compile(r"[^\w\s]+")
+# Filler left out of similarity vectors ("what is the best ..." ~ "best ...")
+_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'is', 'are', 'was', 'what', 'whats', 'which', 'please', 'pls', 'me', 'i',
+    'can', 'could', 'you', 'tell', 'about', 'of', 'for', 'to', 'do', 'does', 'hi', 'hello', 'thanks',
+})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.replace("'", '')
+    return ' '.join(_WORD_RE.sub(' ', text).split())
+
+
+def ngram_vector(normalized: str) -> np.ndarray:
+    """L2-normalized hashed character-trigram counts of the text without filler words."""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    words = [w for w in normalized.split() if w not in _STOPWORDS] or normalized.split()
+    padded = f" {' '.join(words)} "
+    for i in range(len(padded) - NGRAM + 1):
+        vector[zlib.crc32(padded[i:i + NGRAM].encode('utf-8')) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _guards(normalized: str) -> FrozenSet[str]:
+    """Words other than filler, with car mentions as their catalog car: a near-duplicate must have the same."""
+    words = [w for w in normalized.split() if w not in _STOPWORDS]
+    terms = set()
+    start = 0
+    for begin, end, car in get_catalog().index.find_cars(words):
+        terms.update(words[start:begin])
+        terms.add(f"car:{car.make}/{car.model}")
+        if car.model and car.method == 'alias':
+            # Trim designations share a model: "c200" and "c300" are both the C-Class
+            terms.add(words[end - 1])
+        start = end
+    terms.update(words[start:])
+    return frozenset(terms)
+
+
+class _Entry:
+    __slots__ = ('result', 'expires_at', 'latency_ms', 'namespace', 'guards', 'slot')
+
+    def __init__(self, result, expires_at, latency_ms, namespace, guards, slot):
+        self.result = result
+        self.expires_at = expires_at
+        self.latency_ms = latency_ms
+        self.namespace = namespace
+        self.guards = guards
+        self.slot = slot            # row in the similarity matrix, or None
+
+
+class ResponseCache:
+    """Exact + near-duplicate response cache with TTL and LRU eviction (one per worker)."""
+
+    def __init__(self, max_entries: int = 2000, ttl: float = 6 * 3600, similarity: float = 0.88,
+                 max_history: int = 2, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_history = max_history
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._vectors = np.zeros((max_entries, VECTOR_DIM), dtype=np.float32)
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._counters = {
+            'lookups': 0, 'exact_hits': 0, 'similar_hits': 0, 'shared_hits': 0, 'uncacheable': 0,
+            'stores': 0, 'evicted': 0, 'expired': 0, 'saved_ms': 0,
+        }
+
+    def cacheable(self, history: Optional[List[Dict]]) -> bool:
+        return len(history or []) <= self.max_history
+
+    def lookup(self, message: str, history: Optional[List[Dict]], namespace: str) -> Optional[Tuple[Dict, str]]:
+        """(cached result, 'exact' or 'similar'), or None."""
+        with self._lock:
+            self._counters['lookups'] += 1
+            if not self.cacheable(history):
+                self._counters['uncacheable'] += 1
+                return None
+            normalized = normalize(message)
+            key = _key(namespace, history, normalized)
+            entry = self._live(key)
+            kind = 'exact'
+            if entry is None and not history:
+                entry = self._nearest(normalized, namespace)
+                kind = 'similar'
+            if entry is not None:
+                self._counters[f'{kind}_hits'] += 1
+                self._counters['saved_ms'] += entry.latency_ms
+                return entry.result, kind
+
+        shared = self._shared_get(key)
+        if shared is None:
+            return None
+        ttl = shared['expires_at'] - time.time()
+        if ttl <= 0:
+            return None
+        self._insert(key, normalized, history, namespace, shared['result'], shared['latency_ms'], ttl)
+        with self._lock:
+            self._counters['shared_hits'] += 1
+            self._counters['saved_ms'] += shared['latency_ms']
+        return shared['result'], 'exact'
+
+    def store(self, message: str, history: Optional[List[Dict]], namespace: str, result: Dict,
+              latency_ms: float) -> None:
+        if not self.cacheable(history):
+            return
+        normalized = normalize(message)
+        key = _key(namespace, history, normalized)
+        self._insert(key, normalized, history, namespace, dict(result), int(latency_ms), self.ttl)
+        if self._shared is not None:
+            value = {'result': result, 'latency_ms': int(latency_ms), 'expires_at': time.time() + self.ttl}
+            try:
+                self._shared.set(f'response:{key}', json.dumps(value), self.ttl)
+            except SharedStateUnavailable:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+        hits = counters['exact_hits'] + counters['similar_hits'] + counters['shared_hits']
+        counters['hit_rate'] = round(hits / counters['lookups'], 4) if counters['lookups'] else None
+        return {'entries': entries, 'max_entries': self.max_entries, **counters}
+
+    def _shared_get(self, key: str) -> Optional[Dict]:
+        if self._shared is None:
+            return None
+        try:
+            raw = self._shared.get(f'response:{key}')
+        except SharedStateUnavailable:
+            return None
+        return json.loads(raw) if raw else None
+
+    def _insert(self, key: str, normalized: str, history: Optional[List[Dict]], namespace: str,
+                result: Dict, latency_ms: int, ttl: float) -> None:
+        vector = ngram_vector(normalized) if not history else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._release(old)
+            slot = None
+            if vector is not None:
+                if not self._free_slots:
+                    self._evict_oldest()
+                slot = self._free_slots.pop()
+                self._vectors[slot] = vector
+                self._slot_keys[slot] = key
+            self._entries[key] = _Entry(result, time.monotonic() + ttl, latency_ms,
+                                        namespace, _guards(normalized), slot)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+            self._counters['stores'] += 1
+
+    # -- internals (lock held) -------------------------------------------
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self._counters['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, normalized: str, namespace: str) -> Optional[_Entry]:
+        if len(self._free_slots) == self.max_entries:
+            return None
+        scores = self._vectors @ ngram_vector(normalized)
+        guards = _guards(normalized)
+        # Best few candidates: the top one may belong to another namespace or differ in a number
+        for slot in np.argsort(scores)[::-1][:5].tolist():
+            if scores[slot] < self.similarity:
+                break
+            key = self._slot_keys[slot]
+            entry = self._live(key) if key else None
+            if entry is not None and entry.namespace == namespace and entry.guards == guards:
+                return entry
+        return None
+
+    def _evict_oldest(self) -> None:
+        key, entry = self._entries.popitem(last=False)
+        self._release(entry)
+        self._counters['evicted'] += 1
+
+    def _drop(self, key: str) -> None:
+        self._release(self._entries.pop(key))
+
+    def _release(self, entry: _Entry) -> None:
+        if entry.slot is not None:
+            self._vectors[entry.slot] = 0.0
+            self._slot_keys[entry.slot] = None
+            self._free_slots.append(entry.slot)
+            entry.slot = None
+
+
+def _key(namespace: str, history: Optional[List[Dict]], normalized: str) -> str:
+    turns = [f"{m['role']}:{normalize(m['content'])}" for m in history or []]
+    raw = '\x1f'.join([namespace, *turns, f"user:{normalized}"])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prompt_namespace(model: str, system_prompt: str) -> str:
+    """Cache namespace of a model + system prompt version."""
+    return f"{model}:{hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:12]}"
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """This worker's response cache, or None when RESPONSE_CACHE_SIZE is 0."""
+    global _response_cache
+    if _response_cache is None and settings.RESPONSE_CACHE_SIZE > 0:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=settings.RESPONSE_CACHE_SIZE,
+                    ttl=settings.RESPONSE_CACHE_TTL,
+                    similarity=settings.RESPONSE_CACHE_SIMILARITY,
+                    max_history=settings.RESPONSE_CACHE_MAX_HISTORY,
+                    shared=get_shared_state(),
+                )
+    return _response_cache
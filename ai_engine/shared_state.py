@@ -0,0 +1,310 @@
+"""
+Shared state for Gemini quota and caches across worker processes.
+
+The rate limiter, the response cache and single-flight coalescing are per
+process on their own. With 8 workers on 3 nodes that means 8 token buckets
+that together overshoot the quota, 8 caches to warm, and 8 upstream calls for
+one campaign prompt. SHARED_STATE_URL (default: REDIS_URL) gives them one
+backend to share:
+
+  - redis://, rediss://, unix://  Redis (needs the `redis` package); the
+                                  state for every node
+  - fakeredis://                  in-memory fakeredis, for tests
+  - sqlite:///path/to/file.db     a SQLite file: shared by the processes of
+                                  one machine; a stand-in for tests and
+                                  single-node deployments
+
+The backend offers a few atomic operations: a token bucket (take_token,
+hold), values with a TTL (get, set) and locks with an owner token
+(acquire_lock, release_lock). Redis runs the bucket as a Lua script on
+server time, so node clocks do not matter.
+
+The backend is never required. A failing call raises SharedStateUnavailable:
+callers catch it and carry on per process, and the backend is left alone for
+RETRY_INTERVAL seconds before it is tried again.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'intelliwheels:'
+# Seconds to stay in per-process mode after the backend failed
+RETRY_INTERVAL = 30
+# Backend calls sit on the request path: fail fast rather than queue behind a dead server
+SOCKET_TIMEOUT = 0.5
+
+
+class SharedStateUnavailable(Exception):
+    """The shared-state backend is not reachable; use per-process state."""
+
+
+class RedisBackend:
+    """Shared state in Redis (or fakeredis)."""
+
+    name = 'redis'
+
+    _TAKE_TOKEN = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate, burst, needed, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'resume_at')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+local resume_at = tonumber(state[3]) or 0
+if now < resume_at then
+  return tostring(resume_at - now)
+end
+tokens = math.min(burst, tokens + (now - math.max(updated, resume_at)) * rate)
+local wait = 0
+if tokens >= needed then
+  tokens = tokens - 1
+else
+  wait = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return tostring(wait)
+"""
+
+    _HOLD = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local resume_at = math.max(tonumber(redis.call('HGET', KEYS[1], 'resume_at')) or 0, now + tonumber(ARGV[1]))
+redis.call('HSET', KEYS[1], 'tokens', '0', 'updated', tostring(now), 'resume_at', tostring(resume_at))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+    _RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url: str):
+        if url.startswith('fakeredis://'):
+            import fakeredis
+            self._redis = fakeredis.FakeRedis(decode_responses=True)
+        else:
+            import redis
+            self._redis = redis.Redis.from_url(
+                url, decode_responses=True,
+                socket_timeout=SOCKET_TIMEOUT, socket_connect_timeout=SOCKET_TIMEOUT,
+            )
+        self._take_token = self._redis.register_script(self._TAKE_TOKEN)
+        self._hold = self._redis.register_script(self._HOLD)
+        self._release = self._redis.register_script(self._RELEASE)
+
+    def take_token(self, key: str, rate: float, burst: int, needed: float, ttl: int) -> float:
+        return float(self._take_token(keys=[key], args=[rate, burst, needed, ttl]))
+
+    def hold(self, key: str, seconds: float, ttl: int) -> None:
+        self._hold(keys=[key], args=[seconds, ttl])
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._redis.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def acquire_lock(self, key: str, token: str, ttl: float) -> bool:
+        return bool(self._redis.set(key, token, nx=True, px=max(1, int(ttl * 1000))))
+
+    def release_lock(self, key: str, token: str) -> None:
+        self._release(keys=[key], args=[token])
+
+
+class SQLiteBackend:
+    """
+    Shared state in a SQLite file, for the processes of one machine.
+
+    Every operation is one short transaction; BEGIN IMMEDIATE serializes the
+    writers, which is what makes the bucket and the locks atomic.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS buckets "
+                       "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, resume_at REAL)")
+
+    def take_token(self, key: str, rate: float, burst: int, needed: float, ttl: int) -> float:
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT tokens, updated, resume_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated, resume_at = row if row else (float(burst), now, 0.0)
+            if now < resume_at:
+                return resume_at - now
+            tokens = min(burst, tokens + max(0.0, now - max(updated, resume_at)) * rate)
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= 1
+            else:
+                wait = (needed - tokens) / rate
+            db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (key, tokens, now, resume_at))
+            return wait
+
+    def hold(self, key: str, seconds: float, ttl: int) -> None:
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT resume_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            resume_at = max(row[0] if row else 0.0, now + seconds)
+            db.execute("INSERT OR REPLACE INTO buckets VALUES (?, 0, ?, ?)", (key, now, resume_at))
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, now + ttl))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                db.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+
+    def acquire_lock(self, key: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            return db.execute("INSERT OR IGNORE INTO kv VALUES (?, ?, ?)", (key, token, now + ttl)).rowcount == 1
+
+    def release_lock(self, key: str, token: str) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM kv WHERE key = ? AND value = ?", (key, token))
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=SOCKET_TIMEOUT, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+
+class _Transaction:
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SharedState:
+    """
+    A backend behind a circuit: calls raise SharedStateUnavailable while it
+    is down, and for RETRY_INTERVAL seconds after each failure.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.backend = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'errors': 0, 'skipped': 0}
+        self._last_error = None
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def take_token(self, name: str, rate: float, burst: int, needed: float = 1.0, ttl: int = 3600) -> float:
+        """0 if a token was taken from bucket `name`, else the seconds to wait."""
+        return self._call('take_token', KEY_PREFIX + name, rate, burst, needed, ttl)
+
+    def hold(self, name: str, seconds: float, ttl: int = 3600) -> None:
+        self._call('hold', KEY_PREFIX + name, seconds, ttl)
+
+    def get(self, name: str) -> Optional[str]:
+        return self._call('get', KEY_PREFIX + name)
+
+    def set(self, name: str, value: str, ttl: float) -> None:
+        self._call('set', KEY_PREFIX + name, value, ttl)
+
+    def acquire_lock(self, name: str, token: str, ttl: float) -> bool:
+        return self._call('acquire_lock', KEY_PREFIX + name, token, ttl)
+
+    def release_lock(self, name: str, token: str) -> None:
+        self._call('release_lock', KEY_PREFIX + name, token)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'backend': self.backend.name if self.backend else _scheme(self.url),
+            'available': self.available(),
+            'last_error': self._last_error,
+            **counters,
+        }
+
+    def _call(self, operation: str, *args):
+        if not self.available():
+            with self._lock:
+                self._counters['skipped'] += 1
+            raise SharedStateUnavailable(self._last_error)
+        with self._lock:
+            self._counters['calls'] += 1
+        try:
+            if self.backend is None:
+                self.backend = _open_backend(self.url)
+            return getattr(self.backend, operation)(*args)
+        except Exception as e:
+            self._down_until = time.monotonic() + RETRY_INTERVAL
+            with self._lock:
+                self._counters['errors'] += 1
+            self._last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Shared state backend unavailable, per-process mode for {RETRY_INTERVAL}s: {e}")
+            raise SharedStateUnavailable(self._last_error) from e
+
+
+def _scheme(url: str) -> str:
+    return url.split('://', 1)[0]
+
+
+def _open_backend(url: str):
+    scheme = _scheme(url)
+    if scheme in ('redis', 'rediss', 'unix', 'fakeredis'):
+        return RedisBackend(url)
+    if scheme == 'sqlite':
+        path = url[len('sqlite:///'):]
+        if not os.path.isabs(path):
+            path = os.path.join(str(settings.BASE_DIR), path)
+        return SQLiteBackend(path)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {scheme}")
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """The shared-state backend, or None when SHARED_STATE_URL is not set (per-process mode)."""
+    global _shared_state
+    url = getattr(settings, 'SHARED_STATE_URL', '')
+    if _shared_state is None and url:
+        with _shared_state_lock:
+            if _shared_state is None:
+                _shared_state = SharedState(url)
+    return _shared_state
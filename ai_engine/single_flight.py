@@ -0,0 +1,261 @@
+"""
+Single-flight request coalescing for Gemini calls.
+
+When many users send the same prompt at once (a campaign goes out), each
+request would otherwise make its own identical Gemini call. SingleFlight lets
+the first caller for a key make the call; callers with the same key that
+arrive while it is pending wait for that result instead. Once the call
+returns the key is free again: this deduplicates in-flight work, it is not a
+cache (see ai_engine/response_cache.py).
+
+Keys are hashes of everything that determines the request (request_key()):
+kind, model, system prompt or prompt, and the message or image content. The
+generation config is built from these, so it needs no part of its own.
+Blocking callers on any thread of the worker share one map. Coroutines share
+one map per event loop, so an async caller never blocks its loop waiting on
+a thread. Followers get a copy of the leader's result; an exception raised by
+the leader is raised in every follower. If an async leader is cancelled (its
+client went away), its followers start over and one of them leads.
+
+With a shared-state backend (ai_engine/shared_state.py), each worker's leader
+also claims the key in the backend. Only the claim's owner calls Gemini. It
+publishes the result for RESULT_TTL seconds, which the other workers' leaders
+poll for. A worker stops waiting and makes the call itself when the owner
+lets go without a result, after LOCK_TTL, or when the backend becomes
+unavailable. Results cross processes as JSON.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import secrets
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from ai_engine.shared_state import SharedStateUnavailable, get_shared_state
+
+# Longest a claim is held (and waited for): well above a slow model call
+LOCK_TTL = 60
+# Published results only need to outlive the followers' next poll
+RESULT_TTL = 10
+POLL_INTERVAL = 0.05
+_PENDING = object()
+_MISSING = object()
+# What an async leader leaves its followers when it is cancelled
+_ABANDONED = object()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """In-flight deduplication of identical calls, for one worker process."""
+
+    def __init__(self, shared=None):
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'upstream': 0, 'coalesced': 0, 'coalesced_shared': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """fn(), or the result of the identical call already in flight."""
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.copy(call.result)
+
+        try:
+            call.result = self._lead(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of do(), for coroutines on the running event loop."""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            self._counters['calls'] += 1
+
+        while True:
+            with self._lock:
+                future = self._async_calls.get(loop_key)
+                leader = future is None
+                if leader:
+                    future = self._async_calls[loop_key] = loop.create_future()
+            if leader:
+                break
+            # shield: a follower that is cancelled must not cancel the shared future
+            result = await asyncio.shield(future)
+            if result is not _ABANDONED:
+                with self._lock:
+                    self._counters['coalesced'] += 1
+                return copy.copy(result)
+
+        try:
+            result = await self._alead(key, fn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only the leader was cancelled: its followers retry rather than fail
+            future.set_result(_ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved: there may be no follower to re-raise it
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            in_flight = len(self._calls) + len(self._async_calls)
+        coalesced = counters['coalesced'] + counters['coalesced_shared']
+        counters['coalesced_rate'] = round(coalesced / counters['calls'], 4) if counters['calls'] else None
+        return {'in_flight': in_flight, 'shared': self._shared is not None, **counters}
+
+    # -- leaders -----------------------------------------------------------
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Any:
+        """fn() for this worker's leader, unless another worker is already making the call."""
+        token = self._claim(key)
+        if token is _PENDING:
+            deadline = time.monotonic() + LOCK_TTL
+            result = _PENDING
+            while result is _PENDING and time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                result = self._poll(key)
+            if result is not _PENDING and result is not _MISSING:
+                return result
+            token = None
+        try:
+            result = self._upstream(fn)
+            if token:
+                self._publish(key, result)
+            return result
+        finally:
+            if token:
+                self._release(key, token)
+
+    async def _alead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of _lead(); backend calls run in a thread."""
+        token = await asyncio.to_thread(self._claim, key) if self._shared is not None else None
+        if token is _PENDING:
+            deadline = time.monotonic() + LOCK_TTL
+            result = _PENDING
+            while result is _PENDING and time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                result = await asyncio.to_thread(self._poll, key)
+            if result is not _PENDING and result is not _MISSING:
+                return result
+            token = None
+        with self._lock:
+            self._counters['upstream'] += 1
+        try:
+            result = await fn()
+            if token:
+                await asyncio.to_thread(self._publish, key, result)
+            return result
+        finally:
+            if token:
+                await asyncio.to_thread(self._release, key, token)
+
+    def _upstream(self, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._counters['upstream'] += 1
+        return fn()
+
+    # -- shared state (each returns quietly when the backend is unavailable) --
+
+    def _claim(self, key: str):
+        """Our claim token if we own the key across workers, _PENDING if another worker does, else None."""
+        if self._shared is None:
+            return None
+        token = secrets.token_hex(8)
+        try:
+            return token if self._shared.acquire_lock(f'flight:{key}', token, LOCK_TTL) else _PENDING
+        except SharedStateUnavailable:
+            return None
+
+    def _poll(self, key: str):
+        """The owner's published result, _PENDING while it works, or _MISSING if it let go without one."""
+        try:
+            raw = self._shared.get(f'flight-result:{key}')
+            if raw is None and self._shared.get(f'flight:{key}') is None:
+                # Released: the result may have been published in between
+                raw = self._shared.get(f'flight-result:{key}')
+                if raw is None:
+                    return _MISSING
+        except SharedStateUnavailable:
+            return _MISSING
+        if raw is None:
+            return _PENDING
+        with self._lock:
+            self._counters['coalesced_shared'] += 1
+        return json.loads(raw)
+
+    def _publish(self, key: str, result: Any) -> None:
+        try:
+            self._shared.set(f'flight-result:{key}', json.dumps(result), RESULT_TTL)
+        except (SharedStateUnavailable, TypeError, ValueError):
+            pass
+
+    def _release(self, key: str, token: str) -> None:
+        try:
+            self._shared.release_lock(f'flight:{key}', token)
+        except SharedStateUnavailable:
+            pass
+
+
+def request_key(*parts) -> str:
+    """Hash of a request's defining parts; bytes (images) are hashed, the rest JSON-encoded."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray)):
+            digest.update(hashlib.sha256(part).digest())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """This worker's SingleFlight, or None when GEMINI_SINGLE_FLIGHT is off."""
+    global _single_flight
+    if _single_flight is None and getattr(settings, 'GEMINI_SINGLE_FLIGHT', True):
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(shared=get_shared_state())
+    return _single_flight
@@ -0,0 +1,150 @@
+"""
+Valuation Grid — precomputed price estimates for the whole catalog.
+
+The crisp price rules only depend on (make, model, year, mileage bucket), and
+that domain is small: every catalog model × every year from MIN_YEAR to the
+current year × one bucket per mileage penalty tier. The grid evaluates all of
+those cells once with NumPy and serves estimate_price() results by index.
+
+The grid is immutable. price_estimator rebuilds it on year rollover or when
+the catalog is invalidated, and swaps the new grid in.
+"""
+import bisect
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+MIN_YEAR = 1980
+
+# Fallback used by estimate_price() for cars that are not in the catalog
+DEFAULT_CATEGORY = "economic"
+DEFAULT_BASE_PRICE = 18_000
+
+
+class ValuationGrid:
+    """Array-backed table of estimate_price() results, indexed by car × year × mileage bucket."""
+
+    def __init__(
+        self,
+        car_database: Dict[str, dict],
+        depreciation_rates: Dict[str, float],
+        mileage_penalties: List[Tuple[int, float]],
+        current_year: int,
+        min_year: int = MIN_YEAR,
+    ):
+        from ai_engine.price_estimator import _round2
+
+        self.current_year = current_year
+        self.min_year = min_year
+
+        # Row 0 is the "unknown car" fallback, catalog cars follow
+        self.rows: Dict[Tuple[str, str], int] = {}
+        make_titles = [None]
+        model_titles = [None]
+        categories = [DEFAULT_CATEGORY]
+        base_prices = [DEFAULT_BASE_PRICE]
+        row_rates = [depreciation_rates[DEFAULT_CATEGORY]]
+        for make_key, models in car_database.items():
+            for model_key, info in models.items():
+                self.rows[(make_key, model_key)] = len(categories)
+                make_titles.append(make_key.title())
+                model_titles.append(model_key.title())
+                categories.append(info["category"])
+                base_prices.append(info["base_price"])
+                # A fitted per-model rate overrides the category rate
+                row_rates.append(info.get("depreciation_rate", depreciation_rates[info["category"]]))
+
+        self.make_titles = make_titles
+        self.model_titles = model_titles
+        self.categories = categories
+        self.base_prices = base_prices
+        self.rate_labels = [rate_label(rate) for rate in row_rates]
+
+        # Mileage buckets: bucket b covers [lower_bounds[b], lower_bounds[b + 1])
+        self.thresholds = sorted({threshold for threshold, _ in mileage_penalties})
+        lower_bounds = [0] + self.thresholds
+        bucket_penalties = [_mileage_penalty(m, mileage_penalties) for m in lower_bounds]
+        self.penalty_labels = [f"{p*100:.0f}%" for p in bucket_penalties]
+
+        # Shapes: (cars, 1, 1), (1, years, 1) and (1, 1, buckets) broadcast to the full grid
+        base = np.asarray(base_prices, dtype=np.float64)[:, None, None]
+        rates = np.asarray(row_rates)[:, None, None]
+        ages = np.maximum(0, current_year - np.arange(min_year, current_year + 1))[None, :, None]
+        penalties = np.asarray(bucket_penalties)[None, None, :]
+
+        factor = (1 - rates) ** ages
+        value_after_age = _round2(base * factor)
+        deduction = _round2(value_after_age * penalties)
+        final_price = _round2(value_after_age - deduction)
+        floor_price = _round2(base * 0.05)
+        final_price = np.maximum(final_price, floor_price)
+        depreciation_pct = _round2((1 - final_price / base) * 100)
+
+        self.age_factors = np.round(factor[:, :, 0], 4)
+        self.values_after_age = value_after_age[:, :, 0]
+        self.mileage_deductions = deduction
+        self.final_prices = final_price
+        self.floor_prices = floor_price[:, 0, 0]
+        self.depreciation_pcts = depreciation_pct
+
+        # Nested-list views of the same cells: indexing Python lists and getting
+        # Python floats back is several times cheaper than NumPy scalar access
+        self._age_factors = self.age_factors.tolist()
+        self._values_after_age = self.values_after_age.tolist()
+        self._mileage_deductions = deduction.tolist()
+        self._final_prices = final_price.tolist()
+        self._floor_prices = self.floor_prices.tolist()
+        self._depreciation_pcts = depreciation_pct.tolist()
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.final_prices.shape
+
+    def covers(self, year: int) -> bool:
+        """Whether a model year can be served from the grid (future years count as age 0)."""
+        return year >= self.min_year
+
+    def row_for(self, make_key: str, model_key: str) -> int:
+        """Grid row of a normalized (make, model) pair; 0 for unknown cars."""
+        return self.rows.get((make_key, model_key), 0)
+
+    def bucket_for(self, mileage_km: int) -> int:
+        return bisect.bisect_right(self.thresholds, mileage_km)
+
+    def estimate(self, make: str, model: str, row: int, year: int, mileage_km: int) -> Dict:
+        """Build an estimate_price() result dict from precomputed cells."""
+        year_index = min(year, self.current_year) - self.min_year
+        bucket = self.bucket_for(mileage_km)
+
+        return {
+            "make": self.make_titles[row] or make.strip().title(),
+            "model": self.model_titles[row] or model.strip().title(),
+            "year": year,
+            "mileage_km": mileage_km,
+            "category": self.categories[row],
+            "original_price_jod": self.base_prices[row],
+            "depreciated_price_jod": self._final_prices[row][year_index][bucket],
+            "depreciation_pct": self._depreciation_pcts[row][year_index][bucket],
+            "breakdown": {
+                "car_age_years": max(0, self.current_year - year),
+                "annual_depreciation_rate": self.rate_labels[row],
+                "age_depreciation_factor": self._age_factors[row][year_index],
+                "value_after_age": self._values_after_age[row][year_index],
+                "mileage_penalty_pct": self.penalty_labels[bucket],
+                "mileage_deduction_jod": self._mileage_deductions[row][year_index][bucket],
+                "floor_price_jod": self._floor_prices[row],
+            },
+        }
+
+
+def rate_label(rate: float) -> str:
+    """Depreciation rate as shown in the breakdown: 0.12 → "12%", fitted 0.0537 → "5.4%"."""
+    return f"{rate*100:.1f}".rstrip("0").rstrip(".") + "%"
+
+
+def _mileage_penalty(mileage_km: int, mileage_penalties: List[Tuple[int, float]]) -> float:
+    """Same first-match rule as estimate_price()."""
+    for threshold, penalty in mileage_penalties:
+        if mileage_km >= threshold:
+            return penalty
+    return 0.0
@@ -15,6 +15,7 @@ import json
 import logging
 from ai_engine.llm_client import get_gemini_client
 from ai_engine.prompts import load_prompt
+from ai_engine.catalog import get_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,8 @@ def analyze_car_image(image_bytes: bytes) -> dict:
         image_bytes: Raw bytes of the uploaded image.
 
     Returns:
-        dict with keys: make, model, year, condition, raw_response
+        dict with keys: make, model, year, condition, raw_response,
+        catalog_make, catalog_model, category
     """
     client = get_gemini_client()
 
@@ -40,6 +42,7 @@ def analyze_car_image(image_bytes: bytes) -> dict:
     # Try to parse structured JSON from the response
     parsed = _parse_vision_response(raw)
     parsed["raw_response"] = raw
+    _attach_catalog_match(parsed)
     return parsed
 
 
@@ -54,7 +57,8 @@ def analyze_car_image_crew(image_bytes: bytes) -> dict:
         image_bytes: Raw bytes of the uploaded image.
 
     Returns:
-        dict with keys: make, model, year, condition, raw_response
+        dict with keys: make, model, year, condition, raw_response,
+        catalog_make, catalog_model, category
     """
     from ai_engine.crews import VisionAnalysisCrew
 
@@ -79,6 +83,7 @@ def analyze_car_image_crew(image_bytes: bytes) -> dict:
 
         parsed = _parse_vision_response(result.raw)
         parsed["raw_response"] = raw_description
+        _attach_catalog_match(parsed)
         return parsed
 
     except Exception as e:
@@ -112,3 +117,21 @@ def _parse_vision_response(text: str) -> dict:
     except (json.JSONDecodeError, AttributeError):
         logger.warning("Could not parse vision response as JSON, using raw text")
         return defaults
+
+
+def _attach_catalog_match(parsed: dict) -> None:
+    """
+    Map the detected make/model onto the price estimator catalog.
+
+    The vision model names cars freely ("Mercedes-Benz C200"), so the lookup
+    index resolves them to catalog keys that /api/estimate/ can price.
+    Unmatched cars get None for all three keys.
+    """
+    catalog = get_catalog()
+    match = catalog.index.resolve(str(parsed.get("make") or ""), str(parsed.get("model") or ""))
+    if match:
+        parsed["catalog_make"] = match.make.title()
+        parsed["catalog_model"] = match.model.title()
+        parsed["category"] = catalog.cars[match.make][match.model]["category"]
+    else:
+        parsed["catalog_make"] = parsed["catalog_model"] = parsed["category"] = None
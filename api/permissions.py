@@ -0,0 +1,14 @@
+"""
+Permissions for IntelliWheels API views.
+"""
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class IsInternal(BasePermission):
+    """Internal/ops endpoints: staff users only, or anyone while DEBUG is on."""
+
+    def has_permission(self, request, view):
+        if settings.DEBUG:
+            return True
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,27 @@
+"""
+Renderers for IntelliWheels API views.
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event: str, data) -> bytes:
+    """One server-sent event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+class ServerSentEventRenderer(BaseRenderer):
+    """
+    Lets streaming views accept `Accept: text/event-stream`.
+
+    The stream itself is written by the view; this only renders the regular
+    responses such a view can return (validation errors) as an `error` event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event('error', data)
@@ -1,20 +1,31 @@
 from django.urls import path
-from api.views import chat_views, price_views, vision_views, whatsapp_views
+from api.views import anomaly_views, chat_views, comps_views, metrics_views, price_views, vision_views, whatsapp_views
 
 app_name = 'api'
 
 urlpatterns = [
     # Chat
     path('chat/', chat_views.ChatView.as_view(), name='chat'),
+    path('chat/async/', chat_views.AsyncChatView.as_view(), name='chat_async'),
+    path('chat/stream/', chat_views.ChatStreamView.as_view(), name='chat_stream'),
 
     # Price Estimator
     path('estimate/', price_views.PriceEstimateView.as_view(), name='estimate'),
+    path('estimate/batch/', price_views.PriceEstimateBatchView.as_view(), name='estimate_batch'),
+    path('estimate/schedule/', price_views.PriceScheduleView.as_view(), name='estimate_schedule'),
     path('makes/', price_views.CarMakesView.as_view(), name='makes'),
     path('models/<str:make>/', price_views.CarModelsView.as_view(), name='models'),
 
+    # Listings
+    path('comps/', comps_views.ComparableListingsView.as_view(), name='comps'),
+    path('anomalies/', anomaly_views.ListingPriceFlagListView.as_view(), name='anomalies'),
+
     # Vision Helper
     path('vision/', vision_views.VisionAnalyzeView.as_view(), name='vision'),
 
     # WhatsApp
     path('whatsapp/send/', whatsapp_views.WhatsAppSendView.as_view(), name='whatsapp_send'),
+
+    # Internal
+    path('metrics/', metrics_views.MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,48 @@
+"""
+Listing price anomaly API view - listings flagged by the price anomaly scanner.
+"""
+import logging
+
+from rest_framework.generics import ListAPIView
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from api.permissions import IsInternal
+from core.models import ListingPriceFlag
+from core.serializers.car_serializers import ListingPriceFlagSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class ListingPriceFlagListView(ListAPIView):
+    """GET /api/anomalies/ - flagged listings, most anomalous first (paginated)."""
+
+    permission_classes = [IsInternal]
+    serializer_class = ListingPriceFlagSerializer
+
+    @extend_schema(
+        tags=['Listings'],
+        summary='List price anomaly flags',
+        description='Unsold listings whose asking price is far from the estimated market value, '
+                    'as found by `manage.py scan_price_anomalies`. Ordered by score (standard '
+                    'deviations from market), highest first. Staff only, or DEBUG.',
+        parameters=[
+            OpenApiParameter('direction', str, enum=['under', 'over'], description='Only under- or over-priced'),
+            OpenApiParameter('reviewed', bool, description='Filter by review status'),
+            OpenApiParameter('min_score', float, description='Minimum score'),
+        ],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        flags = ListingPriceFlag.objects.select_related('listing').order_by('-score', 'id')
+        params = self.request.query_params
+        if params.get('direction') in ('under', 'over'):
+            flags = flags.filter(direction=params['direction'])
+        if params.get('reviewed') in ('true', 'false'):
+            flags = flags.filter(reviewed=params['reviewed'] == 'true')
+        try:
+            flags = flags.filter(score__gte=float(params['min_score']))
+        except (KeyError, ValueError):
+            pass
+        return flags
@@ -1,17 +1,36 @@
 """
 Chat API view - handles the IntelliWheels chatbot conversation.
 """
+import asyncio
+import json
 import time
 import logging
 
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers as drf_serializers
 
-from core.models.chat import ChatSession, ChatMessage
+from api.renderers import ServerSentEventRenderer, sse_event
+from core.chat_history import build_history
+from core.session_cache import (
+    acreate_session,
+    aopen_session,
+    arecord_turn,
+    create_session_later,
+    open_session,
+    record_turn,
+)
+from core.timing import StageTimer
 from core.serializers.chat_serializers import ChatInputSerializer
 from ai_engine.agents.car_chatbot import CarChatbotAgent
 
@@ -44,49 +63,227 @@ class ChatView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         data = serializer.validated_data
+        timer = StageTimer()
 
-        # Get or create session
-        session_id = data.get('session_id')
-        if session_id:
+        # Only an existing session's history is needed before the model call;
+        # a new session's row is created while the model answers.
+        with timer.stage('session'):
+            session = open_session(data.get('session_id'), create=False)
+        new_session = create_session_later() if session is None else None
+        history = build_history(session, session.rows) if session else []
+
+        # AI response
+        start = time.time()
+        with timer.stage('llm'):
             try:
-                session = ChatSession.objects.get(id=session_id)
-            except ChatSession.DoesNotExist:
-                session = ChatSession.objects.create()
-        else:
-            session = ChatSession.objects.create()
-
-        # Save user message
-        ChatMessage.objects.create(
-            session=session, role='user', content=data['message']
-        )
+                agent = CarChatbotAgent()
+                result = agent.chat(data['message'], history=history)
+                ai_text = result['response']
+                model_used = result.get('model_used', '')
+            except Exception as e:
+                logger.error(f"Chat AI error: {e}")
+                ai_text = "Sorry, I couldn't process your request right now. Please try again."
+                model_used = "error"
+
+        elapsed_ms = int((time.time() - start) * 1000)
+
+        if new_session is not None:
+            with timer.stage('session_wait'):
+                session = new_session.result()
+
+        # Save user message + reply
+        with timer.stage('save'):
+            record_turn(session, data['message'], ai_text)
+
+        logger.info(f"Chat session={session.pk} {timer.summary()}")
+        response = Response({
+            'message': ai_text,
+            'session_id': session.pk,
+            'model_used': model_used,
+            'response_time_ms': elapsed_ms,
+        })
+        response['Server-Timing'] = timer.header()
+        return response
+
+
+class ChatStreamView(APIView):
+    """POST /api/chat/stream/ - send a message, stream the AI reply as server-sent events."""
 
-        # Build history
-        history = list(
-            session.messages.order_by('created_at').values('role', 'content')
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer, ServerSentEventRenderer]
+
+    @extend_schema(
+        tags=['Chat'],
+        summary='Stream an AI chatbot reply',
+        description=(
+            'Same input as /api/chat/. The reply is a text/event-stream: one `session` event '
+            '({"session_id"}), `token` events ({"text"}) as the model generates, then a `done` event '
+            '({"session_id", "message_id", "model_used", "ttft_ms", "response_time_ms"}). '
+            'The user message and the reply are saved to the session only once the stream completes.'
+        ),
+        request=ChatInputSerializer,
+        responses={(200, 'text/event-stream'): str},
+    )
+    def post(self, request):
+        serializer = ChatInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        session = open_session(data.get('session_id'))
+        history = build_history(session, session.rows)
+
+        # Under ASGI a sync iterator would be read to the end before anything
+        # is sent; an async one is relayed frame by frame.
+        stream = _astream_reply if isinstance(request._request, ASGIRequest) else _stream_reply
+        response = StreamingHttpResponse(
+            stream(session, data['message'], history),
+            content_type='text/event-stream',
         )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChatView(View):
+    """
+    POST /api/chat/async/ - async version of /api/chat/ for ASGI deployments.
+
+    Same input and response. DRF views are sync-only, so this is a plain
+    Django async view: it uses the async ORM and the async Gemini client, and
+    a waiting LLM call does not hold a worker thread.
+    """
+
+    async def post(self, request):
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'Request body must be JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = ChatInputSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        timer = StageTimer()
+
+        with timer.stage('session'):
+            session = await aopen_session(data.get('session_id'), create=False)
+        new_session = asyncio.ensure_future(acreate_session()) if session is None else None
+        history = build_history(session, session.rows) if session else []
 
         # AI response
         start = time.time()
-        try:
-            agent = CarChatbotAgent()
-            result = agent.chat(data['message'], history=history[:-1])
-            ai_text = result['response']
-            model_used = result.get('model_used', '')
-        except Exception as e:
-            logger.error(f"Chat AI error: {e}")
-            ai_text = "Sorry, I couldn't process your request right now. Please try again."
-            model_used = "error"
+        with timer.stage('llm'):
+            try:
+                agent = CarChatbotAgent()
+                result = await agent.achat(data['message'], history=history)
+                ai_text = result['response']
+                model_used = result.get('model_used', '')
+            except Exception as e:
+                logger.error(f"Async chat AI error: {e}")
+                ai_text = "Sorry, I couldn't process your request right now. Please try again."
+                model_used = "error"
 
         elapsed_ms = int((time.time() - start) * 1000)
 
-        # Save assistant message
-        ChatMessage.objects.create(
-            session=session, role='assistant', content=ai_text
-        )
+        if new_session is not None:
+            with timer.stage('session_wait'):
+                session = await new_session
+
+        # Save user message + reply
+        with timer.stage('save'):
+            await arecord_turn(session, data['message'], ai_text)
 
-        return Response({
+        logger.info(f"Async chat session={session.pk} {timer.summary()}")
+        response = JsonResponse({
             'message': ai_text,
-            'session_id': session.id,
+            'session_id': session.pk,
             'model_used': model_used,
             'response_time_ms': elapsed_ms,
         })
+        response['Server-Timing'] = timer.header()
+        return response
+
+
+def _stream_reply(session, message, history):
+    """
+    SSE frames for one streamed reply (WSGI).
+
+    The turn (user message + reply) is only saved when the model finishes; a
+    client that disconnects mid-stream closes this generator and nothing is
+    saved.
+    """
+    yield sse_event('session', {'session_id': session.pk})
+    reply_stream = _ReplyStream(message, history)
+    yield from reply_stream.frames()
+    _, reply = record_turn(session, message, reply_stream.text)
+    yield reply_stream.done_event(session, reply)
+
+
+async def _astream_reply(session, message, history):
+    """
+    Async version of _stream_reply() for ASGI: the blocking model stream is
+    advanced one frame at a time in a worker thread, and the turn is saved
+    with the async ORM.
+    """
+    yield sse_event('session', {'session_id': session.pk})
+    reply_stream = _ReplyStream(message, history)
+    frames = reply_stream.frames()
+    next_frame = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (frame := await next_frame(frames, None)) is not None:
+            yield frame
+    finally:
+        # Client gone mid-stream: close the model stream too
+        await sync_to_async(frames.close, thread_sensitive=False)()
+    _, reply = await arecord_turn(session, message, reply_stream.text)
+    yield reply_stream.done_event(session, reply)
+
+
+class _ReplyStream:
+    """`token` frames of one streamed reply, plus its text and timings once done."""
+
+    def __init__(self, message, history):
+        self.message = message
+        self.history = history
+        self.text = ''
+        self.model_used = ''
+        self.ttft_ms = None
+        self.elapsed_ms = None
+
+    def frames(self):
+        start = time.time()
+        try:
+            final = None
+            for event in CarChatbotAgent().chat_stream(self.message, history=self.history):
+                if event.get('done'):
+                    final = event
+                    break
+                if self.ttft_ms is None:
+                    self.ttft_ms = int((time.time() - start) * 1000)
+                yield sse_event('token', {'text': event['delta']})
+            self.text = final['response']
+            self.model_used = final.get('model_used', '')
+        except Exception as e:
+            logger.error(f"Chat stream AI error: {e}")
+            self.text = "Sorry, I couldn't process your request right now. Please try again."
+            self.model_used = "error"
+            yield sse_event('token', {'text': self.text})
+
+        self.elapsed_ms = int((time.time() - start) * 1000)
+        if self.ttft_ms is None:
+            self.ttft_ms = self.elapsed_ms
+
+    def done_event(self, session, reply):
+        logger.info(f"Chat stream session={session.pk} model={self.model_used} "
+                    f"ttft={self.ttft_ms}ms total={self.elapsed_ms}ms")
+        return sse_event('done', {
+            'session_id': session.pk,
+            'message_id': reply.id,
+            'model_used': self.model_used,
+            'ttft_ms': self.ttft_ms,
+            'response_time_ms': self.elapsed_ms,
+        })
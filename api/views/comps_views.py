@@ -0,0 +1,62 @@
+"""
+Comparable listings API view - nearest unsold cars from our own inventory.
+"""
+import logging
+
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers as drf_serializers
+
+from core.comps import get_comps_index
+from core.models import CarListing
+from core.serializers.car_serializers import CarListingSerializer, CompsQuerySerializer
+
+logger = logging.getLogger(__name__)
+
+
+class ComparableListingsView(APIView):
+    """GET /api/comps/ - the most similar cars currently listed."""
+
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['Listings'],
+        summary='Find comparable listings',
+        description='Returns up to k unsold listings closest to the given car: same model first, '
+                    'then other models of the make, then the same category, ranked by year, '
+                    'mileage and (if price_jod is given) asking price. Served from an in-memory index.',
+        parameters=[CompsQuerySerializer],
+        responses={200: inline_serializer(
+            name='CompsResponse',
+            fields={
+                'count': drf_serializers.IntegerField(),
+                'results': drf_serializers.ListField(child=drf_serializers.DictField()),
+            }
+        )},
+    )
+    def get(self, request):
+        serializer = CompsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        matches = get_comps_index().query(
+            make=data["make"],
+            model=data["model"],
+            year=data["year"],
+            mileage_km=data["mileage_km"],
+            price_jod=data.get("price_jod"),
+            k=data["k"],
+            exclude_pk=data.get("exclude_id"),
+        )
+
+        listings = CarListing.objects.in_bulk([pk for pk, _ in matches])
+        results = []
+        for pk, distance in matches:
+            # The index can briefly lag a delete made by another worker
+            if pk in listings:
+                results.append({**CarListingSerializer(listings[pk]).data, 'distance': distance})
+        return Response({"count": len(results), "results": results})
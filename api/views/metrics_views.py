@@ -0,0 +1,69 @@
+"""
+Internal metrics API view - runtime counters for this worker process.
+"""
+import logging
+import os
+
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers as drf_serializers
+
+from ai_engine.context_cache import get_context_cache
+from ai_engine.llm_client import get_gemini_client
+from ai_engine.rate_limiter import get_rate_limiter
+from ai_engine.response_cache import get_response_cache
+from ai_engine.shared_state import get_shared_state
+from ai_engine.single_flight import get_single_flight
+from api.permissions import IsInternal
+from core.comps import current_comps_index
+from core.persistence import get_price_estimate_buffer
+from core.session_cache import get_session_cache
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsView(APIView):
+    """GET /api/metrics/ - per-process runtime metrics."""
+
+    permission_classes = [IsInternal]
+
+    @extend_schema(
+        tags=['Internal'],
+        summary='Worker runtime metrics',
+        description='Counters for the worker process that served the request '
+                    '(each gunicorn worker keeps its own).',
+        responses={200: inline_serializer(
+            name='MetricsResponse',
+            fields={
+                'pid': drf_serializers.IntegerField(),
+                'price_estimate_write_behind': drf_serializers.DictField(),
+                'comps_index': drf_serializers.DictField(),
+                'chat_session_cache': drf_serializers.DictField(),
+                'gemini_context_cache': drf_serializers.DictField(),
+                'chat_response_cache': drf_serializers.DictField(),
+                'gemini_single_flight': drf_serializers.DictField(),
+                'gemini_rate_limiter': drf_serializers.DictField(),
+                'gemini_endpoints': drf_serializers.DictField(),
+                'shared_state': drf_serializers.DictField(),
+            }
+        )},
+    )
+    def get(self, request):
+        buffer = get_price_estimate_buffer()
+        comps_index = current_comps_index()
+        response_cache = get_response_cache()
+        single_flight = get_single_flight()
+        shared_state = get_shared_state()
+        return Response({
+            'pid': os.getpid(),
+            'price_estimate_write_behind': buffer.stats() if buffer else {'enabled': False},
+            'comps_index': comps_index.stats() if comps_index else {'built': False},
+            'chat_session_cache': get_session_cache().stats(),
+            'gemini_context_cache': get_context_cache().stats(),
+            'chat_response_cache': response_cache.stats() if response_cache else {'enabled': False},
+            'gemini_single_flight': single_flight.stats() if single_flight else {'enabled': False},
+            'gemini_rate_limiter': get_rate_limiter().stats(),
+            'gemini_endpoints': get_gemini_client().endpoint_stats(),
+            'shared_state': shared_state.stats() if shared_state else {'backend': None},
+        })
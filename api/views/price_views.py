@@ -1,21 +1,79 @@
 """
 Price Estimator API view - crisp logic car valuation.
 """
+import hashlib
 import logging
+import threading
 
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers as drf_serializers
+from rest_framework.renderers import JSONRenderer
 
-from core.serializers.price_serializers import PriceEstimateInputSerializer
-from core.models.price_estimate import PriceEstimate
-from ai_engine.price_estimator import estimate_price, get_all_makes, get_models_for_make
+from core.serializers.price_serializers import (
+    PriceEstimateInputSerializer,
+    PriceEstimateBatchInputSerializer,
+    PriceScheduleInputSerializer,
+)
+from core.persistence import record_price_estimate
+from ai_engine.catalog import get_catalog
+from ai_engine.price_estimator import estimate_price, estimate_price_schedule, estimate_prices_batch
+from ai_engine.price_range import estimate_price_range, estimate_price_ranges_batch
 
 logger = logging.getLogger(__name__)
 
+# Pre-serialized catalog responses for the current catalog: make (None for
+# the makes list) → (body bytes, ETag). Cleared when the catalog changes.
+_catalog_responses = {}
+_catalog_responses_fingerprint = None
+_catalog_responses_lock = threading.Lock()
+CATALOG_RESPONSE_CACHE_SIZE = 1024
+
+
+def _catalog_response(request, make=None):
+    """
+    Serve a catalog listing from the byte cache with ETag / Cache-Control.
+
+    Returns 304 Not Modified when the client's If-None-Match already holds
+    the current ETag, so unchanged catalog data costs no serialization.
+    """
+    global _catalog_responses_fingerprint
+    catalog = get_catalog()
+    with _catalog_responses_lock:
+        if catalog.fingerprint != _catalog_responses_fingerprint:
+            _catalog_responses.clear()
+            _catalog_responses_fingerprint = catalog.fingerprint
+        cached = _catalog_responses.get(make)
+
+    if cached is None:
+        if make is None:
+            payload = {"makes": sorted(catalog.cars), "catalog_version": catalog.version}
+        else:
+            payload = {"make": make, "models": catalog.index.models_for(make), "catalog_version": catalog.version}
+        body = JSONRenderer().render(payload)
+        cached = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        with _catalog_responses_lock:
+            # Another thread may have swapped in a newer catalog meanwhile
+            if _catalog_responses_fingerprint == catalog.fingerprint:
+                if len(_catalog_responses) >= CATALOG_RESPONSE_CACHE_SIZE:
+                    _catalog_responses.clear()
+                _catalog_responses[make] = cached
+
+    body, etag = cached
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if settings.CATALOG_CACHE_MAX_AGE:
+        patch_cache_control(response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
 
 class PriceEstimateView(APIView):
     """POST /api/estimate/ - estimate a car price."""
@@ -25,7 +83,8 @@ class PriceEstimateView(APIView):
     @extend_schema(
         tags=['Price Estimator'],
         summary='Estimate a car price',
-        description='Get a rule-based price estimate for a car in JOD, including depreciation and category classification.',
+        description='Get a rule-based price estimate for a car in JOD, including depreciation and category classification. '
+                    'With include_range, also returns a Monte Carlo P10/P50/P90 price range (seedable).',
         request=PriceEstimateInputSerializer,
         responses={200: inline_serializer(
             name='PriceEstimateResponse',
@@ -39,6 +98,8 @@ class PriceEstimateView(APIView):
                 'depreciated_price_jod': drf_serializers.FloatField(),
                 'depreciation_pct': drf_serializers.FloatField(),
                 'breakdown': drf_serializers.DictField(),
+                'catalog_version': drf_serializers.CharField(),
+                'price_range': drf_serializers.DictField(required=False),
             }
         )},
     )
@@ -55,57 +116,174 @@ class PriceEstimateView(APIView):
             mileage_km=data.get("mileage_km", 0),
         )
 
-        # Persist
-        PriceEstimate.objects.create(
-            make=result["make"],
-            model=result["model"],
-            year=result["year"],
-            mileage_km=result["mileage_km"],
-            category=result["category"],
-            original_price_jod=result["original_price_jod"],
-            depreciated_price_jod=result["depreciated_price_jod"],
-            depreciation_pct=result["depreciation_pct"],
-            breakdown=result["breakdown"],
-        )
+        # Persist (synchronously, or queued when write-behind is enabled)
+        record_price_estimate(result)
+
+        if data["include_range"]:
+            result["price_range"] = estimate_price_range(
+                make=data["make"],
+                model=data["model"],
+                year=data["year"],
+                mileage_km=data.get("mileage_km", 0),
+                seed=data.get("seed"),
+            )
 
         return Response(result)
 
 
+class PriceEstimateBatchView(APIView):
+    """POST /api/estimate/batch/ - estimate prices for many cars in one request."""
+
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['Price Estimator'],
+        summary='Estimate prices for a batch of cars',
+        description=(
+            'Columnar batch version of /api/estimate/. Send one list per field '
+            '(make, model, year, optional mileage_km), all the same length, up to '
+            f'{PriceEstimateBatchInputSerializer.MAX_ROWS} rows. Results are returned '
+            'as lists in the same order as the input. With include_range, p10_jod/p50_jod/p90_jod '
+            'Monte Carlo columns are added (range_draws draws per car). Batch estimates are not persisted.'
+        ),
+        request=PriceEstimateBatchInputSerializer,
+        responses={200: inline_serializer(
+            name='PriceEstimateBatchResponse',
+            fields={
+                'count': drf_serializers.IntegerField(),
+                'category': drf_serializers.ListField(child=drf_serializers.CharField()),
+                'original_price_jod': drf_serializers.ListField(child=drf_serializers.FloatField()),
+                'depreciated_price_jod': drf_serializers.ListField(child=drf_serializers.FloatField()),
+                'depreciation_pct': drf_serializers.ListField(child=drf_serializers.FloatField()),
+                'p10_jod': drf_serializers.ListField(child=drf_serializers.FloatField(), required=False),
+                'p50_jod': drf_serializers.ListField(child=drf_serializers.FloatField(), required=False),
+                'p90_jod': drf_serializers.ListField(child=drf_serializers.FloatField(), required=False),
+            }
+        )},
+    )
+    def post(self, request):
+        serializer = PriceEstimateBatchInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        result = estimate_prices_batch(
+            makes=data["make"],
+            models=data["model"],
+            years=data["year"],
+            mileages_km=data.get("mileage_km"),
+        )
+
+        if data["include_range"]:
+            result.update(estimate_price_ranges_batch(
+                makes=data["make"],
+                models=data["model"],
+                years=data["year"],
+                mileages_km=data.get("mileage_km"),
+                draws=data["range_draws"],
+                seed=data.get("seed"),
+            ))
+
+        response = {"count": len(data["make"])}
+        response.update({field: values.tolist() for field, values in result.items()})
+        return Response(response)
+
+
+class PriceScheduleView(APIView):
+    """POST /api/estimate/schedule/ - value curve of a car over years and mileages."""
+
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['Price Estimator'],
+        summary='Depreciation schedule for a car',
+        description=(
+            'Value of one car for every calendar year from its model year to years_ahead years '
+            'from now, at each of the given mileages, using the same rules as /api/estimate/. '
+            'prices_jod and depreciation_pct are row-major grids: one row per calendar_years '
+            'entry, one column per mileage_km entry.'
+        ),
+        request=PriceScheduleInputSerializer,
+        responses={200: inline_serializer(
+            name='PriceScheduleResponse',
+            fields={
+                'make': drf_serializers.CharField(),
+                'model': drf_serializers.CharField(),
+                'year': drf_serializers.IntegerField(),
+                'category': drf_serializers.CharField(),
+                'original_price_jod': drf_serializers.FloatField(),
+                'current_year': drf_serializers.IntegerField(),
+                'calendar_years': drf_serializers.ListField(child=drf_serializers.IntegerField()),
+                'ages': drf_serializers.ListField(child=drf_serializers.IntegerField()),
+                'mileage_km': drf_serializers.ListField(child=drf_serializers.IntegerField()),
+                'prices_jod': drf_serializers.ListField(
+                    child=drf_serializers.ListField(child=drf_serializers.FloatField())),
+                'depreciation_pct': drf_serializers.ListField(
+                    child=drf_serializers.ListField(child=drf_serializers.FloatField())),
+            }
+        )},
+    )
+    def post(self, request):
+        serializer = PriceScheduleInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        return Response(estimate_price_schedule(
+            make=data["make"],
+            model=data["model"],
+            year=data["year"],
+            mileages_km=data.get("mileage_km"),
+            years_ahead=data["years_ahead"],
+        ))
+
+
 class CarMakesView(APIView):
     """GET /api/makes/ - list all known car makes."""
 
     permission_classes = [AllowAny]
+    # Public data: skip session auth so responses don't Vary on Cookie (CDN-cacheable)
+    authentication_classes = []
 
     @extend_schema(
         tags=['Price Estimator'],
         summary='List all car makes',
-        description='Returns a list of all known car makes supported by the price estimator.',
+        description='Returns a list of all known car makes supported by the price estimator, '
+                    'plus the catalog version they come from. Responses carry a strong ETag and '
+                    'honor If-None-Match with 304 Not Modified.',
         responses={200: inline_serializer(
             name='CarMakesResponse',
-            fields={'makes': drf_serializers.ListField(child=drf_serializers.CharField())}
+            fields={
+                'makes': drf_serializers.ListField(child=drf_serializers.CharField()),
+                'catalog_version': drf_serializers.CharField(),
+            }
         )},
     )
     def get(self, request):
-        return Response({"makes": get_all_makes()})
+        return _catalog_response(request)
 
 
 class CarModelsView(APIView):
     """GET /api/models/<make>/ - list models for a make."""
 
     permission_classes = [AllowAny]
+    # Public data: skip session auth so responses don't Vary on Cookie (CDN-cacheable)
+    authentication_classes = []
 
     @extend_schema(
         tags=['Price Estimator'],
         summary='List models for a car make',
-        description='Returns a list of all known models for a given car make.',
+        description='Returns a list of all known models for a given car make, '
+                    'plus the catalog version they come from. Responses carry a strong ETag and '
+                    'honor If-None-Match with 304 Not Modified.',
         responses={200: inline_serializer(
             name='CarModelsResponse',
             fields={
                 'make': drf_serializers.CharField(),
                 'models': drf_serializers.ListField(child=drf_serializers.CharField()),
+                'catalog_version': drf_serializers.CharField(),
             }
         )},
     )
     def get(self, request, make):
-        models = get_models_for_make(make)
-        return Response({"make": make, "models": models})
+        return _catalog_response(request, make)
@@ -26,7 +26,8 @@ class VisionAnalyzeView(APIView):
     @extend_schema(
         tags=['Vision'],
         summary='Analyze a car image',
-        description='Upload a car photo (JPEG, PNG, WebP, GIF) and Gemini Vision will identify the make, model, year, and condition.',
+        description='Upload a car photo (JPEG, PNG, WebP, GIF) and Gemini Vision will identify the make, model, year, and condition. '
+                    'catalog_make/catalog_model are the matching price estimator names (null if the car is not in the catalog).',
         request=inline_serializer(
             name='VisionUploadRequest',
             fields={'image': drf_serializers.ImageField()}
@@ -39,6 +40,9 @@ class VisionAnalyzeView(APIView):
                 'model': drf_serializers.CharField(),
                 'year': drf_serializers.CharField(),
                 'condition': drf_serializers.CharField(),
+                'catalog_make': drf_serializers.CharField(allow_null=True),
+                'catalog_model': drf_serializers.CharField(allow_null=True),
+                'category': drf_serializers.CharField(allow_null=True),
             }
         )},
     )
@@ -79,6 +83,9 @@ class VisionAnalyzeView(APIView):
                 "model": analysis.detected_model,
                 "year": analysis.detected_year,
                 "condition": analysis.condition_summary,
+                "catalog_make": result.get("catalog_make"),
+                "catalog_model": result.get("catalog_model"),
+                "category": result.get("category"),
             })
 
         except Exception as e:
@@ -0,0 +1,81 @@
+"""
+Benchmark: precomputed valuation grid vs the per-call price estimator path.
+
+Run from the project root:
+
+    python benchmarks/bench_price_estimator.py [--calls 100000]
+
+The price estimator is plain Python + NumPy, so Django is not needed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine.catalog import get_catalog  # noqa: E402
+from ai_engine.price_estimator import (  # noqa: E402
+    _estimate_price_direct,
+    estimate_price,
+    estimate_prices_batch,
+)
+from ai_engine.valuation_grid import ValuationGrid  # noqa: E402
+
+
+def _sample_inputs(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    pairs = [(make, model) for make, models in get_catalog().cars.items() for model in models]
+    pairs.append(("Unknown", "Car"))
+    current_year = get_catalog().valuation_grid().current_year
+    return [
+        (*rng.choice(pairs), rng.randint(1980, current_year), rng.randint(0, 300_000))
+        for _ in range(n)
+    ]
+
+
+def _time_calls(fn, inputs) -> float:
+    start = time.perf_counter()
+    for make, model, year, mileage in inputs:
+        fn(make, model, year, mileage)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    inputs = _sample_inputs(args.calls)
+
+    catalog = get_catalog()
+    start = time.perf_counter()
+    grid = ValuationGrid(catalog.cars, catalog.depreciation_rates, catalog.mileage_penalties,
+                         catalog.valuation_grid().current_year)
+    build_ms = (time.perf_counter() - start) * 1000
+    cells = grid.final_prices.size
+
+    mismatches = sum(
+        estimate_price(*row) != _estimate_price_direct(*row) for row in inputs[:10_000]
+    )
+
+    direct = _time_calls(_estimate_price_direct, inputs)
+    served = _time_calls(estimate_price, inputs)
+
+    makes, models, years, mileages = map(list, zip(*inputs))
+    start = time.perf_counter()
+    estimate_prices_batch(makes, models, years, mileages)
+    batch = time.perf_counter() - start
+
+    print(f"grid build:       {build_ms:8.2f} ms  ({cells} cells, shape {grid.shape})")
+    print(f"parity check:     {mismatches} mismatches in {min(len(inputs), 10_000)} calls")
+    print(f"per-call path:    {direct / len(inputs) * 1e6:8.2f} us/call  ({direct:.3f} s total)")
+    print(f"grid path:        {served / len(inputs) * 1e6:8.2f} us/call  ({served:.3f} s total)")
+    print(f"batch (columnar): {batch / len(inputs) * 1e6:8.2f} us/car   ({batch * 1000:.1f} ms total)")
+    print(f"speed-up (grid vs per-call): {direct / served:.2f}x")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
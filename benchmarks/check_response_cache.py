@@ -0,0 +1,61 @@
+"""
+Check: the response cache serves near-duplicates only for the same question.
+
+Run from the project root:
+
+    python benchmarks/check_response_cache.py
+
+Stores a few first-turn questions in a ResponseCache and looks up close
+variants. Rewordings ("whats the best ...", "... please") must be served
+from the cache; questions about another car, trim, budget or a negation
+must miss even when their trigram vectors are near-identical. Exits with
+status 1 if any check fails.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NAMESPACE = "check:0"
+STORED = [
+    "Should I buy a Tesla Model S?",
+    "Should I buy a 2018 Toyota Camry?",
+    "Is the Mercedes C200 reliable?",
+    "What is the best family car under 20k JOD?",
+]
+# (question, stored question it must be served from, or None for a miss)
+CASES = [
+    ("should i buy a tesla model s", STORED[0]),
+    ("What's the best family car under 20k JOD, please?", STORED[3]),
+    ("Should I buy a Tesla Model X?", None),
+    ("Should I buy a 2018 Toyota Camry Hybrid?", None),
+    ("Should I buy a 2018 Toyota Camry LE?", None),
+    ("Should I buy a 2019 Toyota Camry?", None),
+    ("Is the Mercedes C300 reliable?", None),
+    ("Is the Mercedes C200 not reliable?", None),
+    ("What is the best family car under 30k JOD?", None),
+]
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from ai_engine.response_cache import ResponseCache
+
+    cache = ResponseCache(max_entries=100)
+    for question in STORED:
+        cache.store(question, None, NAMESPACE, {"reply": question}, latency_ms=1000)
+
+    results = []
+    for question, expected in CASES:
+        found = cache.lookup(question, None, NAMESPACE)
+        served = found[0]["reply"] if found else None
+        ok = served == expected
+        results.append(ok)
+        print(f"{'ok  ' if ok else 'FAIL'} {question:<52} -> {served or 'miss'}")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Check: workers share one Gemini quota, response cache and single flight.
+
+Run from the project root:
+
+    python benchmarks/check_shared_state.py [--workers 4] [--url sqlite:///tmp/shared.db]
+
+Starts --workers processes against one shared-state backend (default: a
+SQLite file in a temporary directory; pass --url redis://... for Redis) and
+checks that:
+
+  - the token bucket hands out burst + rate x time tokens across all
+    workers together, not per worker;
+  - a response cached by one worker is a hit in another;
+  - N threads in each worker calling the same key concurrently make one
+    upstream call in total;
+  - with an unreachable backend, everything carries on per process.
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RPM = 600
+BURST = 5
+BUCKET_SECONDS = 2.0
+FLIGHT_THREADS = 10
+
+
+def _setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+
+
+def _bucket_worker(url, barrier, taken):
+    _setup()
+    from ai_engine.rate_limiter import RateLimiter
+    from ai_engine.shared_state import SharedState
+
+    limiter = RateLimiter(rpm=RPM, burst=BURST, max_wait=60, shared=SharedState(url))
+    barrier.wait()
+    end = time.monotonic() + BUCKET_SECONDS
+    count = 0
+    while True:
+        limiter.acquire()
+        if time.monotonic() >= end:
+            break
+        count += 1
+    with taken.get_lock():
+        taken.value += count
+
+
+def _flight_worker(url, barrier, upstream, results):
+    _setup()
+    from ai_engine.shared_state import SharedState
+    from ai_engine.single_flight import SingleFlight
+
+    flight = SingleFlight(shared=SharedState(url))
+
+    def call():
+        with upstream.get_lock():
+            upstream.value += 1
+            n = upstream.value
+        time.sleep(0.5)
+        return {"response": f"answer {n}"}
+
+    barrier.wait()
+    with ThreadPoolExecutor(max_workers=FLIGHT_THREADS) as pool:
+        for result in pool.map(lambda i: flight.do("campaign-prompt", call), range(FLIGHT_THREADS)):
+            results.put(result["response"])
+
+
+def _cache_worker(url, store):
+    _setup()
+    from ai_engine.response_cache import ResponseCache
+    from ai_engine.shared_state import SharedState
+
+    cache = ResponseCache(max_entries=10, shared=SharedState(url))
+    if store:
+        cache.store("Is Corolla reliable?", None, "ns", {"response": "yes", "model_used": "m"}, 1500)
+        return
+    hit = cache.lookup("is corolla reliable", None, "ns")
+    sys.exit(0 if hit and hit[0]["response"] == "yes" and cache.stats()["shared_hits"] == 1 else 1)
+
+
+def _run(processes):
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return all(process.exitcode == 0 for process in processes)
+
+
+def _report(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<30} {detail}")
+    return ok
+
+
+def check_bucket(url, workers):
+    barrier, taken = multiprocessing.Barrier(workers), multiprocessing.Value("i", 0)
+    _run([multiprocessing.Process(target=_bucket_worker, args=(url, barrier, taken)) for _ in range(workers)])
+    allowed = BURST + RPM / 60 * BUCKET_SECONDS
+    ok = allowed * 0.8 <= taken.value <= allowed + 2
+    return _report("token bucket", ok, f"{taken.value} tokens in {BUCKET_SECONDS:g}s across {workers} workers "
+                                       f"(shared quota allows ~{allowed:.0f}, per-worker ~{allowed * workers:.0f})")
+
+
+def check_response_cache(url):
+    _run([multiprocessing.Process(target=_cache_worker, args=(url, True))])
+    ok = _run([multiprocessing.Process(target=_cache_worker, args=(url, False))])
+    return _report("response cache", ok, "answer stored by one worker served to another")
+
+
+def check_single_flight(url, workers):
+    barrier, upstream = multiprocessing.Barrier(workers), multiprocessing.Value("i", 0)
+    results = multiprocessing.Queue()
+    _run([multiprocessing.Process(target=_flight_worker, args=(url, barrier, upstream, results))
+          for _ in range(workers)])
+    responses = {results.get() for _ in range(workers * FLIGHT_THREADS)}
+    ok = upstream.value == 1 and len(responses) == 1
+    return _report("single flight", ok, f"{workers} workers x {FLIGHT_THREADS} threads -> "
+                                        f"{upstream.value} upstream call(s)")
+
+
+def check_fallback():
+    _setup()
+    from ai_engine.rate_limiter import RateLimiter
+    from ai_engine.response_cache import ResponseCache
+    from ai_engine.shared_state import SharedState
+    from ai_engine.single_flight import SingleFlight
+
+    shared = SharedState("sqlite:////nonexistent-directory/shared.db")
+    limiter = RateLimiter(rpm=RPM, burst=BURST, shared=shared)
+    flight = SingleFlight(shared=shared)
+    cache = ResponseCache(max_entries=10, shared=shared)
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"response": "local"}
+
+    for _ in range(BURST):
+        limiter.acquire()
+    threads = [threading.Thread(target=flight.do, args=("k", call)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.store("q", None, "ns", {"response": "r", "model_used": "m"}, 10)
+    stats = shared.stats()
+    ok = (len(calls) == 1 and cache.lookup("q", None, "ns") is not None
+          and not stats["available"] and stats["errors"] == 1)
+    return _report("unreachable backend", ok, f"per-process mode; backend errors {stats['errors']}, "
+                                              f"calls skipped while down {stats['skipped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (default: 4)")
+    parser.add_argument("--url", help="Shared-state URL (default: SQLite file in a temporary directory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'shared_state.db')}"
+        print(f"shared state: {url}")
+        results = [
+            check_bucket(url, args.workers),
+            check_response_cache(url),
+            check_single_flight(url, args.workers),
+            check_fallback(),
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
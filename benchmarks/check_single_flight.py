@@ -0,0 +1,145 @@
+"""
+Check: N concurrent identical Gemini calls make one upstream request.
+
+Run from the project root:
+
+    python benchmarks/check_single_flight.py [--callers 50] [--latency-ms 200]
+
+GeminiClient is given a stand-in SDK client that counts generate_content
+calls and takes --latency-ms to answer, so no API key is needed. Covers
+chat() from threads, achat() from coroutines and analyze_image() from
+threads, plus distinct prompts (which must not be coalesced) and an achat()
+leader cancelled while followers wait (they must still get an answer).
+Exits with status 1 if any check fails.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingModels:
+    """generate_content that counts calls and sleeps like the real API."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+            return self.calls
+
+    def generate_content(self, model, contents, config=None):
+        n = self._count()
+        time.sleep(self.latency)
+        return SimpleNamespace(text=f"answer {n}", usage_metadata=None)
+
+    async def agenerate_content(self, model, contents, config=None):
+        n = self._count()
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=f"answer {n}", usage_metadata=None)
+
+
+def _client(latency: float):
+    from ai_engine.client_pool import ClientPool
+    from ai_engine.llm_client import GeminiClient
+
+    client = GeminiClient()
+    models = CountingModels(latency)
+    sdk = SimpleNamespace(
+        models=models,
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=models.agenerate_content)),
+    )
+    client._pool = ClientPool({"test-key": sdk}, [client.model_name])
+    return client, models
+
+
+def _threads(callers, fn):
+    barrier = threading.Barrier(callers)
+
+    def call(i):
+        barrier.wait()
+        return fn(i)
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        return list(pool.map(call, range(callers)))
+
+
+async def _coroutines(callers, fn):
+    return await asyncio.gather(*(fn(i) for i in range(callers)))
+
+
+async def _cancelled_leader(callers, latency, fn):
+    """Cancel the first caller halfway through its call; the others' results."""
+    leader = asyncio.ensure_future(fn(0))
+    await asyncio.sleep(latency / 4)
+    followers = [asyncio.ensure_future(fn(i)) for i in range(1, callers)]
+    await asyncio.sleep(latency / 4)
+    leader.cancel()
+    return await asyncio.gather(*followers)
+
+
+def _check(name, models, results, expected_calls, expected_responses=None):
+    responses = {result["response"] for result in results}
+    # Every caller gets the answer of the call it shared
+    ok = models.calls == expected_calls and len(responses) == (expected_responses or expected_calls)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<28} {len(results):>4} callers -> "
+          f"{models.calls} upstream call(s), {len(responses)} distinct response(s)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--callers", type=int, default=50, help="Concurrent callers per check (default: 50)")
+    parser.add_argument("--latency-ms", type=int, default=200,
+                        help="Simulated upstream latency (default: 200)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from django.conf import settings
+
+    settings.GEMINI_SINGLE_FLIGHT = True
+    settings.GEMINI_CONTEXT_CACHE = False
+    latency = args.latency_ms / 1000
+    question = [{"role": "user", "content": "Best family car under 20k JOD?"}]
+    results = []
+
+    client, models = _client(latency)
+    results.append(_check("chat, threads", models,
+                          _threads(args.callers, lambda i: client.chat(question, system_prompt="sys")), 1))
+
+    client, models = _client(latency)
+    results.append(_check("achat, coroutines", models, asyncio.run(
+        _coroutines(args.callers, lambda i: client.achat(question, system_prompt="sys"))), 1))
+
+    client, models = _client(latency)
+    image = os.urandom(4096)
+    results.append(_check("analyze_image, threads", models,
+                          _threads(args.callers, lambda i: client.analyze_image(image, "Identify the car")), 1))
+
+    client, models = _client(latency)
+    results.append(_check("chat, distinct prompts", models, _threads(
+        args.callers,
+        lambda i: client.chat([{"role": "user", "content": f"question {i}"}], system_prompt="sys"),
+    ), args.callers))
+
+    # The cancelled leader's call is abandoned; one follower makes it again
+    client, models = _client(latency)
+    results.append(_check("achat, leader cancelled", models, asyncio.run(_cancelled_leader(
+        args.callers, latency, lambda i: client.achat(question, system_prompt="sys"))), 2, 1))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
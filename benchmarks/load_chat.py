@@ -0,0 +1,148 @@
+"""
+Load test: sync /api/chat/ on a threaded WSGI worker vs async /api/chat/async/ on ASGI.
+
+Run from the project root:
+
+    python benchmarks/load_chat.py [--concurrency 10,50,200] [--threads 4] [--latency-ms 2000]
+    python benchmarks/load_chat.py --url http://127.0.0.1:8000   # a running server, both endpoints
+
+By default both applications are served in-process through httpx, with
+Gemini in mock mode and GEMINI_MOCK_LATENCY_MS standing in for the model's
+response time:
+
+  - wsgi: config/wsgi.py behind a pool of --threads threads, the way a
+    threaded WSGI worker (e.g. gunicorn --threads 4) serves /api/chat/. Each
+    conversation holds a thread until the model answers.
+  - asgi: config/asgi.py serving /api/chat/async/ from one event loop.
+
+"parallel" is the effective number of conversations in flight:
+requests x mean latency / wall time. Chat sessions created by an in-process
+run are deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx is in requirements.txt
+    httpx = None
+
+ENDPOINTS = {"sync": "/api/chat/", "async": "/api/chat/async/"}
+
+
+def _payload(i):
+    return {"message": f"load test {i}: price of a 2018 Toyota Camry?"}
+
+
+async def _one(client, path, i):
+    start = time.perf_counter()
+    response = await client.post(path, json=_payload(i))
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def _one_sync(client, path, i):
+    start = time.perf_counter()
+    response = client.post(path, json=_payload(i))
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def _level(send, concurrency):
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(send(i) for i in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def _report(name, concurrency, wall, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<14} {concurrency:>5} {wall:>8.2f} {concurrency / wall:>8.1f} "
+        f"{statistics.median(ordered) * 1000:>8.0f} {p95 * 1000:>8.0f} "
+        f"{sum(latencies) / wall:>9.1f}"
+    )
+
+
+async def _run_async(name, client, path, levels):
+    async with client:
+        await _one(client, path, -1)  # warm-up
+        for concurrency in levels:
+            _report(name, concurrency, *await _level(lambda i: _one(client, path, i), concurrency))
+
+
+async def _run_threaded(name, client, path, levels, threads):
+    loop = asyncio.get_running_loop()
+    with client, ThreadPoolExecutor(max_workers=threads) as pool:
+        def send(i):
+            return loop.run_in_executor(pool, _one_sync, client, path, i)
+
+        await send(-1)  # warm-up
+        for concurrency in levels:
+            _report(name, concurrency, *await _level(send, concurrency))
+
+
+def _header():
+    print(f"{'server':<14} {'conc':>5} {'wall s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'parallel':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="10,50,200",
+                        type=lambda value: [int(n) for n in value.split(",")],
+                        help="Comma-separated concurrent request counts (default: 10,50,200)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="Threads of the in-process WSGI worker (default: 4)")
+    parser.add_argument("--latency-ms", type=int, default=2000,
+                        help="Simulated model latency for the in-process run (default: 2000)")
+    parser.add_argument("--url", help="Base URL of a running server instead of the in-process app")
+    args = parser.parse_args()
+
+    if httpx is None:
+        print("httpx is required: pip install httpx")
+        return 1
+
+    if args.url:
+        _header()
+        for name, path in ENDPOINTS.items():
+            client = httpx.AsyncClient(base_url=args.url, timeout=None)
+            asyncio.run(_run_async(name, client, path, args.concurrency))
+        return 0
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from django.conf import settings
+    from config.asgi import application as asgi_application
+    from config.wsgi import application as wsgi_application
+    from core.models.chat import ChatSession
+
+    # Mock mode: no API calls, fixed model latency
+    settings.GEMINI_API_KEY = ""
+    settings.GEMINI_API_KEYS = []
+    os.environ["GEMINI_API_KEY"] = ""
+    settings.GEMINI_MOCK_LATENCY_MS = args.latency_ms
+    print(f"in-process apps, mock model latency {args.latency_ms} ms")
+
+    last_session = ChatSession.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    try:
+        _header()
+        wsgi_client = httpx.Client(transport=httpx.WSGITransport(app=wsgi_application),
+                                   base_url="http://localhost", timeout=None)
+        asyncio.run(_run_threaded(f"wsgi {args.threads} thr", wsgi_client, ENDPOINTS["sync"],
+                                  args.concurrency, args.threads))
+        asgi_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_application),
+                                        base_url="http://localhost", timeout=None)
+        asyncio.run(_run_async("asgi async", asgi_client, ENDPOINTS["async"], args.concurrency))
+    finally:
+        ChatSession.objects.filter(id__gt=last_session).delete()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -104,8 +104,10 @@ SPECTACULAR_SETTINGS = {
     'TAGS': [
         {'name': 'Chat', 'description': 'AI chatbot conversation'},
         {'name': 'Price Estimator', 'description': 'Rule-based car price estimation in JOD'},
+        {'name': 'Listings', 'description': 'Marketplace listings and comparable cars'},
         {'name': 'Vision', 'description': 'Car image analysis with Gemini Vision'},
         {'name': 'WhatsApp', 'description': 'Send messages via Twilio WhatsApp'},
+        {'name': 'Internal', 'description': 'Operational metrics (staff only, or DEBUG)'},
     ],
 }
 
@@ -115,6 +117,68 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
 GEMINI_VISION_MODEL = os.getenv('GEMINI_VISION_MODEL', 'gemini-2.5-flash')
+# Explicit context caching of system prompts (only prompts of at least ~MIN_TOKENS are cached)
+GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'True').lower() == 'true'
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600'))
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('GEMINI_CONTEXT_CACHE_MIN_TOKENS', '1024'))
+# Identical chat / vision requests in flight at the same time share one Gemini call
+GEMINI_SINGLE_FLIGHT = os.getenv('GEMINI_SINGLE_FLIGHT', 'True').lower() == 'true'
+# Client-side token bucket sized to the Gemini quota (0 = no limit); interactive chat is served
+# before background work. Rate limits and transient errors are retried with jittered backoff.
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', '0'))
+GEMINI_RATE_LIMIT_BURST = int(os.getenv('GEMINI_RATE_LIMIT_BURST', '10'))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', '20'))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', '1.0'))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', '10'))
+# Endpoint pool: every key x every model, with circuit breakers and failover between models.
+# Empty lists fall back to GEMINI_API_KEY and to both flash models (GEMINI_MODEL_SWITCH first).
+GEMINI_API_KEYS = [key.strip() for key in os.getenv('GEMINI_API_KEYS', '').split(',') if key.strip()]
+GEMINI_MODELS = [model.strip() for model in os.getenv('GEMINI_MODELS', '').split(',') if model.strip()]
+GEMINI_BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', '5'))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv('GEMINI_BREAKER_COOLDOWN', '30'))
+# Mock mode only (no API key): simulated model latency, for load tests
+GEMINI_MOCK_LATENCY_MS = int(os.getenv('GEMINI_MOCK_LATENCY_MS', '0'))
+
+# Chat history sent per turn: rolling session summary + the most recent turns within a token budget
+CHAT_HISTORY_MAX_TURNS = int(os.getenv('CHAT_HISTORY_MAX_TURNS', '10'))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '3000'))
+# Sessions whose summary + recent messages each worker keeps in memory (LRU)
+CHAT_SESSION_CACHE_SIZE = int(os.getenv('CHAT_SESSION_CACHE_SIZE', '1000'))
+# Answers to repeated first-turn / short-conversation chat questions, per worker (0 disables)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '2000'))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', str(6 * 3600)))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.88'))
+RESPONSE_CACHE_MAX_HISTORY = int(os.getenv('RESPONSE_CACHE_MAX_HISTORY', '2'))
+
+# Shared cache: with several workers, set REDIS_URL so cached chat sessions are invalidated
+# across all of them (default: per-process memory cache)
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+# Gemini quota bucket, response cache and in-flight requests shared by all workers: redis://...,
+# or sqlite:///path.db for the processes of one machine (default: REDIS_URL; empty = per process)
+SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', REDIS_URL)
+
+# Browser/CDN cache lifetime (seconds) for the catalog endpoints (/api/makes/, /api/models/).
+# 0 = no-cache: clients keep the body but revalidate with the ETag (a cheap 304) on every use,
+# so a hot-reloaded catalog shows up at once.
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', '0'))
+
+# Price estimate persistence: write-behind batches inserts off the request path
+PRICE_ESTIMATE_WRITE_BEHIND = os.getenv('PRICE_ESTIMATE_WRITE_BEHIND', 'False').lower() == 'true'
+PRICE_ESTIMATE_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('PRICE_ESTIMATE_WRITE_BEHIND_BATCH_SIZE', '500'))
+PRICE_ESTIMATE_WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('PRICE_ESTIMATE_WRITE_BEHIND_FLUSH_INTERVAL', '1.0'))
+PRICE_ESTIMATE_WRITE_BEHIND_MAX_QUEUE = int(os.getenv('PRICE_ESTIMATE_WRITE_BEHIND_MAX_QUEUE', '10000'))
+
+# Comparable-listings index (per worker): pick up new listings / fully rebuild every N seconds
+COMPS_INDEX_REFRESH_INTERVAL = float(os.getenv('COMPS_INDEX_REFRESH_INTERVAL', '30'))
+COMPS_INDEX_REBUILD_INTERVAL = float(os.getenv('COMPS_INDEX_REBUILD_INTERVAL', '3600'))
 
 # Twilio WhatsApp Configuration
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
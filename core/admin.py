@@ -1,17 +1,39 @@
 from django.contrib import admin
-from core.models import CarListing, ChatSession, ChatMessage, PriceEstimate, VisionAnalysis
+from core.models import (
+    CarListing, ChatSession, ChatMessage, JobCheckpoint, ListingPriceFlag, PriceEstimate, VisionAnalysis,
+)
 
 
 @admin.register(CarListing)
 class CarListingAdmin(admin.ModelAdmin):
-    list_display = ('make', 'model', 'year', 'category', 'listing_price_jod', 'is_sold')
+    list_display = ('make', 'model', 'year', 'category', 'listing_price_jod', 'estimated_price_jod', 'is_sold')
     list_filter = ('category', 'make', 'is_sold')
     search_fields = ('make', 'model')
 
 
+@admin.register(ListingPriceFlag)
+class ListingPriceFlagAdmin(admin.ModelAdmin):
+    list_display = ('listing', 'listing_price_jod', 'expected_price_jod', 'deviation_pct',
+                    'score', 'direction', 'reviewed', 'flagged_at')
+    list_filter = ('direction', 'reviewed', 'catalog_version')
+    search_fields = ('listing__make', 'listing__model')
+    list_select_related = ('listing',)
+    raw_id_fields = ('listing',)
+    actions = ['mark_reviewed']
+
+    @admin.action(description='Mark selected flags as reviewed')
+    def mark_reviewed(self, request, queryset):
+        queryset.update(reviewed=True)
+
+
+@admin.register(JobCheckpoint)
+class JobCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'watermark', 'updated_at')
+
+
 @admin.register(ChatSession)
 class ChatSessionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'started_at', 'ended_at')
+    list_display = ('id', 'started_at', 'ended_at', 'summary_upto')
 
 
 @admin.register(ChatMessage)
@@ -22,8 +44,9 @@ class ChatMessageAdmin(admin.ModelAdmin):
 
 @admin.register(PriceEstimate)
 class PriceEstimateAdmin(admin.ModelAdmin):
-    list_display = ('make', 'model', 'year', 'category', 'depreciated_price_jod', 'created_at')
-    list_filter = ('category',)
+    list_display = ('make', 'model', 'year', 'mileage_km', 'category', 'depreciated_price_jod',
+                    'hit_count', 'last_seen', 'catalog_version')
+    list_filter = ('category', 'catalog_version')
 
 
 @admin.register(VisionAnalysis)
@@ -5,3 +5,6 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'IntelliWheels Core'
+
+    def ready(self):
+        from core import signals  # noqa: F401
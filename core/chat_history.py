@@ -0,0 +1,165 @@
+"""
+Chat history window — what the chatbot is sent of a session on each turn.
+
+Instead of the whole conversation, a turn sends:
+  - the session's rolling summary (ChatSession.summary), and
+  - the most recent messages after it: at most CHAT_HISTORY_MAX_TURNS turns,
+    and at most CHAT_HISTORY_TOKEN_BUDGET tokens together with the summary.
+
+Only that window is read from the database (newest first, with a LIMIT), so a
+turn costs the same however long the session gets. Workers keep the window of
+active sessions in memory (core/session_cache.py).
+
+Messages that fall out of the window are folded into the summary in the
+background. The summarizer gets the current summary plus the messages after
+ChatSession.summary_upto, and stores the result with a conditional update, so
+two workers cannot move the summary backwards. Until the update lands, the
+dropped messages are simply not sent.
+
+Token counts are estimated at ~4 characters per token; no tokenizer is loaded.
+"""
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from django.conf import settings
+
+from ai_engine.prompts import load_prompt
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+SUMMARY_PREFIX = "Summary of our conversation so far:\n"
+# Messages folded per summarizer call, and the longest slice of one message it sees
+SUMMARY_BATCH_MESSAGES = 50
+SUMMARY_MESSAGE_CHARS = 2000
+
+SUMMARY_PROMPT = load_prompt('chat_summary.md')
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def window_size() -> int:
+    """Rows a window is chosen from: one more than CHAT_HISTORY_MAX_TURNS allows, so overflow shows up."""
+    return settings.CHAT_HISTORY_MAX_TURNS * 2 + 1
+
+
+def window_queryset(session_id: int, summary_upto: int = None):
+    """Newest-first candidate rows for the window: the most recent unsummarized messages."""
+    from core.models.chat import ChatMessage
+
+    messages = ChatMessage.objects.filter(session_id=session_id).order_by('-id')
+    if summary_upto:
+        messages = messages.filter(id__gt=summary_upto)
+    return messages.values('id', 'role', 'content')[:window_size()]
+
+
+def build_history(session, rows: List[Dict]) -> List[Dict[str, str]]:
+    """
+    History to send with the next message: the session summary plus the
+    window_queryset() rows that fit the turn and token limits.
+
+    Schedules a summary update when older messages had to be left out.
+    """
+    summary = session.summary
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET - (estimate_tokens(summary) if summary else 0)
+    max_messages = settings.CHAT_HISTORY_MAX_TURNS * 2
+
+    window = []
+    for row in rows:
+        cost = estimate_tokens(row['content'])
+        if len(window) >= max_messages or cost > budget:
+            break
+        budget -= cost
+        window.append(row)
+    # Start the window on a user message so the turns alternate
+    while window and window[-1]['role'] != 'user':
+        window.pop()
+
+    if len(window) < len(rows):
+        schedule_summary(session.pk, rows[len(window)]['id'])
+
+    history = [{'role': row['role'], 'content': row['content']} for row in reversed(window)]
+    if summary:
+        if history:
+            history[0] = {'role': 'user', 'content': f"{SUMMARY_PREFIX}{summary}\n\n{history[0]['content']}"}
+        else:
+            history = [{'role': 'user', 'content': f"{SUMMARY_PREFIX}{summary}"}]
+    return history
+
+
+# ---------------------------------------------------------------
+# Background summarizer
+# ---------------------------------------------------------------
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-summary')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_summary(session_id: int, upto_id: int) -> None:
+    """Fold the session's messages up to upto_id into its summary, in the background."""
+    with _pending_lock:
+        if session_id in _pending:
+            return
+        _pending.add(session_id)
+    _executor.submit(_summarize_in_background, session_id, upto_id)
+
+
+def summarize_session(session_id: int, upto_id: int) -> bool:
+    """
+    Fold the messages after summary_upto, up to upto_id, into the session summary.
+
+    At most SUMMARY_BATCH_MESSAGES are folded per call; later turns continue
+    from there. Returns True if the summary was updated.
+    """
+    from ai_engine.llm_client import get_gemini_client
+    from ai_engine.rate_limiter import BACKGROUND
+    from core.models.chat import ChatMessage, ChatSession
+
+    session = ChatSession.objects.filter(pk=session_id).values('summary', 'summary_upto').first()
+    if session is None or (session['summary_upto'] or 0) >= upto_id:
+        return False
+    messages = list(
+        ChatMessage.objects
+        .filter(session_id=session_id, id__gt=session['summary_upto'] or 0, id__lte=upto_id)
+        .order_by('id')
+        .values_list('id', 'role', 'content')[:SUMMARY_BATCH_MESSAGES]
+    )
+    if not messages:
+        return False
+
+    transcript = "\n".join(
+        f"{role.capitalize()}: {content[:SUMMARY_MESSAGE_CHARS]}" for _, role, content in messages
+    )
+    prompt = f"Current summary:\n{session['summary'] or '(none)'}\n\nNew messages:\n{transcript}"
+    result = get_gemini_client().chat(
+        [{"role": "user", "content": prompt}], system_prompt=SUMMARY_PROMPT, priority=BACKGROUND,
+    )
+    if result.get('model_used') in ('mock', 'error', 'rate_limited'):
+        # No usable summary: keep the current one, a later turn tries again
+        return False
+
+    updated = ChatSession.objects.filter(pk=session_id, summary_upto=session['summary_upto']).update(
+        summary=result['response'].strip(), summary_upto=messages[-1][0],
+    )
+    if updated:
+        from core.session_cache import bump_generation
+        bump_generation(session_id)
+    return bool(updated)
+
+
+def _summarize_in_background(session_id: int, upto_id: int) -> None:
+    from django.db import connection
+
+    try:
+        summarize_session(session_id, upto_id)
+    except Exception as e:
+        logger.error(f"Chat summary for session {session_id} failed: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(session_id)
+        connection.close()
@@ -0,0 +1,360 @@
+"""
+Comparable listings — in-memory nearest-neighbour index over unsold CarListings.
+
+Listings are bucketed by catalog (make, model). Inside a bucket each listing is
+a point of year, mileage and log asking price, stored in growable NumPy
+arrays, so a query is one vectorized distance pass plus argpartition instead
+of an ORM filter scan.
+
+A query searches three tiers: the same model, then other models of the same
+make (+MODEL_MISMATCH distance), then other makes of the same category
+(+MAKE_MISMATCH). A farther tier is only scanned while it could still beat the
+current k-th match.
+
+Each worker process keeps its own index:
+  - saves/deletes in this process are applied through model signals
+    (core/signals.py) once the transaction commits;
+  - listings saved by other processes are picked up every
+    COMPS_INDEX_REFRESH_INTERVAL seconds: everything whose updated_at is
+    past the last refresh, minus REFRESH_OVERLAP for clock skew and
+    transactions that commit late;
+  - the whole index is rebuilt in the background every
+    COMPS_INDEX_REBUILD_INTERVAL seconds to catch remote deletes. Saves and
+    deletes that arrive while it runs are replayed onto the new index before
+    it is swapped in.
+"""
+import datetime
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from ai_engine.catalog import get_catalog
+from ai_engine.valuation_grid import DEFAULT_CATEGORY
+
+logger = logging.getLogger(__name__)
+
+# Feature scales: one unit of distance is ~2 model years, ~40,000 km, or a 15% price gap
+YEAR_SCALE = 2.0
+MILEAGE_SCALE = 40_000.0
+PRICE_SCALE = 0.15
+MODEL_MISMATCH = 1.5
+MAKE_MISMATCH = 3.0
+# Price term for listings without an asking price, when the query has one
+MISSING_PRICE = 1.0
+
+# How far back each refresh looks before the previous one started
+REFRESH_OVERLAP = datetime.timedelta(seconds=60)
+
+_LISTING_FIELDS = ('pk', 'make', 'model', 'year', 'mileage_km', 'listing_price_jod', 'category', 'updated_at')
+
+
+class _Bucket:
+    """Feature arrays for the listings of one (make, model); removed slots are tombstoned."""
+
+    def __init__(self, category: str, capacity: int = 16):
+        self.category = category
+        self.size = 0
+        self.dead = 0
+        self.pks = np.zeros(capacity, dtype=np.int64)
+        self.years = np.zeros(capacity, dtype=np.float64)
+        self.mileages = np.zeros(capacity, dtype=np.float64)
+        self.log_prices = np.full(capacity, np.nan)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def add(self, pk: int, year: int, mileage_km: int, price: Optional[float]) -> int:
+        if self.size == len(self.pks):
+            self._resize(2 * len(self.pks))
+        slot = self.size
+        self.pks[slot] = pk
+        self.years[slot] = year
+        self.mileages[slot] = mileage_km
+        self.log_prices[slot] = math.log(price) if price else np.nan
+        self.alive[slot] = True
+        self.size += 1
+        return slot
+
+    def kill(self, slot: int) -> None:
+        self.alive[slot] = False
+        self.dead += 1
+
+    def compact(self) -> None:
+        """Drop tombstoned slots. Slot numbers change; the caller re-maps them."""
+        keep = np.flatnonzero(self.alive[:self.size])
+        for name in ('pks', 'years', 'mileages', 'log_prices', 'alive'):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.size, self.dead = len(keep), 0
+        self.alive[self.size:] = False
+
+    def distances(self, year: float, mileage_km: float, log_price: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances of the live slots to the query, and their primary keys."""
+        alive = self.alive[:self.size]
+        d2 = ((self.years[:self.size] - year) / YEAR_SCALE) ** 2
+        d2 += ((self.mileages[:self.size] - mileage_km) / MILEAGE_SCALE) ** 2
+        if log_price is not None:
+            price_term = ((self.log_prices[:self.size] - log_price) / PRICE_SCALE) ** 2
+            d2 += np.nan_to_num(price_term, nan=MISSING_PRICE ** 2)
+        return np.sqrt(d2[alive]), self.pks[:self.size][alive]
+
+    def _resize(self, capacity: int) -> None:
+        for name in ('pks', 'years', 'mileages', 'log_prices', 'alive'):
+            old = getattr(self, name)
+            new = np.full(capacity, np.nan) if name == 'log_prices' else np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+class CompsIndex:
+    """Nearest-neighbour index over unsold listings (see module docstring)."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._by_make: Dict[str, Set[Tuple[str, str]]] = {}
+        self._by_category: Dict[str, Set[Tuple[str, str]]] = {}
+        self._slots: Dict[int, Tuple[Tuple[str, str], int]] = {}
+        # updated_at of the version of each listing the index holds
+        self._versions: Dict[int, datetime.datetime] = {}
+        self._lock = threading.RLock()
+        self.synced_until: Optional[datetime.datetime] = None
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    # -- maintenance -----------------------------------------------------
+
+    def load(self, queryset) -> int:
+        """Add the unsold listings of a queryset. Returns the number added."""
+        added = 0
+        rows = queryset.filter(is_sold=False).order_by('pk').values_list(*_LISTING_FIELDS)
+        for pk, make, model, year, mileage_km, price, category, updated_at in rows.iterator(chunk_size=5000):
+            with self._lock:
+                self._add(pk, make, model, year, mileage_km, price, category)
+                self._versions[pk] = updated_at
+            added += 1
+        return added
+
+    def apply_changes(self, queryset) -> int:
+        """Upsert the listings of a queryset that the index holds no current version of. Returns the number."""
+        applied = 0
+        rows = queryset.values_list(*_LISTING_FIELDS, 'is_sold')
+        for pk, make, model, year, mileage_km, price, category, updated_at, is_sold in rows.iterator(chunk_size=5000):
+            with self._lock:
+                if self._versions.get(pk) == updated_at:
+                    continue
+                self._remove(pk)
+                if not is_sold:
+                    self._add(pk, make, model, year, mileage_km, price, category)
+                    self._versions[pk] = updated_at
+            applied += 1
+        return applied
+
+    def upsert(self, listing) -> None:
+        """Insert or move a listing; sold listings are removed."""
+        with self._lock:
+            self._remove(listing.pk)
+            if not listing.is_sold:
+                self._add(listing.pk, listing.make, listing.model, listing.year,
+                          listing.mileage_km, listing.listing_price_jod, listing.category)
+                self._versions[listing.pk] = listing.updated_at
+
+    def remove(self, pk: int) -> None:
+        with self._lock:
+            self._remove(pk)
+
+    def _add(self, pk, make, model, year, mileage_km, price, category) -> None:
+        key, catalog_category = _bucket_key(make, model)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(catalog_category or category or DEFAULT_CATEGORY)
+            self._by_make.setdefault(key[0], set()).add(key)
+            self._by_category.setdefault(bucket.category, set()).add(key)
+        slot = bucket.add(pk, year, mileage_km or 0, float(price) if price else None)
+        self._slots[pk] = (key, slot)
+
+    def _remove(self, pk) -> None:
+        self._versions.pop(pk, None)
+        found = self._slots.pop(pk, None)
+        if found is None:
+            return
+        key, slot = found
+        bucket = self._buckets[key]
+        bucket.kill(slot)
+        if bucket.dead > 32 and bucket.dead * 2 > bucket.size:
+            bucket.compact()
+            for new_slot, live_pk in enumerate(bucket.pks[:bucket.size].tolist()):
+                self._slots[live_pk] = (key, new_slot)
+
+    # -- queries ---------------------------------------------------------
+
+    def query(
+        self,
+        make: str,
+        model: str,
+        year: int,
+        mileage_km: int = 0,
+        price_jod: float = None,
+        k: int = 10,
+        exclude_pk: int = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (listing pk, distance) pairs, nearest first."""
+        key, catalog_category = _bucket_key(make, model)
+        category = catalog_category or DEFAULT_CATEGORY
+        same_make = self._by_make.get(key[0], set())
+        tiers = [
+            ({key}, 0.0),
+            (same_make - {key}, MODEL_MISMATCH),
+            (self._by_category.get(category, set()) - same_make, MAKE_MISMATCH),
+        ]
+        log_price = math.log(price_jod) if price_jod else None
+        want = k + (exclude_pk is not None)
+
+        found_d, found_pk = [], []
+        with self._lock:
+            for keys, penalty in tiers:
+                if len(found_d) >= want and _kth(found_d, want) <= penalty:
+                    break
+                for bucket_key in keys:
+                    bucket = self._buckets.get(bucket_key)
+                    if bucket is None or bucket.size == bucket.dead:
+                        continue
+                    d, pks = bucket.distances(year, mileage_km, log_price)
+                    if len(d) > want:
+                        top = np.argpartition(d, want - 1)[:want]
+                        d, pks = d[top], pks[top]
+                    found_d.extend((d + penalty).tolist())
+                    found_pk.extend(pks.tolist())
+
+        ranked = sorted(zip(found_pk, found_d), key=lambda pair: pair[1])
+        return [(pk, round(d, 4)) for pk, d in ranked if pk != exclude_pk][:k]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'listings': len(self._slots),
+                'buckets': len(self._buckets),
+                'tombstones': sum(bucket.dead for bucket in self._buckets.values()),
+                'synced_until': self.synced_until.isoformat() if self.synced_until else None,
+                'age_s': round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+            }
+
+
+def _bucket_key(make: str, model: str) -> Tuple[Tuple[str, str], Optional[str]]:
+    """Catalog (make, model) key and category for a listing, or the raw names if unknown."""
+    catalog = get_catalog()
+    match = catalog.index.resolve(make, model)
+    if match:
+        return (match.make, match.model), catalog.cars[match.make][match.model]['category']
+    return (make.strip().lower(), model.strip().lower()), None
+
+
+def _kth(values: List[float], k: int) -> float:
+    return sorted(values)[k - 1]
+
+
+# ---------------------------------------------------------------
+# Per-process index
+# ---------------------------------------------------------------
+_index: Optional[CompsIndex] = None
+_index_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_next_refresh = 0.0
+_rebuilding = False
+# Saves/deletes seen while a rebuild runs, replayed onto the new index (None: no rebuild)
+_pending: Optional[List[Tuple[str, object]]] = None
+_pending_lock = threading.Lock()
+
+
+def current_comps_index() -> Optional[CompsIndex]:
+    """The index of this process if it has been built, else None (never triggers a build)."""
+    return _index
+
+
+def get_comps_index() -> CompsIndex:
+    """The comps index of this process, built on first use and kept fresh."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _build()
+        return _index
+    _maybe_refresh()
+    return _index
+
+
+def upsert_listing(listing) -> None:
+    """Apply a committed save to the current index (if built), and to the one being rebuilt."""
+    _apply('upsert', listing)
+
+
+def remove_listing(pk: int) -> None:
+    """Apply a committed delete to the current index (if built), and to the one being rebuilt."""
+    _apply('remove', pk)
+
+
+def _apply(operation: str, arg) -> None:
+    with _pending_lock:
+        index = _index
+        if index is None:
+            return
+        if _pending is not None:
+            _pending.append((operation, arg))
+    getattr(index, operation)(arg)
+
+
+def _build() -> CompsIndex:
+    from core.models import CarListing
+
+    start = time.perf_counter()
+    index = CompsIndex()
+    # Taken before the query: anything saved from here on is seen by the next refresh
+    index.synced_until = timezone.now()
+    index.load(CarListing.objects.all())
+    index.built_at = time.monotonic()
+    logger.info(f"Comps index built: {len(index):,} listings in {time.perf_counter() - start:.2f}s")
+    return index
+
+
+def _maybe_refresh() -> None:
+    """Pick up listings saved by other processes; start a full rebuild when due."""
+    global _next_refresh, _rebuilding
+    if time.monotonic() < _next_refresh or not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        _next_refresh = time.monotonic() + settings.COMPS_INDEX_REFRESH_INTERVAL
+        index = _index
+        if time.monotonic() - index.built_at >= settings.COMPS_INDEX_REBUILD_INTERVAL and not _rebuilding:
+            _rebuilding = True
+            threading.Thread(target=_rebuild_in_background, name='comps-rebuild', daemon=True).start()
+        from core.models import CarListing
+        since, index.synced_until = index.synced_until, timezone.now()
+        index.apply_changes(CarListing.objects.filter(updated_at__gte=since - REFRESH_OVERLAP))
+    finally:
+        _refresh_lock.release()
+
+
+def _rebuild_in_background() -> None:
+    global _index, _rebuilding, _pending
+    from django.db import connection
+
+    with _pending_lock:
+        _pending = []
+    try:
+        index = _build()
+        with _pending_lock:
+            for operation, arg in _pending:
+                getattr(index, operation)(arg)
+            _index = index
+    except Exception as e:
+        logger.error(f"Comps index rebuild failed, keeping the current index: {e}")
+    finally:
+        with _pending_lock:
+            _pending = None
+        _rebuilding = False
+        connection.close()
@@ -0,0 +1 @@
+# IntelliWheels batch jobs
@@ -0,0 +1,135 @@
+"""
+Listing price anomalies — flags unsold listings priced far from market.
+
+Each listing's expected price comes from estimate_prices_batch(), a chunk at a
+time. The deviation is scored on the log scale against the market spread that
+the price range engine assumes for the car's category (ai_engine/price_range.py):
+
+    z = ln(asking / expected) / sqrt(base_sd² + (age · rate_sd / (1 - rate))²)
+
+A listing with |z| >= the threshold gets a ListingPriceFlag, which is updated
+on re-scans. When a listing returns to the normal range, is sold or loses its
+price, its flag is removed.
+
+The scan is incremental. A JobCheckpoint remembers when the last run started,
+and the next run only reads listings whose updated_at is at or after that
+time. A new catalog version changes every expectation, so it triggers a full
+scan.
+"""
+import logging
+from decimal import Decimal
+from typing import Dict
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from ai_engine.catalog import get_catalog
+from ai_engine.price_estimator import _resolve_rows, estimate_prices_batch
+from ai_engine.price_range import DEFAULT_UNCERTAINTY, UNCERTAINTY
+from core.jobs.keyset import keyset_chunks
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'listing_price_anomalies'
+ANOMALY_SCORE_THRESHOLD = 3.0
+_CENT = Decimal('0.01')
+
+
+def scan_listing_prices(
+    full: bool = False,
+    chunk_size: int = 5000,
+    threshold: float = ANOMALY_SCORE_THRESHOLD,
+) -> Dict:
+    """
+    Score new and changed listings and update their flags.
+
+    Returns counts (scanned, flagged, cleared) plus whether the scan was full.
+    """
+    from core.models import CarListing, JobCheckpoint
+
+    catalog = get_catalog()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    if checkpoint.state.get('catalog_fingerprint') != catalog.fingerprint or checkpoint.watermark is None:
+        full = True
+
+    # Listings saved while the scan runs get updated_at >= started and are read next time
+    started = timezone.now()
+    listings = CarListing.objects.filter(updated_at__lt=started)
+    if not full:
+        listings = listings.filter(updated_at__gte=checkpoint.watermark)
+    listings = listings.values_list('pk', 'make', 'model', 'year', 'mileage_km', 'listing_price_jod', 'is_sold')
+
+    totals = {'scanned': 0, 'flagged': 0, 'cleared': 0}
+    for chunk in keyset_chunks(listings, chunk_size):
+        flagged, cleared = _scan_chunk(chunk, catalog, threshold)
+        totals['scanned'] += len(chunk)
+        totals['flagged'] += flagged
+        totals['cleared'] += cleared
+
+    checkpoint.watermark = started
+    checkpoint.state = {'catalog_fingerprint': catalog.fingerprint, 'catalog_version': catalog.version}
+    checkpoint.save()
+    logger.info(f"Price anomaly scan ({'full' if full else 'incremental'}): {totals}")
+    return {**totals, 'full': full}
+
+
+def score_prices(makes, models, years, mileages_km, prices, catalog=None):
+    """
+    Expected prices and anomaly scores for columnar listing data.
+
+    Returns (expected, score): score is signed, negative when under market.
+    """
+    catalog = catalog or get_catalog()
+    expected = estimate_prices_batch(makes, models, years, mileages_km)["depreciated_price_jod"]
+    categories, _, rates = _resolve_rows(makes, models, catalog)
+
+    spreads = np.asarray([UNCERTAINTY.get(c, DEFAULT_UNCERTAINTY) for c in categories], dtype=np.float64)
+    spreads = spreads.reshape(len(categories), -1)
+    base_sd, rate_sd = spreads[:, 0], spreads[:, 1]
+    age = np.maximum(0, timezone.now().year - np.asarray(years, dtype=np.float64))
+    # d/dr ln((1 - r)^age) = -age / (1 - r): first-order spread of the depreciation term
+    sigma = np.sqrt(base_sd ** 2 + (age * rate_sd / (1 - rates)) ** 2)
+
+    score = np.log(np.asarray(prices, dtype=np.float64) / expected) / sigma
+    return expected, score
+
+
+def _scan_chunk(chunk, catalog, threshold):
+    from core.models import ListingPriceFlag
+
+    pks = [row[0] for row in chunk]
+    priced = [row for row in chunk if row[5] and row[5] > 0 and not row[6]]
+    anomalies = {}
+    if priced:
+        pk, makes, models, years, mileages, prices, _ = zip(*priced)
+        expected, score = score_prices(makes, models, years, mileages, [float(p) for p in prices], catalog)
+        for i in np.flatnonzero(np.abs(score) >= threshold).tolist():
+            anomalies[pk[i]] = (prices[i], expected[i].item(), score[i].item())
+
+    with transaction.atomic():
+        existing = ListingPriceFlag.objects.select_for_update().in_bulk(pks, field_name='listing_id')
+        stale = [listing_id for listing_id in existing if listing_id not in anomalies]
+        cleared = ListingPriceFlag.objects.filter(listing_id__in=stale).delete()[0] if stale else 0
+
+        to_create, to_update = [], []
+        for listing_id, (price, expected, score) in anomalies.items():
+            flag = existing.get(listing_id) or ListingPriceFlag(listing_id=listing_id)
+            if flag.pk and flag.listing_price_jod != price:
+                # The seller changed the price: review again
+                flag.reviewed = False
+            flag.listing_price_jod = price
+            flag.expected_price_jod = Decimal(repr(expected)).quantize(_CENT)
+            flag.deviation_pct = round((float(price) / expected - 1) * 100, 2)
+            flag.score = round(abs(score), 3)
+            flag.direction = 'under' if score < 0 else 'over'
+            flag.catalog_version = catalog.version
+            flag.flagged_at = timezone.now()
+            (to_update if flag.pk else to_create).append(flag)
+        ListingPriceFlag.objects.bulk_create(to_create)
+        ListingPriceFlag.objects.bulk_update(to_update, [
+            'listing_price_jod', 'expected_price_jod', 'deviation_pct', 'score',
+            'direction', 'catalog_version', 'reviewed', 'flagged_at',
+        ])
+
+    return len(anomalies), cleared
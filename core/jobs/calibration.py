@@ -0,0 +1,173 @@
+"""
+Depreciation calibration — fits the catalog's depreciation rates to the asking
+prices in CarListing.
+
+For a catalog car listed at price p, age a and mileage penalty m, the
+estimator assumes p = base * (1 - m) * (1 - r)^a. In logs that is a line
+through the origin:
+
+    y = log(p / (base * (1 - m))) = a * log(1 - r)
+
+Its least-squares slope is b = Σ(a·y) / Σ(a²), so r = 1 - exp(b). Those sums
+are sufficient statistics. The job streams listings in keyset chunks and adds
+Σa², Σa·y, Σy² and counts per catalog model with np.bincount, so memory is
+O(catalog), however many listings there are. A category fit is the sum of its
+models' statistics.
+
+Fits with fewer than MIN_MODEL_LISTINGS (per model) or MIN_CATEGORY_LISTINGS
+(per category) listings are not used: the model keeps its category rate, and
+the category keeps its current rate.
+"""
+import datetime
+import logging
+import math
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ai_engine.catalog import Catalog
+from ai_engine.price_estimator import _mileage_penalty_pcts
+from core.jobs.keyset import keyset_chunks
+
+logger = logging.getLogger(__name__)
+
+MIN_MODEL_LISTINGS = 50
+MIN_CATEGORY_LISTINGS = 200
+RATE_BOUNDS = (0.01, 0.35)
+# Asking prices this far from the base price are typos or mismatched models
+PRICE_RATIO_BOUNDS = (0.03, 1.5)
+
+
+class RateFit(NamedTuple):
+    rate: float
+    listings: int
+    rmse: float     # residual of log(price), ~ relative price error
+
+
+class CalibrationResult(NamedTuple):
+    categories: Dict[str, Optional[RateFit]]
+    models: Dict[Tuple[str, str], Optional[RateFit]]
+    listings_used: int
+    listings_scanned: int
+
+
+def collect_statistics(catalog: Catalog, chunk_size: int = 10_000, current_year: int = None):
+    """
+    Stream priced listings and accumulate per-model sufficient statistics.
+
+    Returns (stats, scanned): stats is a (4, grid rows) array of count, Σa²,
+    Σa·y and Σy², indexed like the catalog's valuation grid (row 0, unknown
+    cars, stays empty).
+    """
+    from core.models import CarListing
+
+    current_year = current_year or datetime.date.today().year
+    grid = catalog.valuation_grid(current_year)
+    base_prices = np.asarray(grid.base_prices, dtype=np.float64)
+    n_rows = len(base_prices)
+    stats = np.zeros((4, n_rows), dtype=np.float64)
+    row_cache: Dict[Tuple[str, str], int] = {}
+    scanned = 0
+
+    listings = CarListing.objects.filter(listing_price_jod__gt=0).values_list(
+        'pk', 'make', 'model', 'year', 'mileage_km', 'listing_price_jod',
+    )
+    for chunk in keyset_chunks(listings, chunk_size):
+        scanned += len(chunk)
+        _, makes, models, years, mileages, prices = zip(*chunk)
+        rows = np.fromiter((_grid_row(catalog, grid, row_cache, make, model)
+                            for make, model in zip(makes, models)), dtype=np.int64, count=len(chunk))
+        age = np.maximum(0, current_year - np.asarray(years, dtype=np.float64))
+        price = np.asarray(prices, dtype=np.float64)
+        expected_new = base_prices[rows] * (1 - _mileage_penalty_pcts(np.asarray(mileages), catalog))
+        ratio = price / expected_new
+
+        use = (rows > 0) & (age > 0) & (ratio > PRICE_RATIO_BOUNDS[0]) & (ratio < PRICE_RATIO_BOUNDS[1])
+        rows, age, y = rows[use], age[use], np.log(ratio[use])
+        stats[0] += np.bincount(rows, minlength=n_rows)
+        stats[1] += np.bincount(rows, weights=age * age, minlength=n_rows)
+        stats[2] += np.bincount(rows, weights=age * y, minlength=n_rows)
+        stats[3] += np.bincount(rows, weights=y * y, minlength=n_rows)
+
+    return stats, scanned
+
+
+def fit_rates(
+    catalog: Catalog,
+    stats: np.ndarray,
+    scanned: int = 0,
+    min_model_listings: int = MIN_MODEL_LISTINGS,
+    min_category_listings: int = MIN_CATEGORY_LISTINGS,
+    current_year: int = None,
+) -> CalibrationResult:
+    """Least-squares rates per model and per category from collect_statistics() output."""
+    grid = catalog.valuation_grid(current_year)
+    models = {
+        key: _fit(stats[:, row], min_model_listings)
+        for key, row in grid.rows.items()
+    }
+    categories = {}
+    row_categories = np.asarray(grid.categories, dtype=object)
+    for category in catalog.depreciation_rates:
+        in_category = np.flatnonzero(row_categories == category)
+        in_category = in_category[in_category > 0]
+        categories[category] = _fit(stats[:, in_category].sum(axis=1), min_category_listings)
+
+    return CalibrationResult(categories, models, int(stats[0].sum()), scanned)
+
+
+def calibrated_catalog_data(raw: dict, result: CalibrationResult, version: str) -> dict:
+    """
+    A copy of raw catalog file data with the fitted rates applied.
+
+    Categories with a usable fit get the fitted rate. Models with a usable fit
+    get a "depreciation_rate"; other models lose any stale one and fall back
+    to their category rate.
+    """
+    data = dict(raw)
+    data["version"] = version
+    data["depreciation_rates"] = {
+        category: round(fit.rate, 4) if fit else rate
+        for category, rate in raw["depreciation_rates"].items()
+        for fit in [result.categories.get(category)]
+    }
+    cars = {}
+    for make, models in raw["cars"].items():
+        cars[make] = {}
+        for model, info in models.items():
+            info = {key: value for key, value in info.items() if key != "depreciation_rate"}
+            fit = result.models.get((make.strip().lower(), model.strip().lower()))
+            if fit:
+                info["depreciation_rate"] = round(fit.rate, 4)
+            cars[make][model] = info
+    data["cars"] = cars
+    data["calibration"] = {
+        "source_version": raw.get("version"),
+        "fitted_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "listings_scanned": result.listings_scanned,
+        "listings_used": result.listings_used,
+        "categories": {
+            category: {"rate": round(fit.rate, 4), "listings": fit.listings, "rmse": round(fit.rmse, 4)}
+            for category, fit in result.categories.items() if fit
+        },
+    }
+    return data
+
+
+def _fit(column: np.ndarray, min_listings: int) -> Optional[RateFit]:
+    count, s_aa, s_ay, s_yy = column.tolist()
+    if count < min_listings or s_aa <= 0:
+        return None
+    slope = s_ay / s_aa
+    rate = min(max(1 - math.exp(slope), RATE_BOUNDS[0]), RATE_BOUNDS[1])
+    residual = max(s_yy - slope * s_ay, 0.0)
+    return RateFit(rate=rate, listings=int(count), rmse=math.sqrt(residual / count))
+
+
+def _grid_row(catalog, grid, cache, make, model) -> int:
+    key = (make, model)
+    row = cache.get(key)
+    if row is None:
+        match = catalog.index.resolve(make, model)
+        row = cache[key] = grid.row_for(match.make, match.model) if match else 0
+    return row
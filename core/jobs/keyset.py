@@ -0,0 +1,53 @@
+"""
+Keyset iteration helpers for jobs that walk whole tables.
+
+OFFSET pagination gets slower the deeper it goes and skips or repeats rows
+when the table changes underneath it. These helpers page by primary key
+instead (`WHERE pk > last ORDER BY pk LIMIT n`), which is one index range scan
+per chunk no matter how far into the table the job is.
+"""
+from typing import Iterator, List, Tuple
+
+from django.db.models import Max, Min, QuerySet
+
+
+def pk_ranges(queryset: QuerySet, shard_size: int) -> List[Tuple[int, int]]:
+    """
+    Split the queryset's primary-key span into half-open (low, high] shards.
+
+    Shards cover the span evenly by key value, not by row count, so gaps in
+    the key sequence only make some shards smaller.
+    """
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    ranges = []
+    low = bounds['low'] - 1
+    while low < bounds['high']:
+        high = min(low + shard_size, bounds['high'])
+        ranges.append((low, high))
+        low = high
+    return ranges
+
+
+def keyset_chunks(queryset: QuerySet, chunk_size: int, low: int = None, high: int = None) -> Iterator[List]:
+    """
+    Yield the queryset's rows as lists of at most chunk_size, in primary-key order.
+
+    Works with model instances and with values_list() rows whose first
+    column is the primary key. low and high optionally restrict the walk to
+    the shard (low, high].
+    """
+    queryset = queryset.order_by('pk')
+    if high is not None:
+        queryset = queryset.filter(pk__lte=high)
+    last = low
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0] if isinstance(chunk[-1], tuple) else chunk[-1].pk
@@ -0,0 +1,148 @@
+"""
+Listing re-valuation — keeps CarListing.category, original_price_jod and
+estimated_price_jod in line with the current car catalog.
+
+The job walks the table in primary-key order (see keyset.py), values each chunk
+with the vectorized estimate_prices_batch() and writes back only the rows whose
+values changed, as one batched UPDATE per chunk in its own short transaction.
+No transaction spans more than one chunk, so the table is never held for long.
+
+For large tables the key span is split into shards that worker processes
+handle independently (revalue_listings --workers N).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from django.db import connections, transaction
+
+from ai_engine.price_estimator import estimate_prices_batch
+from core.jobs.keyset import keyset_chunks, pk_ranges
+
+VALUATION_FIELDS = ['category', 'original_price_jod', 'estimated_price_jod']
+_CENT = Decimal('0.01')
+
+
+def revalue_listings(
+    chunk_size: int = 2000,
+    workers: int = 1,
+    shard_size: int = 100_000,
+    dry_run: bool = False,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, int]:
+    """
+    Re-value every CarListing. Returns counts of scanned, updated and unchanged rows.
+
+    progress, if given, is called with the running totals after each chunk
+    (single process) or shard (worker pool).
+    """
+    from core.models import CarListing
+
+    totals = {'scanned': 0, 'updated': 0, 'unchanged': 0}
+    if workers <= 1:
+        for counts in _revalue_range(None, None, chunk_size, dry_run):
+            _add(totals, counts)
+            if progress:
+                progress(totals)
+        return totals
+
+    shards = pk_ranges(CarListing.objects.all(), shard_size)
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(revalue_shard, low, high, chunk_size, dry_run) for low, high in shards]
+        for future in as_completed(futures):
+            _add(totals, future.result())
+            if progress:
+                progress(totals)
+    return totals
+
+
+def revalue_shard(low: int, high: int, chunk_size: int, dry_run: bool = False) -> Dict[str, int]:
+    """Worker entry point: re-value the listings with low < pk <= high."""
+    totals = {'scanned': 0, 'updated': 0, 'unchanged': 0}
+    try:
+        for counts in _revalue_range(low, high, chunk_size, dry_run):
+            _add(totals, counts)
+    finally:
+        connections.close_all()
+    return totals
+
+
+def _revalue_range(low, high, chunk_size, dry_run):
+    from core.models import CarListing
+
+    listings = CarListing.objects.only('pk', 'make', 'model', 'year', 'mileage_km', *VALUATION_FIELDS)
+    for chunk in keyset_chunks(listings, chunk_size, low, high):
+        changed = _apply_estimates(chunk)
+        if changed and not dry_run:
+            _bulk_write(CarListing, changed)
+        yield {'scanned': len(chunk), 'updated': len(changed), 'unchanged': len(chunk) - len(changed)}
+
+
+def _apply_estimates(chunk):
+    """Set the new valuation on each listing and return the ones that changed."""
+    result = estimate_prices_batch(
+        [listing.make for listing in chunk],
+        [listing.model for listing in chunk],
+        [listing.year for listing in chunk],
+        [listing.mileage_km for listing in chunk],
+    )
+    changed = []
+    rows = zip(
+        chunk,
+        result['category'].tolist(),
+        result['original_price_jod'].tolist(),
+        result['depreciated_price_jod'].tolist(),
+    )
+    for listing, category, original, estimated in rows:
+        original, estimated = _to_decimal(original), _to_decimal(estimated)
+        if (listing.category, listing.original_price_jod, listing.estimated_price_jod) == (category, original, estimated):
+            continue
+        listing.category = category
+        listing.original_price_jod = original
+        listing.estimated_price_jod = estimated
+        changed.append(listing)
+    return changed
+
+
+def _bulk_write(model, rows):
+    """
+    Write VALUATION_FIELDS for rows in one transaction.
+
+    Same effect as bulk_update(), but as a single prepared UPDATE run through
+    executemany(): bulk_update() builds a CASE expression per field and row,
+    which costs far more than the write itself at this volume.
+    """
+    meta = model._meta
+    fields = [meta.get_field(name) for name in VALUATION_FIELDS]
+    connection = connections[model.objects.db]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(row, field.attname), connection) for field in fields] + [row.pk]
+        for row in rows
+    ]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _to_decimal(value: float) -> Decimal:
+    return Decimal(repr(value)).quantize(_CENT)
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _add(totals, counts):
+    for key, value in counts.items():
+        totals[key] += value
@@ -0,0 +1 @@
+# IntelliWheels management commands
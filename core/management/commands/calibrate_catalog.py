@@ -0,0 +1,87 @@
+"""
+manage.py calibrate_catalog — refit depreciation rates from listing asking prices
+and publish them as a new catalog version.
+
+    python manage.py calibrate_catalog --dry-run       # show the fit only
+    python manage.py calibrate_catalog                 # publish to the active catalog file
+    python manage.py calibrate_catalog -o staged.json  # write somewhere else for review
+
+Running workers pick up a published catalog within CAR_CATALOG_CHECK_INTERVAL
+seconds. See core/jobs/calibration.py for the model.
+"""
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.catalog import CatalogError, get_catalog, get_catalog_path, publish_catalog
+from core.jobs.calibration import (
+    MIN_CATEGORY_LISTINGS,
+    MIN_MODEL_LISTINGS,
+    calibrated_catalog_data,
+    collect_statistics,
+    fit_rates,
+)
+
+
+class Command(BaseCommand):
+    help = 'Fit depreciation rates to CarListing asking prices and publish a calibrated catalog version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Catalog file to write (default: the active catalog file)')
+        parser.add_argument('--catalog-version',
+                            help='Version string of the new catalog (default: <date>-cal)')
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Listings per read (default: 10000)')
+        parser.add_argument('--min-model-listings', type=int, default=MIN_MODEL_LISTINGS,
+                            help=f'Listings needed for a per-model rate (default: {MIN_MODEL_LISTINGS})')
+        parser.add_argument('--min-category-listings', type=int, default=MIN_CATEGORY_LISTINGS,
+                            help=f'Listings needed to refit a category rate (default: {MIN_CATEGORY_LISTINGS})')
+        parser.add_argument('--dry-run', action='store_true', help='Print the fit without writing a catalog')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        catalog = get_catalog()
+        source_path = catalog.source or get_catalog_path()
+        with open(source_path, encoding='utf-8') as f:
+            raw = json.load(f)
+
+        start = time.perf_counter()
+        stats, scanned = collect_statistics(catalog, chunk_size=options['chunk_size'])
+        result = fit_rates(
+            catalog, stats, scanned,
+            min_model_listings=options['min_model_listings'],
+            min_category_listings=options['min_category_listings'],
+        )
+        self.stderr.write(
+            f"Scanned {scanned:,} priced listings in {time.perf_counter() - start:.2f}s, "
+            f"{result.listings_used:,} usable"
+        )
+
+        for category, rate in catalog.depreciation_rates.items():
+            fit = result.categories.get(category)
+            if fit:
+                self.stdout.write(f"  {category:<10} {rate:.4f} -> {fit.rate:.4f}  "
+                                  f"({fit.listings:,} listings, rmse {fit.rmse:.3f})")
+            else:
+                self.stdout.write(f"  {category:<10} {rate:.4f}    (too few listings, kept)")
+        fitted = {key: fit for key, fit in result.models.items() if fit}
+        self.stdout.write(f"  per-model rates: {len(fitted)} of {len(result.models)} models")
+        for (make, model), fit in sorted(fitted.items(), key=lambda item: -item[1].listings)[:10]:
+            self.stdout.write(f"    {make} {model}: {fit.rate:.4f} ({fit.listings:,} listings)")
+
+        if options['dry_run']:
+            return
+
+        version = options['catalog_version'] or f"{datetime.datetime.now():%Y.%m.%d.%H%M}-cal"
+        data = calibrated_catalog_data(raw, result, version)
+        output = options['output'] or get_catalog_path()
+        try:
+            published = publish_catalog(data, output)
+        except (OSError, CatalogError) as e:
+            raise CommandError(f"Could not write the calibrated catalog: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Published catalog {published.version} (from {catalog.version}) -> {output}"
+        ))
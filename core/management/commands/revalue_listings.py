@@ -0,0 +1,55 @@
+"""
+manage.py revalue_listings — recompute category and market value for every CarListing.
+
+Meant to run nightly (and after a catalog update):
+
+    python manage.py revalue_listings --workers 4
+
+Only rows whose category, original_price_jod or estimated_price_jod changed
+are written. See core/jobs/revaluation.py.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.catalog import get_catalog
+from core.jobs.revaluation import revalue_listings
+
+
+class Command(BaseCommand):
+    help = 'Re-value all car listings against the current catalog (chunked, optionally in parallel).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per read/update batch (default: 2000)')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1, no pool)')
+        parser.add_argument('--shard-size', type=int, default=100_000,
+                            help='Primary-key span handed to each worker task (default: 100000)')
+        parser.add_argument('--dry-run', action='store_true', help='Count changes without writing them')
+
+    def handle(self, *args, **options):
+        if min(options['chunk_size'], options['workers'], options['shard_size']) <= 0:
+            raise CommandError('--chunk-size, --workers and --shard-size must be positive')
+
+        start = time.perf_counter()
+
+        def progress(totals):
+            elapsed = time.perf_counter() - start
+            self.stderr.write(
+                f"  {totals['scanned']:,} scanned, {totals['updated']:,} updated "
+                f"({totals['scanned'] / elapsed:,.0f} rows/s)"
+            )
+
+        totals = revalue_listings(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            shard_size=options['shard_size'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+
+        elapsed = time.perf_counter() - start
+        verb = 'would update' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-valued {totals['scanned']:,} listings against catalog {get_catalog().version} "
+            f"in {elapsed:.2f}s: {verb} {totals['updated']:,}, {totals['unchanged']:,} unchanged"
+        ))
@@ -0,0 +1,39 @@
+"""
+manage.py scan_price_anomalies — flag listings priced far from market.
+
+Incremental by default (only listings created or changed since the last run);
+run it every few minutes from cron. See core/jobs/anomalies.py.
+
+    python manage.py scan_price_anomalies
+    python manage.py scan_price_anomalies --full --threshold 2.5
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jobs.anomalies import ANOMALY_SCORE_THRESHOLD, scan_listing_prices
+
+
+class Command(BaseCommand):
+    help = 'Score listing prices against the estimator and flag anomalies (incremental).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescan every listing, not just changed ones')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Listings per batch (default: 5000)')
+        parser.add_argument('--threshold', type=float, default=ANOMALY_SCORE_THRESHOLD,
+                            help=f'Flag at |score| >= this many standard deviations (default: {ANOMALY_SCORE_THRESHOLD})')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0 or options['threshold'] <= 0:
+            raise CommandError('--chunk-size and --threshold must be positive')
+
+        start = time.perf_counter()
+        result = scan_listing_prices(
+            full=options['full'],
+            chunk_size=options['chunk_size'],
+            threshold=options['threshold'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Full' if result['full'] else 'Incremental'} scan of {result['scanned']:,} listings "
+            f"in {time.perf_counter() - start:.2f}s: {result['flagged']:,} flagged, {result['cleared']:,} cleared"
+        ))
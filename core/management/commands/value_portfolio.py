@@ -0,0 +1,273 @@
+"""
+manage.py value_portfolio — re-value a fleet export (CSV / JSONL) offline.
+
+Reads the input lazily in chunks. Each chunk is parsed, valued with the
+vectorized estimate_prices_batch() and serialized in one step, optionally
+spread over a process pool, and the results are streamed to CSV, JSONL or
+Parquet in input order. Memory stays constant in the input size: only
+`workers * 2` chunks are ever in flight.
+
+Input rows need make, model and year columns (mileage_km is optional).
+Every input column is passed through to the output, followed by category,
+original_price_jod, depreciated_price_jod and depreciation_pct.
+
+    python manage.py value_portfolio fleet.csv --output valued.parquet --workers 4
+"""
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_engine.price_estimator import estimate_prices_batch
+
+ESTIMATE_FIELDS = ['category', 'original_price_jod', 'depreciated_price_jod', 'depreciation_pct']
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class Command(BaseCommand):
+    help = 'Value a CSV/JSONL fleet export with the price estimator and stream results to CSV/JSONL/Parquet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Input file (.csv or .jsonl), or '-' for stdin")
+        parser.add_argument('--output', '-o', required=True, help="Output file (.csv, .jsonl or .parquet), or '-' for stdout")
+        parser.add_argument('--input-format', choices=FORMATS[:2], help='Override format detection from the extension')
+        parser.add_argument('--output-format', choices=FORMATS, help='Override format detection from the extension')
+        parser.add_argument('--chunk-size', type=int, default=50_000, help='Rows per vectorized chunk (default: 50000)')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1, no pool)')
+
+    def handle(self, *args, **options):
+        input_format = options['input_format'] or _detect_format(options['input'], FORMATS[:2], default='csv')
+        output_format = options['output_format'] or _detect_format(options['output'], FORMATS, default='jsonl')
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size <= 0 or workers <= 0:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        reader = _open_input(options['input'])
+        rows = _read_csv(reader) if input_format == 'csv' else _read_jsonl(reader, self.stderr.write)
+        chunks = _chunked(rows, chunk_size)
+        first = next(chunks, [])
+        # Output columns are fixed by the first row so every chunk lines up
+        fieldnames = list(next((row for row in first if row), {}))
+        fieldnames += [field for field in ESTIMATE_FIELDS if field not in fieldnames]
+        writer = _make_writer(output_format, options['output'], fieldnames)
+
+        start = time.perf_counter()
+        valued = skipped = 0
+        try:
+            jobs = ((chunk, output_format, fieldnames) for chunk in chain([first], chunks) if chunk)
+            for payload, n_valued, n_skipped in _run_chunks(jobs, workers):
+                writer.write(payload)
+                valued += n_valued
+                skipped += n_skipped
+                elapsed = time.perf_counter() - start
+                self.stderr.write(
+                    f"  {valued:,} rows valued, {skipped:,} skipped "
+                    f"({valued / elapsed:,.0f} rows/s)"
+                )
+        finally:
+            writer.close()
+            if reader is not sys.stdin:
+                reader.close()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Valued {valued:,} cars in {elapsed:.2f}s "
+            f"({valued / elapsed if elapsed else 0:,.0f} rows/s, {workers} worker(s)); "
+            f"skipped {skipped:,} invalid rows -> {options['output']}"
+        ))
+
+
+# ---------------------------------------------------------------
+# Valuation
+# ---------------------------------------------------------------
+
+def _parse_chunk(chunk):
+    """Split rows into the estimator's columnar inputs; invalid rows are marked None."""
+    makes, models, years, mileages, valid = [], [], [], [], []
+    for row in chunk:
+        try:
+            make, model = str(row['make']).strip(), str(row['model']).strip()
+            year = int(float(row['year']))
+            mileage = int(float(row.get('mileage_km') or 0))
+        except (KeyError, TypeError, ValueError):
+            valid.append(False)
+            continue
+        if not make or not model or mileage < 0:
+            valid.append(False)
+            continue
+        makes.append(make)
+        models.append(model)
+        years.append(year)
+        mileages.append(mileage)
+        valid.append(True)
+    return (makes, models, years, mileages), valid
+
+
+def _process_chunk(chunk, output_format, fieldnames):
+    """
+    Worker entry point: parse, value and serialize one chunk.
+
+    Returns (payload, valued, skipped). The payload is ready-to-write text for
+    CSV/JSONL and a column dict for Parquet, so the parent process only reads
+    input and writes output.
+    """
+    columns, valid = _parse_chunk(chunk)
+    if columns[0]:
+        result = estimate_prices_batch(*columns)
+        estimates = zip(*(result[field].tolist() for field in ESTIMATE_FIELDS))
+    else:
+        estimates = iter(())
+
+    rows = []
+    for row, ok in zip(chunk, valid):
+        if ok:
+            row = dict(row)
+            row.update(zip(ESTIMATE_FIELDS, next(estimates)))
+            rows.append(row)
+    return _serialize(rows, output_format, fieldnames), len(rows), len(chunk) - len(rows)
+
+
+def _run_chunks(jobs, workers):
+    """Yield _process_chunk() results in input order, keeping at most workers * 2 chunks in flight."""
+    if workers == 1:
+        for job in jobs:
+            yield _process_chunk(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for job in jobs:
+            in_flight.append(pool.submit(_process_chunk, *job))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------------------------------------------------------------
+# Input / output
+# ---------------------------------------------------------------
+
+def _detect_format(path, formats, default):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext == 'ndjson':
+        ext = 'jsonl'
+    if ext in formats:
+        return ext
+    if path == '-':
+        return default
+    raise CommandError(f"Can't tell the format of '{path}', use one of: {', '.join(formats)}")
+
+
+def _open_input(path):
+    if path == '-':
+        return sys.stdin
+    try:
+        return open(path, newline='', encoding='utf-8')
+    except OSError as e:
+        raise CommandError(f"Can't read '{path}': {e}")
+
+
+def _read_csv(f):
+    return csv.DictReader(f)
+
+
+def _read_jsonl(f, warn):
+    """Rows of a JSONL file; a line that is not a JSON object becomes an empty (invalid) row."""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            warn(f"  line {number}: invalid JSON ({e.msg}), skipped")
+            yield {}
+            continue
+        if not isinstance(row, dict):
+            warn(f"  line {number}: expected a JSON object, got {type(row).__name__}, skipped")
+            yield {}
+            continue
+        yield row
+
+
+def _serialize(rows, output_format, fieldnames):
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore').writerows(rows)
+        return buffer.getvalue()
+    if output_format == 'jsonl':
+        return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+    return {name: [row.get(name) for row in rows] for name in fieldnames}
+
+
+def _make_writer(output_format, path, fieldnames):
+    if output_format == 'parquet':
+        if path == '-':
+            raise CommandError('Parquet output needs a file path')
+        return _ParquetWriter(path)
+    f = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+    if output_format == 'csv':
+        csv.writer(f).writerow(fieldnames)
+    return _TextWriter(f)
+
+
+class _TextWriter:
+    """Appends pre-serialized CSV/JSONL chunks."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, text):
+        self.f.write(text)
+
+    def close(self):
+        if self.f is not sys.stdout:
+            self.f.close()
+
+
+class _ParquetWriter:
+    """Writes one Parquet row group per chunk (needs pyarrow)."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise CommandError('Parquet output needs pyarrow: pip install pyarrow')
+        self.path = path
+        self.writer = None
+
+    def write(self, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not columns or not next(iter(columns.values())):
+            return
+        if self.writer is None:
+            table = pa.Table.from_pydict(columns)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pydict(columns, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
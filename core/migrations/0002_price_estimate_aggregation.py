@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:19
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+import django.utils.timezone
+
+
+def merge_duplicate_estimates(apps, schema_editor):
+    """Fold existing one-row-per-request estimates into one row per distinct input."""
+    PriceEstimate = apps.get_model('core', 'PriceEstimate')
+    PriceEstimate.objects.update(last_seen=F('created_at'))
+
+    duplicates = (
+        PriceEstimate.objects
+        .values('make', 'model', 'year', 'mileage_km', 'catalog_version')
+        .annotate(rows=Count('id'), keep_id=Min('id'), hits=Sum('hit_count'), seen=Max('created_at'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates.iterator():
+        same_inputs = PriceEstimate.objects.filter(
+            make=group['make'], model=group['model'], year=group['year'],
+            mileage_km=group['mileage_km'], catalog_version=group['catalog_version'],
+        )
+        same_inputs.exclude(id=group['keep_id']).delete()
+        same_inputs.filter(id=group['keep_id']).update(hit_count=group['hits'], last_seen=group['seen'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='priceestimate',
+            name='catalog_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='priceestimate',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='priceestimate',
+            name='last_seen',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(merge_duplicate_estimates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='priceestimate',
+            constraint=models.UniqueConstraint(fields=('make', 'model', 'year', 'mileage_km', 'catalog_version'), name='unique_price_estimate_inputs'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_price_estimate_aggregation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carlisting',
+            name='estimated_price_jod',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_carlisting_estimated_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('state', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Job Checkpoint',
+                'verbose_name_plural': 'Job Checkpoints',
+            },
+        ),
+        migrations.AddField(
+            model_name='carlisting',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ListingPriceFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing_price_jod', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expected_price_jod', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('deviation_pct', models.FloatField(help_text='Asking price vs expected, in percent')),
+                ('score', models.FloatField(db_index=True, help_text='Deviation in standard deviations of the market spread')),
+                ('direction', models.CharField(choices=[('under', 'Under market'), ('over', 'Over market')], max_length=10)),
+                ('catalog_version', models.CharField(blank=True, max_length=50)),
+                ('reviewed', models.BooleanField(default=False)),
+                ('flagged_at', models.DateTimeField(auto_now=True)),
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='price_flag', to='core.carlisting')),
+            ],
+            options={
+                'verbose_name': 'Listing Price Flag',
+                'verbose_name_plural': 'Listing Price Flags',
+                'ordering': ['-score'],
+            },
+        ),
+    ]
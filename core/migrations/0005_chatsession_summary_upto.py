@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_listing_price_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_upto',
+            field=models.BigIntegerField(blank=True, help_text='Last ChatMessage id folded into the summary', null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 # IntelliWheels Core Models
 from core.models.car import CarListing
 from core.models.chat import ChatSession, ChatMessage
+from core.models.job_checkpoint import JobCheckpoint
+from core.models.listing_flag import ListingPriceFlag
 from core.models.price_estimate import PriceEstimate
 from core.models.vision_analysis import VisionAnalysis
 
@@ -8,6 +10,8 @@ __all__ = [
     'CarListing',
     'ChatSession',
     'ChatMessage',
+    'JobCheckpoint',
+    'ListingPriceFlag',
     'PriceEstimate',
     'VisionAnalysis',
 ]
@@ -32,9 +32,12 @@ class CarListing(models.Model):
     color = models.CharField(max_length=30, blank=True)
     original_price_jod = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     listing_price_jod = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Market value from the price estimator, kept current by `manage.py revalue_listings`
+    estimated_price_jod = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     description = models.TextField(blank=True)
     is_sold = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
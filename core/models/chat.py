@@ -7,6 +7,9 @@ class ChatSession(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
     summary = models.TextField(blank=True)
+    summary_upto = models.BigIntegerField(
+        null=True, blank=True, help_text='Last ChatMessage id folded into the summary',
+    )
 
     class Meta:
         ordering = ['-started_at']
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class JobCheckpoint(models.Model):
+    """Progress marker of an incremental batch job (e.g. the last scan time)."""
+
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    state = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Job Checkpoint'
+        verbose_name_plural = 'Job Checkpoints'
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class ListingPriceFlag(models.Model):
+    """A listing whose asking price is far from the estimator's market value."""
+
+    DIRECTION_CHOICES = [
+        ('under', 'Under market'),
+        ('over', 'Over market'),
+    ]
+
+    listing = models.OneToOneField('core.CarListing', on_delete=models.CASCADE, related_name='price_flag')
+    listing_price_jod = models.DecimalField(max_digits=10, decimal_places=2)
+    expected_price_jod = models.DecimalField(max_digits=10, decimal_places=2)
+    deviation_pct = models.FloatField(help_text='Asking price vs expected, in percent')
+    score = models.FloatField(db_index=True, help_text='Deviation in standard deviations of the market spread')
+    direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
+    catalog_version = models.CharField(max_length=50, blank=True)
+    reviewed = models.BooleanField(default=False)
+    flagged_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'Listing Price Flag'
+        verbose_name_plural = 'Listing Price Flags'
+
+    def __str__(self):
+        return f"{self.listing} priced {self.deviation_pct:+.0f}% vs market"
@@ -1,8 +1,48 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class PriceEstimateQuerySet(models.QuerySet):
+
+    def record(self, estimates):
+        """
+        Store estimates as hits on their aggregated row.
+
+        Estimates with the same inputs (make, model, year, mileage, catalog
+        version) share one row: an existing row gets its hit_count bumped and
+        last_seen refreshed, a new one is inserted with the breakdown.
+        Duplicates within one call are merged first.
+        """
+        pending = {}
+        for estimate in estimates:
+            key = estimate.input_key()
+            if key in pending:
+                pending[key].hit_count += estimate.hit_count
+                pending[key].last_seen = max(pending[key].last_seen, estimate.last_seen)
+            else:
+                pending[key] = estimate
+
+        with transaction.atomic(using=self.db):
+            for key, estimate in pending.items():
+                if self._bump(key, estimate):
+                    continue
+                try:
+                    with transaction.atomic(using=self.db):
+                        estimate.save(using=self.db, force_insert=True)
+                except IntegrityError:
+                    # Another worker inserted the same row first
+                    self._bump(key, estimate)
+
+    def _bump(self, key, estimate):
+        return self.filter(**dict(zip(PriceEstimate.INPUT_FIELDS, key))).update(
+            hit_count=F('hit_count') + estimate.hit_count,
+            last_seen=estimate.last_seen,
+        )
 
 
 class PriceEstimate(models.Model):
-    """A price estimation result for a car."""
+    """A price estimation result for a car, aggregated over identical requests."""
 
     CATEGORY_CHOICES = [
         ('luxury', 'Luxury'),
@@ -10,19 +50,36 @@ class PriceEstimate(models.Model):
         ('economic', 'Economic'),
     ]
 
+    # Requests with the same values here share one row
+    INPUT_FIELDS = ('make', 'model', 'year', 'mileage_km', 'catalog_version')
+
     make = models.CharField(max_length=50)
     model = models.CharField(max_length=100)
     year = models.PositiveIntegerField()
     mileage_km = models.PositiveIntegerField(default=0)
+    catalog_version = models.CharField(max_length=40, blank=True, default='')
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     original_price_jod = models.DecimalField(max_digits=10, decimal_places=2)
     depreciated_price_jod = models.DecimalField(max_digits=10, decimal_places=2)
     depreciation_pct = models.DecimalField(max_digits=5, decimal_places=2)
     breakdown = models.JSONField(default=dict, blank=True)
+    hit_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = PriceEstimateQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['make', 'model', 'year', 'mileage_km', 'catalog_version'],
+                name='unique_price_estimate_inputs',
+            ),
+        ]
 
     def __str__(self):
         return f"Estimate: {self.year} {self.make} {self.model} → {self.depreciated_price_jod} JOD"
+
+    def input_key(self):
+        return tuple(getattr(self, field) for field in self.INPUT_FIELDS)
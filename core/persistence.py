@@ -0,0 +1,206 @@
+"""
+Persistence helpers for high-volume API writes.
+
+WriteBehindBuffer takes rows off the request path: views submit unsaved model
+instances, and a background thread writes them in one batch once
+batch_size rows are pending or flush_interval seconds have passed. The queue
+is bounded. When it is full, new rows are dropped and counted instead of
+blocking the request. Pending rows are flushed at interpreter shutdown; rows
+submitted after stop() are written synchronously.
+
+Write-behind is optional and enabled per model through settings, e.g.
+PRICE_ESTIMATE_WRITE_BEHIND=True.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Bounded in-process queue flushed to the database in batches by a daemon thread."""
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[List], None],
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._counters = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0, "flushes": 0}
+        self._counters_lock = threading.Lock()
+        self._last_flush_ms = 0.0
+
+    def submit(self, item) -> bool:
+        """Queue an item for writing. Returns False if the queue was full and it was dropped."""
+        if self._stop.is_set():
+            # No writer thread will pick it up any more
+            self._flush([item])
+            return True
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"Write-behind queue '{self.name}' full ({self.max_queue}), dropping row")
+            return False
+        self._count("enqueued")
+        if self._stop.is_set() and not self._thread.is_alive():
+            # stop() finished its final drain while this row went in
+            self._flush_pending()
+        elif self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def stats(self) -> Dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            "enabled": True,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval_s": self.flush_interval,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            **counters,
+        }
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # -- writer thread ----------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.name}", daemon=True,
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._flush_pending()
+            # Shutdown: drain whatever is left
+            self._flush_pending()
+        finally:
+            connection.close()
+
+    def _flush_pending(self) -> None:
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _drain(self, limit: int) -> List:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List) -> None:
+        start = time.perf_counter()
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            self._count("failed", len(batch))
+            logger.error(f"Write-behind flush for '{self.name}' failed, lost {len(batch)} rows: {e}")
+        else:
+            self._count("flushed", len(batch))
+        finally:
+            self._count("flushes")
+            self._last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        with self._counters_lock:
+            self._counters[counter] += n
+
+
+# ---------------------------------------------------------------
+# PriceEstimate persistence
+# ---------------------------------------------------------------
+_price_estimate_buffer: Optional[WriteBehindBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_price_estimate_buffer() -> Optional[WriteBehindBuffer]:
+    """The PriceEstimate write-behind buffer, or None when write-behind is disabled."""
+    global _price_estimate_buffer
+    if not getattr(settings, 'PRICE_ESTIMATE_WRITE_BEHIND', False):
+        return None
+    if _price_estimate_buffer is None:
+        with _buffer_lock:
+            if _price_estimate_buffer is None:
+                from core.models.price_estimate import PriceEstimate
+
+                _price_estimate_buffer = WriteBehindBuffer(
+                    name="price_estimates",
+                    flush_fn=PriceEstimate.objects.record,
+                    max_queue=settings.PRICE_ESTIMATE_WRITE_BEHIND_MAX_QUEUE,
+                    batch_size=settings.PRICE_ESTIMATE_WRITE_BEHIND_BATCH_SIZE,
+                    flush_interval=settings.PRICE_ESTIMATE_WRITE_BEHIND_FLUSH_INTERVAL,
+                )
+    return _price_estimate_buffer
+
+
+def record_price_estimate(result: Dict) -> None:
+    """
+    Record an estimate_price() result, synchronously or via the write-behind buffer.
+
+    Identical requests are aggregated into one row (see PriceEstimate.objects.record).
+    The row carries the version of the catalog that produced the estimate, not
+    whichever one is current when it is written.
+    """
+    from core.models.price_estimate import PriceEstimate
+
+    estimate = PriceEstimate(
+        make=result["make"],
+        model=result["model"],
+        year=result["year"],
+        mileage_km=result["mileage_km"],
+        catalog_version=result["catalog_version"],
+        category=result["category"],
+        original_price_jod=result["original_price_jod"],
+        depreciated_price_jod=result["depreciated_price_jod"],
+        depreciation_pct=result["depreciation_pct"],
+        breakdown=result["breakdown"],
+    )
+
+    buffer = get_price_estimate_buffer()
+    if buffer is None:
+        PriceEstimate.objects.record([estimate])
+    else:
+        buffer.submit(estimate)
@@ -1,12 +1,23 @@
 # IntelliWheels Serializers
+from core.serializers.car_serializers import CarListingSerializer, CompsQuerySerializer, ListingPriceFlagSerializer
 from core.serializers.chat_serializers import ChatInputSerializer, ChatMessageSerializer
-from core.serializers.price_serializers import PriceEstimateInputSerializer, PriceEstimateSerializer
+from core.serializers.price_serializers import (
+    PriceEstimateInputSerializer,
+    PriceEstimateBatchInputSerializer,
+    PriceScheduleInputSerializer,
+    PriceEstimateSerializer,
+)
 from core.serializers.vision_serializers import VisionAnalysisSerializer
 
 __all__ = [
+    'CarListingSerializer',
+    'CompsQuerySerializer',
+    'ListingPriceFlagSerializer',
     'ChatInputSerializer',
     'ChatMessageSerializer',
     'PriceEstimateInputSerializer',
+    'PriceEstimateBatchInputSerializer',
+    'PriceScheduleInputSerializer',
     'PriceEstimateSerializer',
     'VisionAnalysisSerializer',
 ]
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+from core.serializers.fields import ModelYearField
+from core.models.car import CarListing
+from core.models.listing_flag import ListingPriceFlag
+
+
+class CarListingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CarListing
+        fields = [
+            'id', 'make', 'model', 'year', 'mileage_km', 'fuel_type', 'transmission',
+            'category', 'color', 'listing_price_jod', 'estimated_price_jod', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class CompsQuerySerializer(serializers.Serializer):
+    """Query parameters for the comparable-listings endpoint."""
+    make = serializers.CharField(max_length=50)
+    model = serializers.CharField(max_length=100)
+    year = ModelYearField()
+    mileage_km = serializers.IntegerField(min_value=0, default=0)
+    price_jod = serializers.FloatField(min_value=1, required=False, help_text='Asking price to match, if any')
+    k = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    exclude_id = serializers.IntegerField(required=False, help_text='Listing to leave out (e.g. the one being viewed)')
+
+
+class ListingPriceFlagSerializer(serializers.ModelSerializer):
+    listing = CarListingSerializer(read_only=True)
+
+    class Meta:
+        model = ListingPriceFlag
+        fields = [
+            'id', 'listing', 'listing_price_jod', 'expected_price_jod', 'deviation_pct',
+            'score', 'direction', 'catalog_version', 'reviewed', 'flagged_at',
+        ]
+        read_only_fields = fields
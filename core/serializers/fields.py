@@ -0,0 +1,29 @@
+import datetime
+
+from rest_framework import serializers
+
+MIN_MODEL_YEAR = 1980
+
+
+def max_model_year() -> int:
+    """Latest accepted model year: next year's models go on sale during the current one."""
+    return datetime.date.today().year + 1
+
+
+class ModelYearField(serializers.IntegerField):
+    """Car model year, from MIN_MODEL_YEAR up to max_model_year() (checked against today's date)."""
+
+    default_error_messages = {
+        'max_model_year': 'Ensure this value is less than or equal to {max_value}.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('min_value', MIN_MODEL_YEAR)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        latest = max_model_year()
+        if value > latest:
+            self.fail('max_model_year', max_value=latest)
+        return value
@@ -1,21 +1,76 @@
 from rest_framework import serializers
+from core.serializers.fields import ModelYearField
 from core.models.price_estimate import PriceEstimate
+from ai_engine.price_range import DEFAULT_DRAWS
+
+# Fewer draws per car in batch mode keeps a full batch to a few seconds
+BATCH_RANGE_DRAWS = 500
+# Cap on rows x range_draws per batch request (~25M samples: a few seconds of CPU)
+MAX_BATCH_RANGE_SAMPLES = 25_000_000
 
 
 class PriceEstimateInputSerializer(serializers.Serializer):
     """Input for the price estimator endpoint."""
     make = serializers.CharField(max_length=50)
     model = serializers.CharField(max_length=100)
-    year = serializers.IntegerField(min_value=1980, max_value=2026)
+    year = ModelYearField()
     mileage_km = serializers.IntegerField(min_value=0, default=0)
+    include_range = serializers.BooleanField(default=False, help_text='Add a Monte Carlo P10/P50/P90 price range')
+    seed = serializers.IntegerField(min_value=0, required=False, help_text='Seed for a reproducible price range')
+
+
+class PriceEstimateBatchInputSerializer(serializers.Serializer):
+    """Columnar input for the batch price estimator endpoint (one list per field)."""
+    MAX_ROWS = 50_000
+
+    make = serializers.ListField(child=serializers.CharField(max_length=50), min_length=1, max_length=MAX_ROWS)
+    model = serializers.ListField(child=serializers.CharField(max_length=100), min_length=1, max_length=MAX_ROWS)
+    year = serializers.ListField(
+        child=ModelYearField(), min_length=1, max_length=MAX_ROWS,
+    )
+    mileage_km = serializers.ListField(
+        child=serializers.IntegerField(min_value=0), required=False, max_length=MAX_ROWS,
+    )
+    include_range = serializers.BooleanField(default=False, help_text='Add Monte Carlo P10/P50/P90 columns')
+    range_draws = serializers.IntegerField(min_value=100, max_value=DEFAULT_DRAWS, default=BATCH_RANGE_DRAWS)
+    seed = serializers.IntegerField(min_value=0, required=False, help_text='Seed for reproducible price ranges')
+
+    def validate(self, attrs):
+        n = len(attrs["make"])
+        for field in ("model", "year", "mileage_km"):
+            if field in attrs and len(attrs[field]) != n:
+                raise serializers.ValidationError(
+                    {field: f"Expected {n} items to match 'make', got {len(attrs[field])}."}
+                )
+        if attrs["include_range"] and n * attrs["range_draws"] > MAX_BATCH_RANGE_SAMPLES:
+            raise serializers.ValidationError({
+                "range_draws": f"{n} rows x {attrs['range_draws']} draws exceeds the limit of "
+                               f"{MAX_BATCH_RANGE_SAMPLES:,} samples per request; use at most "
+                               f"{MAX_BATCH_RANGE_SAMPLES // n} draws or fewer rows."
+            })
+        return attrs
+
+
+class PriceScheduleInputSerializer(serializers.Serializer):
+    """Input for the depreciation schedule endpoint."""
+    MAX_MILEAGES = 20
+
+    make = serializers.CharField(max_length=50)
+    model = serializers.CharField(max_length=100)
+    year = ModelYearField()
+    mileage_km = serializers.ListField(
+        child=serializers.IntegerField(min_value=0), required=False, min_length=1, max_length=MAX_MILEAGES,
+        help_text='Mileage columns of the schedule (default: 0 to 250,000 km in 50,000 km steps)',
+    )
+    years_ahead = serializers.IntegerField(min_value=0, max_value=15, default=5)
 
 
 class PriceEstimateSerializer(serializers.ModelSerializer):
     class Meta:
         model = PriceEstimate
         fields = [
-            'id', 'make', 'model', 'year', 'mileage_km',
+            'id', 'make', 'model', 'year', 'mileage_km', 'catalog_version',
             'category', 'original_price_jod', 'depreciated_price_jod',
-            'depreciation_pct', 'breakdown', 'created_at',
+            'depreciation_pct', 'breakdown', 'hit_count', 'created_at', 'last_seen',
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'hit_count', 'created_at', 'last_seen']
@@ -0,0 +1,280 @@
+"""
+Chat session cache — per-worker LRU of each session's summary and recent messages.
+
+A chat turn needs the session's summary and its recent messages
+(core/chat_history.py). Without a cache that is a session lookup plus a window
+query per turn. This cache keeps them in memory, bounded by
+CHAT_SESSION_CACHE_SIZE sessions, and updates them as messages are written.
+A turn on a cached session only writes: the user message and the reply go in
+together, as one INSERT, once the reply is ready. A new session has no
+history, so its row can be created on a background thread while the model
+answers (create_session_later()).
+
+Every session has a generation number in Django's cache. It is bumped by each
+write to the session: new messages, a new summary, deletion. A cached entry is
+only used while its generation matches, so a session another worker has
+written to is reloaded from the database. Generations start at a random value,
+so an evicted and re-created counter cannot match an old entry by accident.
+
+Generations are only shared between workers if the cache backend is (see
+REDIS_URL). With the default per-process LocMemCache they cover this process
+only.
+"""
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from core.chat_history import window_queryset, window_size
+
+logger = logging.getLogger(__name__)
+
+# Generation counters outlive any plausible idle gap between two turns
+GENERATION_TTL = 24 * 3600
+
+
+class SessionState:
+    """Summary and recent messages (newest first) of one chat session, as of `generation`."""
+
+    __slots__ = ('pk', 'summary', 'summary_upto', 'rows', 'generation')
+
+    def __init__(self, pk: int, summary: str, summary_upto: Optional[int], rows: List[Dict], generation: int):
+        self.pk = pk
+        self.summary = summary
+        self.summary_upto = summary_upto
+        self.rows = rows
+        self.generation = generation
+
+
+class SessionCache:
+    """Bounded LRU of SessionState, keyed by session id."""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._states: 'OrderedDict[int, SessionState]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stale': 0, 'evicted': 0}
+
+    def lookup(self, session_id: int, generation: Optional[int]) -> Optional[SessionState]:
+        """The cached state if it is still at `generation`, else None."""
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                self._counters['misses'] += 1
+                return None
+            if generation is None or state.generation != generation:
+                del self._states[session_id]
+                self._counters['stale'] += 1
+                return None
+            self._states.move_to_end(session_id)
+            self._counters['hits'] += 1
+            return state
+
+    def store(self, state: SessionState) -> None:
+        with self._lock:
+            self._states[state.pk] = state
+            self._states.move_to_end(state.pk)
+            while len(self._states) > self.max_sessions:
+                self._states.popitem(last=False)
+                self._counters['evicted'] += 1
+
+    def append(self, state: SessionState, rows: List[Dict], generation: Optional[int]) -> None:
+        """Add messages this process wrote, which moved the session to `generation`."""
+        with self._lock:
+            if self._states.get(state.pk) is not state:
+                return
+            if generation is None or generation != state.generation + 1:
+                # Someone else wrote in between: reload on next use
+                del self._states[state.pk]
+                return
+            state.rows = (rows + state.rows)[:window_size()]
+            state.generation = generation
+
+    def discard(self, session_id: int) -> None:
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, 'sessions': len(self._states), 'max_sessions': self.max_sessions}
+
+
+_session_cache: Optional[SessionCache] = None
+_cache_lock = threading.Lock()
+_db_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='chat-db')
+
+
+def get_session_cache() -> SessionCache:
+    global _session_cache
+    if _session_cache is None:
+        with _cache_lock:
+            if _session_cache is None:
+                _session_cache = SessionCache(settings.CHAT_SESSION_CACHE_SIZE)
+    return _session_cache
+
+
+# ---------------------------------------------------------------
+# Turns
+# ---------------------------------------------------------------
+
+def open_session(session_id: int = None, create: bool = True) -> Optional[SessionState]:
+    """
+    State of the session to continue, loaded on a cache miss.
+
+    A session that does not exist is created, or None is returned if create
+    is False (see create_session_later()).
+    """
+    from core.models.chat import ChatSession
+
+    session_cache = get_session_cache()
+    if session_id:
+        # Read the generation before the database, so a concurrent write makes the entry stale
+        generation = cache.get(_generation_key(session_id))
+        state = session_cache.lookup(session_id, generation)
+        if state is not None:
+            return state
+        if generation is None:
+            generation = _init_generation(session_id)
+        session = ChatSession.objects.filter(pk=session_id).values('summary', 'summary_upto').first()
+        if session is not None:
+            rows = list(window_queryset(session_id, session['summary_upto']))
+            state = SessionState(session_id, session['summary'], session['summary_upto'], rows, generation)
+            session_cache.store(state)
+            return state
+
+    return create_session() if create else None
+
+
+def create_session() -> SessionState:
+    """Start a new, empty chat session."""
+    from core.models.chat import ChatSession
+
+    session = ChatSession.objects.create()
+    state = SessionState(session.pk, '', None, [], _init_generation(session.pk))
+    get_session_cache().store(state)
+    return state
+
+
+def create_session_later() -> Future:
+    """
+    create_session() on a background thread. A new session has no history,
+    so the first reply does not need to wait for its row.
+    """
+    return _db_executor.submit(_create_session_in_thread)
+
+
+def _create_session_in_thread() -> SessionState:
+    close_old_connections()
+    try:
+        return create_session()
+    finally:
+        close_old_connections()
+
+
+async def aopen_session(session_id: int = None, create: bool = True) -> Optional[SessionState]:
+    """Async ORM version of open_session()."""
+    from core.models.chat import ChatSession
+
+    session_cache = get_session_cache()
+    if session_id:
+        generation = await cache.aget(_generation_key(session_id))
+        state = session_cache.lookup(session_id, generation)
+        if state is not None:
+            return state
+        if generation is None:
+            generation = await _ainit_generation(session_id)
+        session = await ChatSession.objects.filter(pk=session_id).values('summary', 'summary_upto').afirst()
+        if session is not None:
+            rows = [row async for row in window_queryset(session_id, session['summary_upto'])]
+            state = SessionState(session_id, session['summary'], session['summary_upto'], rows, generation)
+            session_cache.store(state)
+            return state
+
+    return await acreate_session() if create else None
+
+
+async def acreate_session() -> SessionState:
+    """Async ORM version of create_session()."""
+    from core.models.chat import ChatSession
+
+    session = await ChatSession.objects.acreate()
+    state = SessionState(session.pk, '', None, [], await _ainit_generation(session.pk))
+    get_session_cache().store(state)
+    return state
+
+
+def record_turn(state: SessionState, user_text: str, ai_text: str):
+    """Insert the user message and the reply in one statement; returns both messages."""
+    from core.models.chat import ChatMessage
+
+    user_message, reply = ChatMessage.objects.bulk_create(_turn_messages(state, user_text, ai_text))
+    get_session_cache().append(state, _rows(reply, user_message), bump_generation(state.pk))
+    return user_message, reply
+
+
+async def arecord_turn(state: SessionState, user_text: str, ai_text: str):
+    """Async ORM version of record_turn()."""
+    from core.models.chat import ChatMessage
+
+    user_message, reply = await ChatMessage.objects.abulk_create(_turn_messages(state, user_text, ai_text))
+    get_session_cache().append(state, _rows(reply, user_message), await _abump_generation(state.pk))
+    return user_message, reply
+
+
+def bump_generation(session_id: int) -> Optional[int]:
+    """Mark the session as changed for every worker. Returns the new generation, or None."""
+    key = _generation_key(session_id)
+    cache.add(key, _initial_generation(), GENERATION_TTL)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr(): entries reload on next use anyway
+        return None
+
+
+async def _abump_generation(session_id: int) -> Optional[int]:
+    key = _generation_key(session_id)
+    await cache.aadd(key, _initial_generation(), GENERATION_TTL)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        return None
+
+
+def _init_generation(session_id: int) -> int:
+    key = _generation_key(session_id)
+    cache.add(key, _initial_generation(), GENERATION_TTL)
+    return cache.get(key, 0)
+
+
+async def _ainit_generation(session_id: int) -> int:
+    key = _generation_key(session_id)
+    await cache.aadd(key, _initial_generation(), GENERATION_TTL)
+    return await cache.aget(key, 0)
+
+
+def _initial_generation() -> int:
+    return secrets.randbits(48)
+
+
+def _generation_key(session_id: int) -> str:
+    return f'chat-session-generation:{session_id}'
+
+
+def _turn_messages(state: SessionState, user_text: str, ai_text: str):
+    from core.models.chat import ChatMessage
+
+    return [
+        ChatMessage(session_id=state.pk, role='user', content=user_text),
+        ChatMessage(session_id=state.pk, role='assistant', content=ai_text),
+    ]
+
+
+def _rows(*messages) -> List[Dict]:
+    return [{'id': message.id, 'role': message.role, 'content': message.content} for message in messages]
@@ -0,0 +1,31 @@
+"""
+Model signal handlers for IntelliWheels core.
+
+Registered in CoreConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.comps import remove_listing, upsert_listing
+from core.models import CarListing, ChatSession
+from core.session_cache import bump_generation
+
+
+@receiver(post_save, sender=CarListing)
+def update_comps_index(sender, instance, **kwargs):
+    """Keep this process's comps index in step with saved listings (once the save commits)."""
+    transaction.on_commit(lambda: upsert_listing(instance))
+
+
+@receiver(post_delete, sender=CarListing)
+def remove_from_comps_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: remove_listing(pk))
+
+
+@receiver(post_delete, sender=ChatSession)
+def invalidate_chat_session(sender, instance, **kwargs):
+    """Make every worker drop its cached copy of a deleted chat session."""
+    pk = instance.pk
+    transaction.on_commit(lambda: bump_generation(pk))
@@ -0,0 +1,45 @@
+"""
+Request stage timing.
+
+    timer = StageTimer()
+    with timer.stage('llm'):
+        ...
+    response['Server-Timing'] = timer.header()
+
+Browser dev tools show Server-Timing next to the network timings, so the
+stages of a slow request can be read there without digging through logs.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StageTimer:
+    """Wall time per named stage of one request, in milliseconds."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def header(self) -> str:
+        """Server-Timing header value: every stage plus the total."""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def summary(self) -> str:
+        """Stages for a log line, e.g. 'session=1.2ms llm=812.3ms total=815.0ms'."""
+        parts = [f"{name}={ms:.1f}ms" for name, ms in self.stages.items()]
+        parts.append(f"total={self.total_ms():.1f}ms")
+        return " ".join(parts)